@@ -1,20 +1,115 @@
+import atexit
+import io
+import logging
 import os
 import time
-from flask import Flask, request, jsonify, send_from_directory, send_file
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, g, request, jsonify, send_from_directory, send_file, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from gridfs import GridFS
 from dotenv import load_dotenv
 from flask_cors import CORS
 import json
-from db import MongoDBClient, get_db
-from pdfExtraction import read_pdf
+from db import MongoDBClient, SharedCollection, close_clients, ensure_indexes, get_db, pool_metrics
+from pdfExtraction import is_text_usable, read_pdf, set_server_workers, text_quality
+from cache import ContentCache, RoadmapCache, prompt_fingerprint, sha256_bytes
+from jobs import JobError, JobQueue, QueueFullError
+from metrics import CONTENT_TYPE, REGISTRY, register_cache, request_seconds, span
+from roadmap_graph import compile_body, compile_graph, conditional_response, is_current
+from roadmap_json import RoadmapFormatError, generate_roadmap, read_stream
+from similarity_cache import HashingEmbedder, SimilarityCache
+from curriculum_sections import merge_roadmaps, page_count, split_sections
+from translation import SegmentTranslator, translation_prompt
+from youtube import VideoLookup, VideoLookupError, video_url
+from gemini import (
+    BULK, ModelRegistry, QuotaLimiter, RateLimiter, cancel_stream, estimate_tokens, get_genai, is_throttled,
+    upload_to_gemini, wait_for_files_active
+)
 
 load_dotenv()
-genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+
+# LOG_LEVEL=DEBUG adds per-stage timings and request/response details
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("app")
+# HTTP client logs quote request URLs, which carry the YouTube API key
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 
 CORS(app)
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # The route pattern, not the URL, keeps the label set small
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request_seconds.observe(time.perf_counter() - started, method=request.method, route=route,
+                                status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint for this worker process."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+# Per-file upload limit. Uploads are stored in GridFS and the queued job only holds their
+# ids, so the limit is independent of Mongo's 16 MB document size.
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(32 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+app.config["MAX_CONTENT_LENGTH"] = 2 * UPLOAD_MAX_BYTES + 1024 * 1024
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({"error": f"Each PDF must be at most {round(UPLOAD_MAX_BYTES / (1024 * 1024), 1)} MB."}), 413
+
+def upload_store():
+    return GridFS(get_db(), collection="uploads")
+
+def store_uploads(*files):
+    """
+    Stream uploaded files into GridFS, enforcing UPLOAD_MAX_BYTES per file.
+
+    :return: GridFS ids of the stored files, in order. Nothing is kept if any file fails.
+    """
+    store = upload_store()
+    file_ids = []
+    try:
+        for file in files:
+            upload = store.new_file(filename=file.filename, content_type=file.content_type)
+            try:
+                size = 0
+                while chunk := file.stream.read(UPLOAD_CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > UPLOAD_MAX_BYTES:
+                        raise RequestEntityTooLarge()
+                    upload.write(chunk)
+            except BaseException:
+                upload.abort()
+                raise
+            upload.close()
+            file_ids.append(upload._id)
+    except BaseException:
+        delete_uploads(*file_ids)
+        raise
+    return file_ids
+
+def load_upload(file_id):
+    return upload_store().get(file_id).read()
+
+def delete_uploads(*file_ids):
+    store = upload_store()
+    for file_id in file_ids:
+        store.delete(file_id)
+
 # Serve React frontend
 @app.route('/')
 def serve_frontend():
@@ -30,36 +125,17 @@ def serve_static_files(path):
         return send_from_directory(app.static_folder, 'index.html')
 
 
-def upload_to_gemini(path, mime_type=None):
-    file = genai.upload_file(path, mime_type=mime_type)
-    print(f"Uploaded file '{file.display_name}' as: {file.uri}")
-    return file
-
-def wait_for_files_active(files):
-    print("Waiting for file processing...")
-    for name in (file.name for file in files):
-        file = genai.get_file(name)
-        while file.state.name == "PROCESSING":
-            print(".", end="", flush=True)
-            time.sleep(10)
-            file = genai.get_file(name)
-        if file.state.name != "ACTIVE":
-            raise Exception(f"File {file.name} failed to process")
-    print("...all files ready")
-
-def generate_roadmap_from_pdf(file_path):
-    files = [upload_to_gemini(file_path, mime_type="application/pdf")]
-    wait_for_files_active(files)
-
-    generation_config = {
-        "temperature": 1,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-        "response_mime_type": "application/json",
-    }
+ROADMAP_MODEL_NAME = "gemini-2.0-flash"
+
+ROADMAP_GENERATION_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_mime_type": "application/json",
+}
 
-    Prompt_Template = '''Generate a detailed roadmap in JSON format based on the following uploaded PDF file. The JSON structure should strictly follow the format below, ensuring that the keys remain unchanged and the structure is consistent. The roadmap should include course details and a list of units, each with a unit number, unit title, and a list of topics. Here is the expected JSON format:
+ROADMAP_PROMPT_TEMPLATE = '''Generate a detailed roadmap in JSON format based on the following uploaded PDF file. The JSON structure should strictly follow the format below, ensuring that the keys remain unchanged and the structure is consistent. The roadmap should include course details and a list of units, each with a unit number, unit title, and a list of topics. Here is the expected JSON format:
 
                     {
                     \"roadMap\": {
@@ -92,19 +168,420 @@ def generate_roadmap_from_pdf(file_path):
 
                     Ensure that the keys 'roadMap', 'course_name', 'roadmap', 'topics', 'unit_number', and 'unit_title' are used exactly as shown. The content within the square brackets should be replaced with relevant information extracted from the PDF file.'''
 
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config=generation_config,
-        system_instruction=Prompt_Template
-    )
+# Bump ROADMAP_PROMPT_VERSION (or edit the template/config) to start a fresh cache namespace
+ROADMAP_PROMPT_VERSION = os.getenv("ROADMAP_PROMPT_VERSION") or prompt_fingerprint(
+    ROADMAP_PROMPT_TEMPLATE, ROADMAP_GENERATION_CONFIG
+)
+
+ROADMAP_REQUEST = "Generate a detailed roadmap in JSON format based on the uploaded document."
+
+# Follow-up requests for the remaining units when a roadmap reply is cut off at max_output_tokens
+ROADMAP_MAX_CONTINUATIONS = int(os.getenv("ROADMAP_MAX_CONTINUATIONS", "3"))
+
+ROADMAP_SECTION_REQUEST = (
+    "The uploaded document is section {number} of {total} (pages {first}-{last}{title}) of a larger curriculum. "
+    "Generate a detailed roadmap in JSON format of the units and topics in this section only."
+)
+
+# Curricula longer than ROADMAP_CHUNK_MIN_PAGES are split into sections of about
+# ROADMAP_SECTION_PAGES pages whose roadmaps are generated in parallel and merged;
+# ROADMAP_CHUNKING=always or off forces or disables the split
+ROADMAP_CHUNKING = os.getenv("ROADMAP_CHUNKING", "auto").lower()
+ROADMAP_CHUNK_MIN_PAGES = int(os.getenv("ROADMAP_CHUNK_MIN_PAGES", "60"))
+ROADMAP_SECTION_PAGES = int(os.getenv("ROADMAP_SECTION_PAGES", "40"))
+ROADMAP_SECTION_WORKERS = int(os.getenv("ROADMAP_SECTION_WORKERS", "4"))
+
+# Curricula with a clean text layer are sent as extracted text instead of being uploaded
+# and processed by Gemini; ROADMAP_SOURCE=file always uploads
+ROADMAP_SOURCE = os.getenv("ROADMAP_SOURCE", "auto").lower()
+PDF_TEXT_MIN_CHARS_PER_PAGE = float(os.getenv("PDF_TEXT_MIN_CHARS_PER_PAGE", "200"))
+PDF_TEXT_MAX_GARBAGE_RATIO = float(os.getenv("PDF_TEXT_MAX_GARBAGE_RATIO", "0.02"))
+
+ROADMAP_TEXT_HISTORY = "Text extracted from the uploaded curriculum PDF:\n\n{text}"
+
+# Overall deadline for Gemini to finish processing an uploaded PDF
+GEMINI_FILE_TIMEOUT = float(os.getenv("GEMINI_FILE_TIMEOUT", "300"))
+
+# Objective PDFs: pages beyond the cap are ignored, a stuck page range aborts the job
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "10"))
+
+roadmap_cache = RoadmapCache(SharedCollection("roadmap_cache"), ROADMAP_MODEL_NAME, ROADMAP_PROMPT_VERSION)
+
+# Roadmaps of single sections keyed by the section's page contents, so a re-uploaded
+# handbook with one edited chapter only regenerates that chapter's section
+section_cache = RoadmapCache(
+    SharedCollection("roadmap_section_cache"),
+    ROADMAP_MODEL_NAME,
+    prompt_fingerprint(ROADMAP_PROMPT_VERSION, ROADMAP_SECTION_REQUEST),
+)
+
+# Client-side quota shared by every Gemini call in this process. The quotas are per API
+# project, so with several server workers each process enforces an equal share of them:
+# GEMINI_QUOTA_SHARES if set, otherwise the worker count (see init_worker)
+GEMINI_QUOTA_SHARES = os.getenv("GEMINI_QUOTA_SHARES")
+gemini_limiter = QuotaLimiter(
+    default_rpm=float(os.getenv("GEMINI_RPM", "60")),
+    default_tpm=float(os.getenv("GEMINI_TPM", "1000000")),
+    quotas=QuotaLimiter.parse_quotas(os.getenv("GEMINI_MODEL_QUOTAS", "")),
+    shares=int(GEMINI_QUOTA_SHARES or os.getenv("WEB_CONCURRENCY") or "1"),
+)
+
+# Seconds a call may spend waiting for quota and retrying, by priority
+GEMINI_INTERACTIVE_TIMEOUT = float(os.getenv("GEMINI_INTERACTIVE_TIMEOUT", "30"))
+GEMINI_BULK_TIMEOUT = float(os.getenv("GEMINI_BULK_TIMEOUT", "600"))
+
+# Configured model handles are built once and shared by all requests
+models = ModelRegistry(
+    default_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")),
+    concurrency=ModelRegistry.parse_concurrency(os.getenv("GEMINI_MODEL_CONCURRENCY", "")),
+    limiter=gemini_limiter,
+    max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "4")),
+)
+
+SYLLABUS_MODEL_NAME = "gemini-1.5-flash"
+EXPLAIN_MODEL_NAME = "gemini-1.5-flash"
+TRANSLATE_MODEL_NAME = "gemini-pro"
+
+# Generated essays, explanations and translations shared by every student on a course
+content_cache = ContentCache(
+    SharedCollection("content_cache"),
+    max_entries=int(os.getenv("CONTENT_CACHE_SIZE", "1024")),
+    ttl_seconds=int(os.getenv("CONTENT_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# YouTube Search results per topic; each topic costs one search per TTL
+video_cache = ContentCache(
+    SharedCollection("video_cache"),
+    max_entries=int(os.getenv("VIDEO_CACHE_SIZE", "4096")),
+    ttl_seconds=int(os.getenv("VIDEO_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# Explanations of near-identical highlights: students select slightly different spans of
+# the same passage, which the exact content cache cannot match
+explain_similarity = SimilarityCache(
+    HashingEmbedder(dim=int(os.getenv("EXPLAIN_SIMILARITY_DIM", "1024"))),
+    threshold=float(os.getenv("EXPLAIN_SIMILARITY_THRESHOLD", "0.9")),
+    max_entries=int(os.getenv("EXPLAIN_SIMILARITY_SIZE", "5000")),
+    path=os.getenv("EXPLAIN_SIMILARITY_PATH", "similarity_index/explain.npz") or None,
+    save_interval=float(os.getenv("EXPLAIN_SIMILARITY_SAVE_INTERVAL", "60")),
+    namespace=EXPLAIN_MODEL_NAME,
+    min_overlap=float(os.getenv("EXPLAIN_SIMILARITY_MIN_OVERLAP", "0.7")),
+)
+atexit.register(explain_similarity.save)
+
+video_lookup = VideoLookup(
+    video_cache,
+    search_url=os.getenv("YOUTUBE_SEARCH_URL"),
+    api_key=os.getenv("YOUTUBE_API_KEY"),
+    timeout=float(os.getenv("YOUTUBE_TIMEOUT", "10")),
+    max_connections=int(os.getenv("YOUTUBE_MAX_CONNECTIONS", "10")),
+    batch_concurrency=int(os.getenv("YOUTUBE_BATCH_CONCURRENCY", "8")),
+)
+
+register_cache("roadmap", roadmap_cache)
+register_cache("roadmap_section", section_cache)
+
+roadmap_sources = REGISTRY.counter(
+    "roadmap_source_total",
+    "Roadmap generations by curriculum input: extracted text or uploaded PDF file.",
+    ("source",),
+)
+register_cache("content", content_cache)
+register_cache("video", video_cache)
+register_cache("explain_similarity", explain_similarity)
+
+REGISTRY.callback(
+    "gemini_quota_waiting", "Gemini calls queued for client-side quota, per model.", ("model",),
+    lambda: {(name,): waiting for name, waiting in gemini_limiter.stats()["waiting"].items()},
+)
+REGISTRY.callback(
+    "gemini_quota_events_total", "Gemini quota grants, grants after waiting and expired waits.", ("event",),
+    lambda: {(event,): count for event, count in gemini_limiter.stats().items() if event != "waiting"},
+    type="counter",
+)
+
+def usable_text(pdf):
+    """
+    Extract the text layer of a PDF and judge whether it can replace the file upload.
+
+    :return: (text or None, text_quality() result or None)
+    """
+    if ROADMAP_SOURCE == "file" or not isinstance(pdf, (bytes, bytearray)):
+        return None, None
+    try:
+        with span("text_check"):
+            text = read_pdf(pdf, page_timeout=PDF_PAGE_TIMEOUT)
+            quality = text_quality(text, page_count(pdf))
+    except Exception as e:
+        # Unreadable for PyPDF2 or too slow; Gemini reads the file itself
+        logger.info("Curriculum text extraction failed, uploading the PDF: %s", e)
+        return None, None
+    if is_text_usable(quality, PDF_TEXT_MIN_CHARS_PER_PAGE, PDF_TEXT_MAX_GARBAGE_RATIO):
+        return text, quality
+    return None, quality
+
+def generate_roadmap_from_upload(pdf, request_message):
+    """
+    Generate the roadmap of a PDF in one chat session, primed with the PDF's text when it
+    has a clean text layer and with the uploaded file otherwise (scans, broken fonts).
+
+    :param pdf: PDF as a path or its contents as bytes.
+    :return: (curriculum dict, generation stats from roadmap_json.generate_roadmap plus
+        "source" ("text" or "file") and "text_quality")
+    """
+    text, quality = usable_text(pdf)
+    if text is not None:
+        source = "text"
+        history_part = ROADMAP_TEXT_HISTORY.format(text=text)
+        tokens = estimate_tokens([ROADMAP_PROMPT_TEMPLATE, history_part])
+    else:
+        source = "file"
+        if isinstance(pdf, (bytes, bytearray)):
+            pdf = io.BytesIO(pdf)
+        files = [upload_to_gemini(pdf, mime_type="application/pdf")]
+        history_part = wait_for_files_active(files, timeout=GEMINI_FILE_TIMEOUT)[0]
+        # The PDF's real token count is charged afterwards
+        tokens = estimate_tokens(ROADMAP_PROMPT_TEMPLATE)
+    roadmap_sources.inc(source=source)
+    logger.info("Generating roadmap from %s (text quality %s)", source, quality)
+
+    model = models.get(ROADMAP_MODEL_NAME, ROADMAP_GENERATION_CONFIG, ROADMAP_PROMPT_TEMPLATE)
+
+    chat_session = model.start_chat(history=[{"role": "user", "parts": [history_part]}])
+
+    def send_message(message):
+        # A stream that fails partway leaves the session's last reply broken and the next
+        # send_message would raise BrokenResponseError; every attempt therefore restarts
+        # from the history before this message, with a fresh parse
+        history = list(chat_session.history)
+
+        def attempt():
+            chat_session.history = history
+            response = chat_session.send_message(message, stream=True)
+            return response, read_stream(response)
+
+        with span("gemini_generate"):
+            response, stream = models.call(
+                ROADMAP_MODEL_NAME,
+                attempt,
+                tokens=tokens,
+                priority=BULK,
+                timeout=GEMINI_BULK_TIMEOUT
+            )
+        models.record_usage(ROADMAP_MODEL_NAME, tokens, response)
+        return stream
+
+    curriculum, stats = generate_roadmap(send_message, request_message, ROADMAP_MAX_CONTINUATIONS)
+    return curriculum, dict(stats, source=source, text_quality=quality)
+
+def use_sections(pdf):
+    if ROADMAP_CHUNKING in ("always", "off"):
+        return ROADMAP_CHUNKING == "always"
+    try:
+        return page_count(pdf) > ROADMAP_CHUNK_MIN_PAGES
+    except Exception:
+        # PyPDF2 cannot read it; Gemini may still be able to
+        return False
+
+section_executor = ThreadPoolExecutor(max_workers=ROADMAP_SECTION_WORKERS, thread_name_prefix="roadmap-section")
+
+def generate_sectioned_roadmap(pdf):
+    """
+    Roadmap of a large curriculum: one generation per section, run in parallel and merged.
+    Sections are cached as they finish, so a failed job only redoes the failed sections.
+
+    :param pdf: Curriculum PDF contents as bytes.
+    :return: (curriculum dict, generation stats summed over the sections)
+    """
+    with span("split_sections"):
+        sections = split_sections(pdf, ROADMAP_SECTION_PAGES)
+
+    def generate_section(number, section):
+        cached = section_cache.get(section["hash"])
+        if cached is not None:
+            return cached, None
+        request_message = ROADMAP_SECTION_REQUEST.format(
+            number=number,
+            total=len(sections),
+            first=section["start"] + 1,
+            last=section["stop"],
+            title=f', "{section["title"]}"' if section["title"] else "",
+        )
+        curriculum, stats = generate_roadmap_from_upload(section["pdf"], request_message)
+        section_cache.set(section["hash"], curriculum)
+        return curriculum, stats
+
+    futures = [section_executor.submit(generate_section, number, section) for number, section in enumerate(sections, 1)]
+    try:
+        results = [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+    generated = [stats for _, stats in results if stats is not None]
+    stats = {
+        "sections": len(sections),
+        "cached_sections": len(sections) - len(generated),
+        "calls": sum(stats["calls"] for stats in generated),
+        "continuations": sum(stats["continuations"] for stats in generated),
+        "discarded_tokens": sum(stats["discarded_tokens"] for stats in generated),
+        "outcomes": [outcome for stats in generated for outcome in stats["outcomes"]],
+        "sources": {source: sum(stats["source"] == source for stats in generated) for source in ("text", "file")},
+    }
+    with span("merge_sections"):
+        return merge_roadmaps([curriculum for curriculum, _ in results]), stats
+
+def generate_roadmap_from_pdf(pdf):
+    """
+    :param pdf: Curriculum PDF as a path or its contents as bytes.
+    :return: (curriculum dict, generation stats)
+    """
+    if isinstance(pdf, (bytes, bytearray)) and use_sections(pdf):
+        return generate_sectioned_roadmap(pdf)
+    return generate_roadmap_from_upload(pdf, ROADMAP_REQUEST)
+
+def process_submission(payload, set_stage):
+    """
+    Run the roadmap pipeline for one submitted form. Executed by the job queue.
+
+    :param payload: Form fields and the GridFS ids of the uploaded PDFs.
+    :param set_stage: Callback reporting the current stage to polling clients.
+    :return: Result stored on the job.
+    """
+    # Each upload is read once; extraction, hashing and the Gemini upload share those bytes
+    objective_pdf = load_upload(payload["objective_pdf_id"])
+    curriculum_pdf = load_upload(payload["curriculum_pdf_id"])
+    try:
+        return build_submission(payload, objective_pdf, curriculum_pdf, set_stage)
+    finally:
+        # Only a finished run gets here; a job interrupted by a dead worker keeps its files
+        # for the re-run
+        delete_uploads(payload["objective_pdf_id"], payload["curriculum_pdf_id"])
+
+def build_submission(payload, objective_pdf, curriculum_pdf, set_stage):
+    """Roadmap pipeline of process_submission on the contents of the two uploaded PDFs."""
+    timings = {}
+    started = time.perf_counter()
+
+    def extract_objective():
+        with span("read_pdf", timings):
+            return read_pdf(objective_pdf, max_pages=PDF_MAX_PAGES, page_timeout=PDF_PAGE_TIMEOUT)
+
+    def check_objective():
+        # A failed objective extraction ends the job before (more) Gemini calls are spent
+        # on a roadmap that could not be saved anyway
+        if objective_future.done() and objective_future.exception() is not None:
+            raise JobError(f"Error reading objective PDF: {str(objective_future.exception())}")
+
+    # Opening the objective PDF parses its structure, where most broken files already fail
+    set_stage("processing")
+    try:
+        page_count(objective_pdf)
+    except Exception as e:
+        raise JobError(f"Error reading objective PDF: {str(e)}")
+
+    # The objective extraction (CPU) and the curriculum pipeline (Gemini, I/O) are
+    # independent, so the objective is read on the side while the roadmap is generated
+    objective_future = objective_executor.submit(extract_objective)
+
+    # Identical curriculum PDFs reuse the stored roadmap and skip the Gemini upload
+    pdf_hash = sha256_bytes(curriculum_pdf)
+    with span("roadmap_cache_lookup", timings):
+        curriculum = roadmap_cache.get(pdf_hash)
+    cache_hit = curriculum is not None
+    generation = None
+    check_objective()
+
+    try:
+        if not cache_hit:
+            set_stage("generating_roadmap")
+            with span("generate_roadmap", timings):
+                curriculum, generation = generate_roadmap_from_pdf(curriculum_pdf)
+    except RoadmapFormatError as e:
+        raise JobError("Invalid JSON response from generate_roadmap_from_pdf", str(e))
+    except Exception as api_error:
+        error_msg = str(api_error)
+        if "API key not valid" in error_msg:
+            raise JobError(
+                "Invalid Google Gemini API key. Please check your .env file and ensure you have a valid GEMINI_API_KEY.",
+                "The API key in your .env file appears to be invalid or is still set to the placeholder value."
+            )
+        else:
+            raise JobError(
+                f"Error generating roadmap: {error_msg}",
+                "There was an issue with the Gemini API call."
+            )
+
+    if not isinstance(curriculum, dict):
+        raise JobError("curriculum is not a valid dictionary")
+
+    # Validate 'roadMap' structure
+    if "roadMap" in curriculum and isinstance(curriculum["roadMap"], dict):
+        course_name = curriculum["roadMap"].get("course_name", "N/A")
+    else:
+        raise JobError("Invalid structure for curriculum['roadMap']")
 
-    chat_session = model.start_chat(history=[{"role": "user", "parts": [files[0]]}]) 
-    response = chat_session.send_message("Generate a detailed roadmap in JSON format based on the uploaded document.")
+    if not cache_hit:
+        roadmap_cache.set(pdf_hash, curriculum)
 
-    return response.text
+    with span("wait_objective", timings):
+        try:
+            objective = objective_future.result()
+        except Exception as e:
+            raise JobError(f"Error reading objective PDF: {str(e)}")
+
+    # Save to MongoDB
+    set_stage("saving")
+    obj = content_store()
+    document = {
+        "name": payload["name"],
+        "career_interest": payload["career_interest"],
+        "expertise": payload["expertise"],
+        "objective": objective,
+        "curriculum": curriculum,
+        # Laid out and compressed once here instead of on every view of the roadmap
+        "roadmap_graph": compile_graph(curriculum["roadMap"])
+    }
+    with span("mongo_insert", timings):
+        obj.insert_documents([document])
+
+    timings["total"] = time.perf_counter() - started
+    timings_ms = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+    logger.info("Roadmap for %s stage timings (ms): %s", payload["name"], timings_ms)
+
+    return {
+        "message": "Roadmap generated successfully",
+        "course_name": course_name,
+        "cached": cache_hit,
+        # Replies, continuations and discarded tokens it took to get the roadmap
+        "generation": generation,
+        "timings_ms": timings_ms
+    }
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# One objective extraction can run alongside each job's curriculum pipeline
+objective_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="objective")
+
+# Running jobs refresh their updated_at every JOB_HEARTBEAT_SECONDS; one silent for
+# JOB_STALE_AFTER_SECONDS belongs to a dead worker; each worker's reaper thread re-queues it
+# within about JOB_HEARTBEAT_SECONDS
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+JOB_STALE_AFTER_SECONDS = int(os.getenv("JOB_STALE_AFTER_SECONDS", "300"))
+
+job_queue = JobQueue(
+    SharedCollection("jobs"),
+    process_submission,
+    max_workers=JOB_WORKERS,
+    max_pending=int(os.getenv("JOB_QUEUE_SIZE", "32")),
+    heartbeat_seconds=JOB_HEARTBEAT_SECONDS,
+    stale_after_seconds=JOB_STALE_AFTER_SECONDS,
+)
 
 @app.route('/submit-form', methods=['POST'])
 def submit_form():
+    """Queue roadmap generation for the submitted form and return the job ID to poll."""
     try:
         name = request.form.get('name')
         career_interest = request.form.get('careerInterest')
@@ -115,103 +592,158 @@ def submit_form():
         if not all([name, career_interest, expertise, file1, file2]):
             return jsonify({"error": "All fields are required"}), 400
 
-        file2_path = os.path.join('uploads', file2.filename)
-        file1_path = os.path.join('uploads', file1.filename)
-
-        file2.save(file2_path)
-        file1.save(file1_path)
+        # Uploads are streamed into GridFS; the job only carries their ids
+        with span("store_upload"):
+            objective_pdf_id, curriculum_pdf_id = store_uploads(file1, file2)
 
-        objective = read_pdf(file1_path)
-        
         try:
-            curriculum = generate_roadmap_from_pdf(file2_path)
-        except Exception as api_error:
-            error_msg = str(api_error)
-            if "API key not valid" in error_msg:
-                return jsonify({
-                    "error": "Invalid Google Gemini API key. Please check your .env file and ensure you have a valid GEMINI_API_KEY.",
-                    "details": "The API key in your .env file appears to be invalid or is still set to the placeholder value."
-                }), 500
-            else:
-                return jsonify({
-                    "error": f"Error generating roadmap: {error_msg}",
-                    "details": "There was an issue with the Gemini API call."
-                }), 500
-
-        # Ensure curriculum is a valid dictionary
-        if isinstance(curriculum, str):
-            try:
-                curriculum = json.loads(curriculum)
-            except json.JSONDecodeError:
-                return jsonify({"error": "Invalid JSON response from generate_roadmap_from_pdf"}), 500
-
-        if not isinstance(curriculum, dict):
-            return jsonify({"error": "curriculum is not a valid dictionary"}), 400
-
-        # Validate 'roadMap' structure
-        if "roadMap" in curriculum and isinstance(curriculum["roadMap"], dict):
-            course_name = curriculum["roadMap"].get("course_name", "N/A")
-        else:
-            return jsonify({"error": "Invalid structure for curriculum['roadMap']"}), 400
-
-        # Save to MongoDB
-        mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://mongodb:27017/')
-        obj = MongoDBClient(mongodb_uri, "education", "content")
-        document = {
-            "name": name,
-            "career_interest": career_interest,
-            "expertise": expertise,
-            "objective": objective,
-            "curriculum": curriculum
-        }
-        obj.create_documents([document])
-
-        return jsonify({"message": "Roadmap generated successfully", "course_name": course_name}), 200
+            job_id = job_queue.submit({
+                "name": name,
+                "career_interest": career_interest,
+                "expertise": expertise,
+                "objective_pdf_id": objective_pdf_id,
+                "curriculum_pdf_id": curriculum_pdf_id,
+            })
+        except Exception as e:
+            delete_uploads(objective_pdf_id, curriculum_pdf_id)
+            if isinstance(e, QueueFullError):
+                return jsonify({"error": "Too many roadmaps are being generated. Please try again shortly."}), 503
+            raise
 
+        return jsonify({
+            "message": "Roadmap generation queued",
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }), 202
+
+    except RequestEntityTooLarge as e:
+        return upload_too_large(e)
     except Exception as e:
-        print(f"Unexpected error in submit_form: {str(e)}")
+        logger.exception("Unexpected error in submit_form")
         return jsonify({
             "error": "An unexpected error occurred while processing your request.",
             "details": str(e)
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a queued job: queued, running (with stage and progress), succeeded or failed."""
+    try:
+        job = job_queue.get(job_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    if job is None:
+        return jsonify({"error": f"No job found with id: {job_id}"}), 404
+
+    return jsonify(job)
+
+
+@app.route('/cache/roadmap', methods=['GET'])
+def roadmap_cache_stats():
+    """Hit/miss counters of the curriculum roadmap cache and of the per-section cache."""
+    return jsonify(dict(roadmap_cache.stats(), sections=section_cache.stats()))
+
+@app.route('/cache/roadmap', methods=['DELETE'])
+def invalidate_roadmap_cache():
+    """
+    Drop cached roadmaps. By default only entries from an older prompt version or model
+    are removed; pass ?all=true to clear the whole cache.
+    """
+    stale_only = request.args.get("all", "false").lower() != "true"
+    try:
+        removed = roadmap_cache.invalidate(stale_only=stale_only) + section_cache.invalidate(stale_only=stale_only)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"removed": removed, "prompt_version": roadmap_cache.prompt_version})
+
+@app.route('/db/pool', methods=['GET'])
+def db_pool_stats():
+    """Connection pool metrics of the shared MongoClient in this worker process."""
+    return jsonify(pool_metrics.snapshot())
+
+@app.route('/gemini/quota', methods=['GET'])
+def gemini_quota_stats():
+    """Client-side Gemini quota counters and queue lengths per model."""
+    return jsonify(gemini_limiter.stats())
+
+@app.route('/cache/content', methods=['GET'])
+def content_cache_stats():
+    """Hit/miss counters of the generated-content cache."""
+    return jsonify(content_cache.stats())
+
 
 # Global variable to store the course name
 course_name = "Operating Systems"  # Example course name, you can set this dynamically
 
+def content_store():
+    """Submitted roadmaps; cheap to build, as MongoDBClient reuses the pooled client."""
+    return MongoDBClient(os.getenv('MONGODB_URI', 'mongodb://mongodb:27017/'), "education", "content")
+
 @app.route('/api/roadmap', methods=['GET'])
 def get_roadmap():
     """Expose the roadmap data for React frontend."""
     course_name = request.args.get("name")  # Use `args` for query parameters
-    print(course_name)
+    logger.debug("Roadmap requested for %s", course_name)
 
     if not course_name:
         return jsonify({"error": "Course name is required."}), 400
 
-    # Get the database and collection
-    db = get_db()  # Get the MongoDB database
-    content_collection = db["content"]  # Access the "content" collection
-
-    # Retrieve documents for the specified course name
-    documents = content_collection.find({
-        "name": course_name
-    })
-
-    # Convert the cursor to a list
-    documents = list(documents)
+    # Retrieve the first document for the specified course name through the "name" index,
+    # fetching only the roadmap subtree
+    document = content_store().find_by_name(course_name, ["curriculum.roadMap"])
 
-    if not documents:
+    if not document:
         return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
 
-    # Extract the first document (or modify this logic as needed)
-    document = documents[0]
-
     # Access the roadmap data
     roadmap_data = document.get("curriculum", {}).get("roadMap", {})
     course_name = roadmap_data.get("course_name", "N/A")
 
-    # Return the roadmap data to the frontend
-    return jsonify({"course_name": course_name, "roadmap": roadmap_data})
+    # Return the roadmap data to the frontend, or 304 if the client already has it
+    body = json.dumps({"course_name": course_name, "roadmap": roadmap_data}, separators=(",", ":")).encode("utf-8")
+    return compiled_response(compile_body(body, encodings=()))
+
+def compiled_response(compiled):
+    """Serve a compile_body() result with ETag revalidation and the client's preferred encoding."""
+    status, body, headers = conditional_response(
+        compiled, request.headers.get("If-None-Match"), request.headers.get("Accept-Encoding")
+    )
+    return Response(body, status=status, headers=headers)
+
+def stored_roadmap_graph(collection, course_name):
+    """
+    Precompiled graph of a stored roadmap. Roadmaps stored before graphs were compiled, or
+    with an older graph version, are compiled once here and updated in place.
+
+    :return: The compiled graph, or None if there is no roadmap for the course.
+    """
+    document = collection.find_one({"name": course_name}, {"roadmap_graph": 1})
+    if not document:
+        return None
+    if is_current(document.get("roadmap_graph")):
+        return document["roadmap_graph"]
+
+    document = collection.find_one({"_id": document["_id"]}, {"curriculum.roadMap": 1})
+    compiled = compile_graph(document.get("curriculum", {}).get("roadMap", {}))
+    collection.update_one({"_id": document["_id"]}, {"$set": {"roadmap_graph": compiled}})
+    return compiled
+
+@app.route('/api/roadmap/graph', methods=['GET'])
+def get_roadmap_graph():
+    """Roadmap as laid-out nodes and edges, answered with 304 while it is unchanged."""
+    course_name = request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    with span("roadmap_graph_lookup"):
+        compiled = stored_roadmap_graph(get_db()["content"], course_name)
+    if compiled is None:
+        return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
+
+    return compiled_response(compiled)
 
 @app.route('/getObj', methods=['GET'])
 def get_obj():
@@ -221,10 +753,7 @@ def get_obj():
         return jsonify({"error": "Course name is required."}), 400
 
     try:
-        db = get_db()
-        content_collection = db["content"]
-        
-        document = content_collection.find_one({"name": course_name})
+        document = content_store().find_by_name(course_name, ["objective"])
         
         if not document:
             return jsonify({
@@ -240,37 +769,57 @@ def get_obj():
 
 @app.route('/api/video', methods=['GET'])
 def get_video():
-    import requests
-    YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-    YOUTUBE_SEARCH_URL = os.getenv("YOUTUBE_SEARCH_URL")
     topic = request.args.get('topic')
     if not topic:
         return jsonify({'error': 'Topic parameter is required'}), 400
-    
-    params = {
-        'part': 'snippet',
-        'q': topic,
-        'key': YOUTUBE_API_KEY,
-        'maxResults': 1,
-        'type': 'video'
-    }
-    
-    response = requests.get(YOUTUBE_SEARCH_URL, params=params)
-    data = response.json()
-    
-    if 'items' not in data or not data['items']:
+
+    try:
+        video_id = video_lookup.find(topic)
+    except VideoLookupError as e:
+        logger.warning("%s", e)
+        return jsonify({'error': str(e)}), 502
+
+    if not video_id:
         return jsonify({'error': 'No videos found for the topic'}), 404
-    
-    video_id = data['items'][0]['id']['videoId']
-    video_url = f'https://www.youtube.com/watch?v={video_id}'
-    
-    return jsonify({'message': f'Video found for topic: {topic}', 'video_url': video_url})
 
-def generate_syllabus_content(objectives, title):
-    """
-    Generate educational content using Google's Gemini Pro model.
-    """
-    prompt = f"""
+    return jsonify({'message': f'Video found for topic: {topic}', 'video_url': video_url(video_id)})
+
+@app.route('/api/roadmap/videos', methods=['GET'])
+def get_roadmap_videos():
+    """Video URL for every topic of a stored roadmap (null where YouTube has none)."""
+    course_name = request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    document = content_store().find_by_name(course_name, ["curriculum.roadMap"])
+    if not document:
+        return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
+
+    roadmap_data = document.get("curriculum", {}).get("roadMap", {})
+    results = video_lookup.find_many(roadmap_topics(roadmap_data))
+
+    return jsonify({
+        "course_name": roadmap_data.get("course_name", "N/A"),
+        "videos": {
+            topic: video_url(video_id) if video_id and not isinstance(video_id, Exception) else None
+            for topic, video_id in results.items()
+        },
+        "errors": {topic: str(error) for topic, error in results.items() if isinstance(error, Exception)}
+    })
+
+@app.route('/cache/video', methods=['GET'])
+def video_cache_stats():
+    """Hit/miss counters of the topic-to-video cache."""
+    return jsonify(video_cache.stats())
+
+@app.route('/cache/explain', methods=['GET'])
+def explain_similarity_stats():
+    """Hit/miss counters of the near-duplicate /explain cache."""
+    return jsonify(dict(explain_similarity.stats(), threshold=explain_similarity.threshold))
+
+def build_syllabus_prompt(objectives, title):
+    return f"""
 
 
 You are an AI educator tasked with creating a comprehensive and engaging educational syllabus for the provided topic. The syllabus should align with the specified learning objectives and include detailed content in the form of an essay with relevant subheadings. Additionally, incorporate educational images with proper attribution to enhance understanding and engagement.
@@ -308,16 +857,23 @@ You are an AI educator tasked with creating a comprehensive and engaging educati
 no image description or image link in the output.
 
   """
-    
-    # Initialize the model (using gemini-pro as it's the current stable version)
-    model = genai.GenerativeModel("gemini-1.5-flash")
+
+def generate_syllabus_content(objectives, title):
+    """
+    Generate educational content using Google's Gemini Pro model.
+    """
+    prompt = build_syllabus_prompt(objectives, title)
     
     try:
-        # Generate the content
-        response = model.generate_content(prompt)
-        return response.text
+        # Generate the content, reusing the essay already written for this objective/topic pair
+        return content_cache.get_or_compute(
+            "syllabus",
+            SYLLABUS_MODEL_NAME,
+            {"objectives": objectives, "title": title},
+            lambda: models.generate_content(SYLLABUS_MODEL_NAME, prompt, timeout=GEMINI_INTERACTIVE_TIMEOUT).text,
+        )
     except Exception as e:
-        print(f"Error generating content: {str(e)}")
+        logger.warning("Error generating content: %s", e)
         return f"Error generating content: {str(e)}"
 
 @app.route('/generate-content', methods=['POST'])
@@ -325,12 +881,200 @@ def generate_content():
     data = request.get_json() 
     objectives = data.get('objective', '')
     title = data.get('selectedTopic', '')
-    print(objectives)
-    print(title)
+    logger.debug("Content requested for %r (objectives: %d chars)", title, len(objectives))
 
     response = generate_syllabus_content(objectives, title)
     return jsonify({'content': response})
 
+def roadmap_topics(roadmap_data):
+    """Distinct topic titles of a roadmap, in roadmap order."""
+    return list(dict.fromkeys(
+        topic
+        for unit in roadmap_data.get("roadmap", [])
+        for topic in unit.get("topics", [])
+        if isinstance(topic, str) and topic
+    ))
+
+def pregenerate_topics(payload, set_stage):
+    """
+    Generate and store the content of every topic of a stored roadmap so later topic
+    clicks are answered from the content cache. The entries are stored without an expiry
+    date, unlike live generations. Executed by the pregeneration queue.
+    """
+    name = payload["name"]
+    document = content_store().find_by_name(name, ["objective", "curriculum.roadMap"])
+    if not document:
+        raise JobError(f"No roadmap available for course: {name}")
+
+    objective = document.get("objective", "")
+    roadmap_data = document.get("curriculum", {}).get("roadMap", {})
+    topics = roadmap_topics(roadmap_data)
+
+    progress = {"total": len(topics), "done": 0, "failed": 0}
+    failures = []
+    set_stage("generating_content", dict(progress))
+
+    def generate(topic):
+        def compute():
+            # Topics already in the cache never reach the limiter or Gemini
+            pregeneration_limiter.acquire()
+            prompt = build_syllabus_prompt(objective, topic)
+            return models.generate_content(
+                SYLLABUS_MODEL_NAME, prompt, priority=BULK, timeout=GEMINI_BULK_TIMEOUT
+            ).text
+
+        content_cache.persist(
+            "syllabus",
+            SYLLABUS_MODEL_NAME,
+            {"objectives": objective, "title": topic},
+            compute,
+        )
+
+    with ThreadPoolExecutor(max_workers=PREGENERATE_CONCURRENCY, thread_name_prefix="pregenerate") as pool:
+        futures = {pool.submit(generate, topic): topic for topic in topics}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                progress["done"] += 1
+            except Exception as e:
+                progress["failed"] += 1
+                failures.append({"topic": futures[future], "error": str(e)})
+            set_stage("generating_content", dict(progress))
+
+    return {
+        "course_name": roadmap_data.get("course_name", "N/A"),
+        "topics": progress["total"],
+        "generated": progress["done"],
+        "failures": failures
+    }
+
+# Topic content generated concurrently per batch job, and the overall Gemini call rate
+PREGENERATE_CONCURRENCY = int(os.getenv("PREGENERATE_CONCURRENCY", "4"))
+pregeneration_limiter = RateLimiter(float(os.getenv("PREGENERATE_RATE_PER_MINUTE", "30")))
+
+pregeneration_queue = JobQueue(
+    SharedCollection("jobs"),
+    pregenerate_topics,
+    kind="pregenerate",
+    max_workers=int(os.getenv("PREGENERATE_WORKERS", "1")),
+    max_pending=int(os.getenv("PREGENERATE_QUEUE_SIZE", "16")),
+    heartbeat_seconds=JOB_HEARTBEAT_SECONDS,
+    stale_after_seconds=JOB_STALE_AFTER_SECONDS,
+)
+
+@app.route('/api/roadmap/pregenerate', methods=['POST'])
+def pregenerate_roadmap_content():
+    """
+    Queue content generation for every topic of a stored roadmap. Poll /jobs/<id> for
+    progress; generated topics are then served by /generate-content from storage.
+    """
+    data = request.get_json(silent=True) or {}
+    course_name = data.get("name") or request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    try:
+        if not get_db()["content"].find_one({"name": course_name}, {"_id": 1}):
+            return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
+        job_id = pregeneration_queue.submit({"name": course_name})
+    except QueueFullError:
+        return jsonify({"error": "Too many batches are being generated. Please try again shortly."}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "message": "Content generation queued",
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}"
+    }), 202
+
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def stream_generation(namespace, model_name, inputs, prompt):
+    """
+    Relay a Gemini generation as server-sent events: "data" events carry text chunks,
+    followed by a final "done" (or "error") event. A cached result is sent as one chunk;
+    a completed stream fills the content cache.
+    """
+    cached = content_cache.get(namespace, model_name, inputs)
+
+    def events():
+        if cached is not None:
+            yield sse_event({"text": cached, "cached": True})
+            yield sse_event({}, "done")
+            return
+
+        response = None
+        parts = []
+        completed = False
+        # The model slot is held for the whole stream, not just the first chunk
+        slot = models.limit(model_name)
+        slot.acquire()
+        try:
+            response = models.call(
+                model_name,
+                lambda: models.get(model_name).generate_content(prompt, stream=True),
+                tokens=estimate_tokens(prompt),
+                timeout=GEMINI_INTERACTIVE_TIMEOUT,
+                use_slot=False
+            )
+            for chunk in response:
+                parts.append(chunk.text)
+                yield sse_event({"text": chunk.text})
+            completed = True
+        except Exception as api_error:
+            logger.warning("Error with Gemini API: %s", api_error)
+            yield sse_event({"error": f"Gemini API error: {str(api_error)}"}, "error")
+            return
+        finally:
+            # Client disconnects close this generator mid-stream; stop paying for the rest
+            if not completed and response is not None:
+                cancel_stream(response)
+            slot.release()
+
+        content_cache.set(namespace, model_name, inputs, "".join(parts))
+        yield sse_event({}, "done")
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/generate-content/stream', methods=['POST'])
+def generate_content_stream():
+    """Streaming variant of /generate-content."""
+    data = request.get_json()
+    objectives = data.get('objective', '')
+    title = data.get('selectedTopic', '')
+
+    return stream_generation(
+        "syllabus",
+        SYLLABUS_MODEL_NAME,
+        {"objectives": objectives, "title": title},
+        build_syllabus_prompt(objectives, title)
+    )
+
+@app.route('/explain/stream', methods=['POST'])
+def explain_text_stream():
+    """Streaming variant of /explain."""
+    data = request.json
+    copied_text = data.get("text")
+
+    if not copied_text:
+        return jsonify({"error": "No text provided"}), 400
+
+    return stream_generation(
+        "explain",
+        EXPLAIN_MODEL_NAME,
+        {"text": copied_text},
+        f"Explain this: {copied_text}"
+    )
+
 @app.route('/explain', methods=['POST', 'OPTIONS'])
 def explain_text():
     if request.method == 'OPTIONS':
@@ -346,25 +1090,58 @@ def explain_text():
         if not copied_text:
             return jsonify({"error": "No text provided"}), 400
 
-        print(f"Received text: {copied_text}")
+        logger.debug("Explaining %d chars", len(copied_text))
 
-        # Call the Gemini API to generate an explanation
+        # Call the Gemini API to generate an explanation, unless this text or one nearly
+        # identical to it was explained before
         try:
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(f"Explain this: {copied_text}")
-            print(f"Generated explanation: {response.text}")
+            explanation = explain_similarity.get_or_compute(
+                copied_text,
+                lambda: content_cache.get_or_compute(
+                    "explain",
+                    EXPLAIN_MODEL_NAME,
+                    {"text": copied_text},
+                    lambda: models.generate_content(
+                        EXPLAIN_MODEL_NAME, f"Explain this: {copied_text}", timeout=GEMINI_INTERACTIVE_TIMEOUT
+                    ).text,
+                ),
+            )
+            logger.debug("Explanation of %d chars", len(explanation))
 
             # Return the generated explanation as JSON
-            return jsonify({"explanation": response.text})
+            return jsonify({"explanation": explanation})
 
         except Exception as api_error:
-            print(f"Error with Gemini API: {api_error}")
-            return jsonify({"error": f"Gemini API error: {str(api_error)}"}), 500
+            logger.warning("Error with Gemini API: %s", api_error)
+            # Quota still exhausted after retries: tell the client to come back later
+            status = 429 if is_throttled(api_error) else 500
+            return jsonify({"error": f"Gemini API error: {str(api_error)}"}), status
 
     except Exception as e:
-        print(f"General Error: {str(e)}")
+        logger.exception("General Error")
         return jsonify({"error": str(e)}), 500
 
+def translate_segment(text, language):
+    # TRANSLATE_MODEL_NAME is 'gemini-pro' for better results
+    response = models.generate_content(
+        TRANSLATE_MODEL_NAME, translation_prompt(text, language), timeout=GEMINI_INTERACTIVE_TIMEOUT
+    )
+    # Extract only the translated text (remove any extra formatting)
+    return response.text.strip()
+
+# Segments of all documents being translated share these threads
+translation_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TRANSLATE_WORKERS", "8")), thread_name_prefix="translate"
+)
+
+translator = SegmentTranslator(
+    content_cache,
+    translate_segment,
+    translation_executor,
+    TRANSLATE_MODEL_NAME,
+    max_segment_chars=int(os.getenv("TRANSLATE_SEGMENT_CHARS", "1500")),
+)
+
 @app.route('/translate', methods=['POST'])
 def translate_text():
     try:
@@ -377,31 +1154,82 @@ def translate_text():
         if not text or not language:
             return jsonify({"error": "Text or language not provided"}), 400
 
-        print(f"Received text: {text}")
-        print(f"Target language: {language}")
+        logger.debug("Translating %d chars to %s", len(text), language)
 
-        # Call the Gemini API to translate the text
+        # Call the Gemini API to translate the text, one paragraph-sized segment at a time
         try:
-            model = genai.GenerativeModel('gemini-pro')  # Use 'gemini-pro' for better results
-            prompt = f"Translate the following text to {language}: {text}. Provide only the translated text without any additional explanations."
-            response = model.generate_content(prompt)
-            print(f"Translated text: {response.text}")
-
-            # Extract only the translated text (remove any extra formatting)
-            translated_text = response.text.strip()
+            translated_text = translator.translate(text, language)
+            logger.debug("Translation of %d chars", len(translated_text))
 
             # Return the translated text as JSON
             return jsonify({"translation": translated_text})
 
         except Exception as api_error:
-            print(f"Error with Gemini API: {api_error}")
-            return jsonify({"error": f"Gemini API error: {str(api_error)}"}), 500
+            logger.warning("Error with Gemini API: %s", api_error)
+            # Quota still exhausted after retries: tell the client to come back later
+            status = 429 if is_throttled(api_error) else 500
+            return jsonify({"error": f"Gemini API error: {str(api_error)}"}), status
 
     except Exception as e:
-        print(f"General Error: {str(e)}")
+        logger.exception("General Error")
         return jsonify({"error": str(e)}), 500
 
 
+_initialized_pid = None
+
+def init_worker(workers: int = None):
+    """
+    Per-process startup: configure the Gemini client, create the Mongo indexes and pick up
+    unfinished jobs. Runs in each server worker after it is forked, since clients and
+    job threads created in the parent would be shared with (or missing from) the children.
+
+    :param workers: Number of worker processes the server runs; each gets that share of
+                    the Gemini quotas unless GEMINI_QUOTA_SHARES is set, and of the CPUs
+                    for its PDF extraction pool unless PDF_WORKERS is set.
+    """
+    global _initialized_pid
+    if _initialized_pid == os.getpid():
+        return
+    _initialized_pid = os.getpid()
+
+    if workers and not GEMINI_QUOTA_SHARES:
+        gemini_limiter.set_shares(workers)
+    if workers:
+        set_server_workers(workers)
+
+    # Model handles built before the fork would keep the parent's client
+    models.clear()
+    get_genai()
+    try:
+        ensure_indexes()
+    except Exception as e:
+        logger.warning("Could not create MongoDB indexes: %s", e)
+    try:
+        # Jobs are claimed atomically, so every worker can resume; each runs a share of them
+        logger.info("Resumed %d unfinished roadmap jobs", job_queue.resume())
+        logger.info("Resumed %d unfinished content batches", pregeneration_queue.resume())
+    except Exception as e:
+        logger.warning("Could not resume roadmap jobs: %s", e)
+
+def shutdown_worker():
+    explain_similarity.save()
+    close_clients()
+
+def create_app(initialize: bool = True):
+    """
+    WSGI application factory for production servers (gunicorn.conf.py uses it).
+
+    :param initialize: Run init_worker() now. gunicorn.conf.py passes False: its master
+        process imports the app before forking and each worker initializes after the fork.
+    """
+    if initialize:
+        init_worker()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server; production runs create_app() under gunicorn (see gunicorn.conf.py)
+    debug = os.getenv("FLASK_DEBUG", "1") == "1"
+    # The debug reloader imports this module twice; only the serving child does the startup work
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_worker()
+    app.run(debug=debug, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,573 @@
+"""
+Asyncio serving mode: the routes of app.py on Quart, with async Gemini, HTTP and MongoDB
+clients, so one process can keep many slow LLM calls in flight instead of one per thread.
+
+    hypercorn app_async:app --bind 0.0.0.0:5000
+
+Roadmap generation and content pre-generation still run on the job queues of app.py;
+only their submission and status routes are served here.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+import httpx
+from quart import Quart, Response, g, request, jsonify, send_from_directory
+from quart_cors import cors
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app import (
+    EXPLAIN_MODEL_NAME, GEMINI_INTERACTIVE_TIMEOUT, SYLLABUS_MODEL_NAME, TRANSLATE_MODEL_NAME,
+    UPLOAD_MAX_BYTES, build_syllabus_prompt, delete_uploads, explain_similarity, gemini_limiter, init_worker,
+    job_queue, models, pregeneration_queue, roadmap_cache, roadmap_topics, section_cache, shutdown_worker, sse_event,
+    store_uploads, translator
+)
+from cache import AsyncContentCache
+from db import close_async_clients, get_async_db, pool_metrics
+from gemini import cancel_stream_async, estimate_tokens, is_throttled
+from jobs import QueueFullError
+from metrics import CONTENT_TYPE, REGISTRY, register_cache, request_seconds, span
+from roadmap_graph import compile_body, compile_graph, conditional_response, is_current
+from translation import join_segments, split_segments, translation_prompt
+from youtube import AsyncVideoLookup, VideoLookupError, video_url
+
+logger = logging.getLogger("app_async")
+
+app = Quart(__name__, static_folder='static', static_url_path='')
+
+app = cors(app, allow_origin="*")
+
+app.config["MAX_CONTENT_LENGTH"] = 2 * UPLOAD_MAX_BYTES + 1024 * 1024
+
+# Same keys and Mongo collection as the content cache of the threaded app
+content_cache = AsyncContentCache(
+    lambda: get_async_db()["content_cache"],
+    max_entries=int(os.getenv("CONTENT_CACHE_SIZE", "1024")),
+    ttl_seconds=int(os.getenv("CONTENT_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# Keep-alive connections to outside HTTP APIs, opened once per serving process
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+http_client = None
+
+video_cache = AsyncContentCache(
+    lambda: get_async_db()["video_cache"],
+    max_entries=int(os.getenv("VIDEO_CACHE_SIZE", "4096")),
+    ttl_seconds=int(os.getenv("VIDEO_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+video_lookup = AsyncVideoLookup(
+    video_cache,
+    lambda: http_client,
+    search_url=os.getenv("YOUTUBE_SEARCH_URL"),
+    api_key=os.getenv("YOUTUBE_API_KEY"),
+    batch_concurrency=int(os.getenv("YOUTUBE_BATCH_CONCURRENCY", "8")),
+)
+
+@app.before_serving
+async def startup():
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS)
+    )
+    # Gemini client, Mongo indexes and unfinished jobs, as in the threaded mode
+    await asyncio.to_thread(init_worker)
+
+@app.after_serving
+async def shutdown():
+    await http_client.aclose()
+    close_async_clients()
+    await asyncio.to_thread(shutdown_worker)
+
+register_cache("content", content_cache)
+register_cache("video", video_cache)
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+async def observe_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request_seconds.observe(time.perf_counter() - started, method=request.method, route=route,
+                                status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Prometheus scrape endpoint for this worker process."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.errorhandler(RequestEntityTooLarge)
+async def upload_too_large(e):
+    return jsonify({"error": f"Each PDF must be at most {round(UPLOAD_MAX_BYTES / (1024 * 1024), 1)} MB."}), 413
+
+# Serve React frontend
+@app.route('/')
+async def serve_frontend():
+    return await send_from_directory(app.static_folder, 'index.html')
+
+@app.route('/<path:path>')
+async def serve_static_files(path):
+    # Check if file exists in static folder
+    if os.path.exists(os.path.join(app.static_folder, path)):
+        return await send_from_directory(app.static_folder, path)
+    else:
+        # For client-side routing, return index.html
+        return await send_from_directory(app.static_folder, 'index.html')
+
+
+@app.route('/submit-form', methods=['POST'])
+async def submit_form():
+    """Queue roadmap generation for the submitted form and return the job ID to poll."""
+    try:
+        form = await request.form
+        files = await request.files
+        name = form.get('name')
+        career_interest = form.get('careerInterest')
+        expertise = form.get('expertise')
+        file1 = files.get('file1')
+        file2 = files.get('file2')
+
+        if not all([name, career_interest, expertise, file1, file2]):
+            return jsonify({"error": "All fields are required"}), 400
+
+        with span("store_upload"):
+            objective_pdf_id, curriculum_pdf_id = await asyncio.to_thread(store_uploads, file1, file2)
+
+        try:
+            job_id = await asyncio.to_thread(job_queue.submit, {
+                "name": name,
+                "career_interest": career_interest,
+                "expertise": expertise,
+                "objective_pdf_id": objective_pdf_id,
+                "curriculum_pdf_id": curriculum_pdf_id,
+            })
+        except Exception as e:
+            await asyncio.to_thread(delete_uploads, objective_pdf_id, curriculum_pdf_id)
+            if isinstance(e, QueueFullError):
+                return jsonify({"error": "Too many roadmaps are being generated. Please try again shortly."}), 503
+            raise
+
+        return jsonify({
+            "message": "Roadmap generation queued",
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }), 202
+
+    except RequestEntityTooLarge as e:
+        return await upload_too_large(e)
+    except Exception as e:
+        logger.exception("Unexpected error in submit_form")
+        return jsonify({
+            "error": "An unexpected error occurred while processing your request.",
+            "details": str(e)
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+async def get_job(job_id):
+    """Status of a queued job: queued, running (with stage and progress), succeeded or failed."""
+    try:
+        job = await asyncio.to_thread(job_queue.get, job_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    if job is None:
+        return jsonify({"error": f"No job found with id: {job_id}"}), 404
+
+    return jsonify(job)
+
+
+@app.route('/cache/roadmap', methods=['GET'])
+async def roadmap_cache_stats():
+    """Hit/miss counters of the curriculum roadmap cache and of the per-section cache."""
+    return jsonify(dict(roadmap_cache.stats(), sections=section_cache.stats()))
+
+@app.route('/cache/roadmap', methods=['DELETE'])
+async def invalidate_roadmap_cache():
+    """
+    Drop cached roadmaps. By default only entries from an older prompt version or model
+    are removed; pass ?all=true to clear the whole cache.
+    """
+    stale_only = request.args.get("all", "false").lower() != "true"
+    try:
+        removed = await asyncio.to_thread(roadmap_cache.invalidate, stale_only=stale_only)
+        removed += await asyncio.to_thread(section_cache.invalidate, stale_only=stale_only)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"removed": removed, "prompt_version": roadmap_cache.prompt_version})
+
+@app.route('/db/pool', methods=['GET'])
+async def db_pool_stats():
+    """Connection pool metrics of the MongoDB clients in this worker process."""
+    return jsonify(pool_metrics.snapshot())
+
+@app.route('/gemini/quota', methods=['GET'])
+async def gemini_quota_stats():
+    """Client-side Gemini quota counters and queue lengths per model."""
+    return jsonify(gemini_limiter.stats())
+
+@app.route('/cache/content', methods=['GET'])
+async def content_cache_stats():
+    """Hit/miss counters of the generated-content cache."""
+    return jsonify(content_cache.stats())
+
+
+@app.route('/api/roadmap', methods=['GET'])
+async def get_roadmap():
+    """Expose the roadmap data for React frontend."""
+    course_name = request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    document = await get_async_db()["content"].find_one(
+        {"name": course_name},
+        {"curriculum.roadMap": 1, "_id": 0}
+    )
+
+    if not document:
+        return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
+
+    roadmap_data = document.get("curriculum", {}).get("roadMap", {})
+    course_name = roadmap_data.get("course_name", "N/A")
+
+    body = json.dumps({"course_name": course_name, "roadmap": roadmap_data}, separators=(",", ":")).encode("utf-8")
+    return compiled_response(compile_body(body, encodings=()))
+
+def compiled_response(compiled):
+    status, body, headers = conditional_response(
+        compiled, request.headers.get("If-None-Match"), request.headers.get("Accept-Encoding")
+    )
+    return Response(body, status=status, headers=headers)
+
+async def stored_roadmap_graph(collection, course_name):
+    """app.stored_roadmap_graph on motor."""
+    document = await collection.find_one({"name": course_name}, {"roadmap_graph": 1})
+    if not document:
+        return None
+    if is_current(document.get("roadmap_graph")):
+        return document["roadmap_graph"]
+
+    document = await collection.find_one({"_id": document["_id"]}, {"curriculum.roadMap": 1})
+    compiled = compile_graph(document.get("curriculum", {}).get("roadMap", {}))
+    await collection.update_one({"_id": document["_id"]}, {"$set": {"roadmap_graph": compiled}})
+    return compiled
+
+@app.route('/api/roadmap/graph', methods=['GET'])
+async def get_roadmap_graph():
+    """Roadmap as laid-out nodes and edges, answered with 304 while it is unchanged."""
+    course_name = request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    with span("roadmap_graph_lookup"):
+        compiled = await stored_roadmap_graph(get_async_db()["content"], course_name)
+    if compiled is None:
+        return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
+
+    return compiled_response(compiled)
+
+@app.route('/getObj', methods=['GET'])
+async def get_obj():
+    course_name = request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    try:
+        document = await get_async_db()["content"].find_one({"name": course_name}, {"objective": 1, "_id": 0})
+
+        if not document:
+            return jsonify({
+                "error": f"No roadmap available for course: {course_name}"
+            }), 404
+
+        objective = document.get("objective", "")
+        return jsonify({"objective": objective})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/video', methods=['GET'])
+async def get_video():
+    topic = request.args.get('topic')
+    if not topic:
+        return jsonify({'error': 'Topic parameter is required'}), 400
+
+    try:
+        video_id = await video_lookup.find(topic)
+    except VideoLookupError as e:
+        logger.warning("%s", e)
+        return jsonify({'error': str(e)}), 502
+
+    if not video_id:
+        return jsonify({'error': 'No videos found for the topic'}), 404
+
+    return jsonify({'message': f'Video found for topic: {topic}', 'video_url': video_url(video_id)})
+
+@app.route('/api/roadmap/videos', methods=['GET'])
+async def get_roadmap_videos():
+    """Video URL for every topic of a stored roadmap (null where YouTube has none)."""
+    course_name = request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    document = await get_async_db()["content"].find_one({"name": course_name}, {"curriculum.roadMap": 1, "_id": 0})
+    if not document:
+        return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
+
+    roadmap_data = document.get("curriculum", {}).get("roadMap", {})
+    results = await video_lookup.find_many(roadmap_topics(roadmap_data))
+
+    return jsonify({
+        "course_name": roadmap_data.get("course_name", "N/A"),
+        "videos": {
+            topic: video_url(video_id) if video_id and not isinstance(video_id, Exception) else None
+            for topic, video_id in results.items()
+        },
+        "errors": {topic: str(error) for topic, error in results.items() if isinstance(error, Exception)}
+    })
+
+@app.route('/cache/video', methods=['GET'])
+async def video_cache_stats():
+    """Hit/miss counters of the topic-to-video cache."""
+    return jsonify(video_cache.stats())
+
+@app.route('/cache/explain', methods=['GET'])
+async def explain_similarity_stats():
+    """Hit/miss counters of the near-duplicate /explain cache."""
+    return jsonify(dict(explain_similarity.stats(), threshold=explain_similarity.threshold))
+
+
+async def generate_text(model_name, prompt):
+    response = await models.generate_content_async(model_name, prompt, timeout=GEMINI_INTERACTIVE_TIMEOUT)
+    return response.text
+
+async def generate_syllabus_content(objectives, title):
+    """
+    Generate educational content using Google's Gemini Pro model.
+    """
+    prompt = build_syllabus_prompt(objectives, title)
+
+    try:
+        return await content_cache.get_or_compute(
+            "syllabus",
+            SYLLABUS_MODEL_NAME,
+            {"objectives": objectives, "title": title},
+            lambda: generate_text(SYLLABUS_MODEL_NAME, prompt),
+        )
+    except Exception as e:
+        logger.warning("Error generating content: %s", e)
+        return f"Error generating content: {str(e)}"
+
+@app.route('/generate-content', methods=['POST'])
+async def generate_content():
+    data = await request.get_json()
+    objectives = data.get('objective', '')
+    title = data.get('selectedTopic', '')
+
+    response = await generate_syllabus_content(objectives, title)
+    return jsonify({'content': response})
+
+
+@app.route('/api/roadmap/pregenerate', methods=['POST'])
+async def pregenerate_roadmap_content():
+    """
+    Queue content generation for every topic of a stored roadmap. Poll /jobs/<id> for
+    progress; generated topics are then served by /generate-content from storage.
+    """
+    data = await request.get_json(silent=True) or {}
+    course_name = data.get("name") or request.args.get("name")
+
+    if not course_name:
+        return jsonify({"error": "Course name is required."}), 400
+
+    try:
+        if not await get_async_db()["content"].find_one({"name": course_name}, {"_id": 1}):
+            return jsonify({"error": f"No roadmap available for course: {course_name}"}), 404
+        job_id = await asyncio.to_thread(pregeneration_queue.submit, {"name": course_name})
+    except QueueFullError:
+        return jsonify({"error": "Too many batches are being generated. Please try again shortly."}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "message": "Content generation queued",
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}"
+    }), 202
+
+
+async def stream_generation(namespace, model_name, inputs, prompt):
+    """
+    Relay a Gemini generation as server-sent events, like stream_generation in app.py.
+    A client disconnect closes the generator, which cancels the upstream stream in its finally.
+    """
+    cached = await content_cache.get(namespace, model_name, inputs)
+
+    async def events():
+        if cached is not None:
+            yield sse_event({"text": cached, "cached": True})
+            yield sse_event({}, "done")
+            return
+
+        response = None
+        parts = []
+        completed = False
+        # The model slot is held for the whole stream, not just the first chunk
+        async with models.limit_async(model_name):
+            try:
+                response = await models.call_async(
+                    model_name,
+                    lambda: models.get(model_name).generate_content_async(prompt, stream=True),
+                    tokens=estimate_tokens(prompt),
+                    timeout=GEMINI_INTERACTIVE_TIMEOUT,
+                    use_slot=False
+                )
+                async for chunk in response:
+                    parts.append(chunk.text)
+                    yield sse_event({"text": chunk.text})
+                completed = True
+            except Exception as api_error:
+                logger.warning("Error with Gemini API: %s", api_error)
+                yield sse_event({"error": f"Gemini API error: {str(api_error)}"}, "error")
+                return
+            finally:
+                # Client disconnects close this generator mid-stream; stop paying for the rest
+                if not completed and response is not None:
+                    await cancel_stream_async(response)
+
+        await content_cache.set(namespace, model_name, inputs, "".join(parts))
+        yield sse_event({}, "done")
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/generate-content/stream', methods=['POST'])
+async def generate_content_stream():
+    """Streaming variant of /generate-content."""
+    data = await request.get_json()
+    objectives = data.get('objective', '')
+    title = data.get('selectedTopic', '')
+
+    return await stream_generation(
+        "syllabus",
+        SYLLABUS_MODEL_NAME,
+        {"objectives": objectives, "title": title},
+        build_syllabus_prompt(objectives, title)
+    )
+
+@app.route('/explain/stream', methods=['POST'])
+async def explain_text_stream():
+    """Streaming variant of /explain."""
+    data = await request.get_json()
+    copied_text = data.get("text")
+
+    if not copied_text:
+        return jsonify({"error": "No text provided"}), 400
+
+    return await stream_generation(
+        "explain",
+        EXPLAIN_MODEL_NAME,
+        {"text": copied_text},
+        f"Explain this: {copied_text}"
+    )
+
+@app.route('/explain', methods=['POST', 'OPTIONS'])
+async def explain_text():
+    if request.method == 'OPTIONS':
+        # Handle preflight requests
+        return '', 204
+
+    try:
+        data = await request.get_json()
+        copied_text = data.get("text")
+
+        if not copied_text:
+            return jsonify({"error": "No text provided"}), 400
+
+        try:
+            # Embedding and the index scan are CPU work; keep them off the event loop
+            found = await asyncio.to_thread(explain_similarity.lookup, copied_text)
+            if found is not None:
+                return jsonify({"explanation": found[0]})
+            explanation = await content_cache.get_or_compute(
+                "explain",
+                EXPLAIN_MODEL_NAME,
+                {"text": copied_text},
+                lambda: generate_text(EXPLAIN_MODEL_NAME, f"Explain this: {copied_text}"),
+            )
+            await asyncio.to_thread(explain_similarity.add, copied_text, explanation)
+            return jsonify({"explanation": explanation})
+
+        except Exception as api_error:
+            logger.warning("Error with Gemini API: %s", api_error)
+            # Quota still exhausted after retries: tell the client to come back later
+            status = 429 if is_throttled(api_error) else 500
+            return jsonify({"error": f"Gemini API error: {str(api_error)}"}), status
+
+    except Exception as e:
+        logger.exception("General Error")
+        return jsonify({"error": str(e)}), 500
+
+async def translate_document(text, language):
+    """Segmented translation as in SegmentTranslator, with the segments awaited concurrently."""
+    async def translate_one(segment):
+        async def translate():
+            return (await generate_text(TRANSLATE_MODEL_NAME, translation_prompt(segment, language))).strip()
+
+        return await content_cache.get_or_compute(
+            "translate",
+            TRANSLATE_MODEL_NAME,
+            {"text": segment, "language": language.strip().lower()},
+            translate,
+        )
+
+    parts = split_segments(text, translator.max_segment_chars)
+    segments = [value for kind, value in parts if kind == "text"]
+    return join_segments(parts, await asyncio.gather(*(translate_one(segment) for segment in segments)))
+
+@app.route('/translate', methods=['POST'])
+async def translate_text():
+    try:
+        data = await request.get_json()
+        text = data.get("text")
+        language = data.get("language")
+
+        if not text or not language:
+            return jsonify({"error": "Text or language not provided"}), 400
+
+        try:
+            translated_text = await translate_document(text, language)
+            return jsonify({"translation": translated_text})
+
+        except Exception as api_error:
+            logger.warning("Error with Gemini API: %s", api_error)
+            # Quota still exhausted after retries: tell the client to come back later
+            status = 429 if is_throttled(api_error) else 500
+            return jsonify({"error": f"Gemini API error: {str(api_error)}"}), status
+
+    except Exception as e:
+        logger.exception("General Error")
+        return jsonify({"error": str(e)}), 500
+
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,103 @@
+"""
+Seed a scratch database with roadmap documents and time the course lookups before and
+after the indexes and projections. Needs a local mongod (MONGODB_URI or --uri).
+
+    python benchmarks/bench_course_lookup.py --documents 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ensure_indexes, get_client
+
+
+def make_document(i):
+    units = [
+        {
+            "unit_number": str(u),
+            "unit_title": f"Unit {u} of course {i}",
+            "topics": [f"Topic {u}.{t} of course {i}" for t in range(8)],
+        }
+        for u in range(1, 6)
+    ]
+    return {
+        "name": f"student-{i}",
+        "career_interest": "Software Engineering",
+        "expertise": "Beginner",
+        "objective": "Learning objectives. " * 400,
+        "curriculum": {"roadMap": {"course_name": f"Course {i % 5000}", "roadmap": units}},
+    }
+
+
+def seed(collection, count, batch_size=2000):
+    collection.drop()
+    for start in range(0, count, batch_size):
+        collection.insert_many([make_document(i) for i in range(start, min(start + batch_size, count))],
+                               ordered=False)
+
+
+def timed(queries, lookup):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        lookup(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--database", default="education_bench")
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=5,
+                        help="queries for the Python-side full scan, which is very slow")
+    args = parser.parse_args()
+
+    db = get_client(args.uri)[args.database]
+    content = db["content"]
+    seed(content, args.documents)
+
+    names = [f"student-{random.randrange(args.documents)}" for _ in range(args.queries)]
+    courses = [f"Course {random.randrange(5000)}" for _ in range(args.queries)]
+
+    def scan_by_course(course):
+        # read_documents_by_course before: every document shipped to Python and filtered there
+        return [doc for doc in content.find() if doc["curriculum"]["roadMap"]["course_name"] == course]
+
+    before = {
+        "roadmap_by_name": timed(names, lambda name: list(content.find({"name": name}))[:1]),
+        "objective_by_name": timed(names, lambda name: content.find_one({"name": name})),
+        "documents_by_course": timed(courses[:args.scan_queries], scan_by_course),
+    }
+
+    ensure_indexes(db)
+
+    after = {
+        "roadmap_by_name": timed(names, lambda name: content.find_one(
+            {"name": name}, {"curriculum.roadMap": 1, "_id": 0})),
+        "objective_by_name": timed(names, lambda name: content.find_one(
+            {"name": name}, {"objective": 1, "_id": 0})),
+        "documents_by_course": timed(courses, lambda course: list(content.find(
+            {"curriculum.roadMap.course_name": course}))),
+    }
+
+    print(json.dumps({"documents": args.documents, "before": before, "after": after}, indent=2))
+    db.drop_collection("content")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare the old sequential fixed-interval readiness loop with the concurrent backoff
+waiter in gemini.py, against the local fake file API.
+
+    python benchmarks/bench_file_readiness.py --processing 1,2,1.5 --files 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_genai import FakeFileAPI
+from gemini import wait_for_files_active
+
+
+def legacy_wait(files, get_file, interval):
+    """The loop wait_for_files_active used before: one file at a time, fixed sleep."""
+    for name in (file.name for file in files):
+        file = get_file(name)
+        while file.state.name == "PROCESSING":
+            time.sleep(interval)
+            file = get_file(name)
+        if file.state.name != "ACTIVE":
+            raise Exception(f"File {file.name} failed to process")
+
+
+def run(waiter, processing_times, file_count, get_latency):
+    api = FakeFileAPI(processing_times=processing_times, get_latency=get_latency)
+    files = [api.upload_file(f"doc-{i}.pdf") for i in range(file_count)]
+    start = time.perf_counter()
+    waiter(files, api.get_file)
+    return {"seconds": round(time.perf_counter() - start, 3), "get_file_calls": api.get_calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processing", default="1,2,1.5",
+                        help="comma separated processing times in seconds, cycled over the files")
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--legacy-interval", type=float, default=10.0)
+    parser.add_argument("--get-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    processing_times = [float(value) for value in args.processing.split(",")]
+    results = {
+        "files": args.files,
+        "processing_times": processing_times,
+        "legacy": run(lambda files, get_file: legacy_wait(files, get_file, args.legacy_interval),
+                      processing_times, args.files, args.get_latency),
+        "concurrent_backoff": run(lambda files, get_file: wait_for_files_active(files, get_file=get_file),
+                                  processing_times, args.files, args.get_latency),
+    }
+    results["speedup"] = round(results["legacy"]["seconds"] / results["concurrent_backoff"]["seconds"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
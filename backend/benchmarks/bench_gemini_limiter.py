@@ -0,0 +1,97 @@
+"""
+Drive a burst of mixed interactive and bulk calls at a fake Gemini backend that
+throttles above its quota, with and without the client-side QuotaLimiter and retries.
+
+    python benchmarks/bench_gemini_limiter.py --bulk 40 --interactive 20 --server-rpw 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Models are built through the configured genai module; the fake needs no real key
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import gemini
+from fake_genai import FakeGeminiBackend
+from gemini import BULK, INTERACTIVE, ModelRegistry, QuotaLimiter
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 3)
+
+
+def run(registry, bulk, interactive, timeout):
+    latencies = {INTERACTIVE: [], BULK: []}
+    errors = {INTERACTIVE: 0, BULK: 0}
+    lock = threading.Lock()
+
+    def worker(priority, i):
+        start = time.perf_counter()
+        try:
+            registry.generate_content("fake-model", f"prompt {priority}-{i}", priority=priority, timeout=timeout)
+        except Exception:
+            with lock:
+                errors[priority] += 1
+            return
+        with lock:
+            latencies[priority].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(BULK, i)) for i in range(bulk)]
+    # Interactive requests arrive just after the bulk burst
+    threads += [threading.Thread(target=worker, args=(INTERACTIVE, i)) for i in range(interactive)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = {"wall_seconds": round(time.perf_counter() - start, 3)}
+    for priority, label in ((INTERACTIVE, "interactive"), (BULK, "bulk")):
+        summary[label] = {
+            "ok": len(latencies[priority]),
+            "failed": errors[priority],
+            "p50_s": percentile(latencies[priority], 0.5),
+            "p95_s": percentile(latencies[priority], 0.95),
+            "mean_s": round(statistics.fmean(latencies[priority]), 3) if latencies[priority] else None,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bulk", type=int, default=40)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--server-rpw", type=int, default=10, help="fake server quota per window")
+    parser.add_argument("--window", type=float, default=1.0, help="quota window in seconds")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--unavailable-rate", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("no_limiter", "limiter"):
+        backend = FakeGeminiBackend(args.server_rpw, args.window, args.latency, args.unavailable_rate, seed=1)
+        gemini.get_genai(configure=False).GenerativeModel = backend.model
+        if mode == "limiter":
+            # Stay just under the server quota; the period is the fake window instead of a minute
+            limiter = QuotaLimiter(default_rpm=args.server_rpw * 0.9, default_tpm=10_000_000, period=args.window)
+            registry = ModelRegistry(limiter=limiter, retry_base_delay=0.1, retry_max_delay=1.0)
+        else:
+            registry = ModelRegistry(max_retries=0)
+        results[mode] = run(registry, args.bulk, args.interactive, args.timeout)
+        results[mode]["server"] = dict(backend.counts)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
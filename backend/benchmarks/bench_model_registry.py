@@ -0,0 +1,69 @@
+"""
+Micro-benchmark of the per-request cost of building a GenerativeModel (what every
+endpoint used to do) against fetching the shared handle from the ModelRegistry.
+No request is sent to Gemini.
+
+    python benchmarks/bench_model_registry.py --iterations 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+from gemini import ModelRegistry
+
+GENERATION_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_mime_type": "application/json",
+}
+
+# Roughly the size of the roadmap system instruction
+SYSTEM_INSTRUCTION = "Generate a detailed roadmap in JSON format. " * 60
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - start) / iterations * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY", "benchmark"))
+    registry = ModelRegistry()
+
+    cases = {
+        "plain": dict(model_name="gemini-1.5-flash"),
+        "roadmap": dict(model_name="gemini-2.0-flash", generation_config=GENERATION_CONFIG,
+                        system_instruction=SYSTEM_INSTRUCTION),
+    }
+
+    results = {}
+    for case, options in cases.items():
+        construct = per_call_us(lambda: genai.GenerativeModel(**options), args.iterations)
+        cached = per_call_us(lambda: registry.get(options["model_name"], options.get("generation_config"),
+                                                  options.get("system_instruction")), args.iterations)
+        results[case] = {
+            "construct_per_request_us": construct,
+            "registry_get_us": cached,
+            "speedup": round(construct / cached, 1),
+        }
+
+    print(json.dumps({"iterations": args.iterations, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Generate a multi-hundred-page text PDF locally and compare the old page loop with the
+page-parallel read_pdf and the streaming iter_pdf_pages.
+
+    python benchmarks/bench_pdf_extraction.py --pages 400
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from pdfExtraction import _pool_workers, iter_pdf_pages, read_pdf
+
+LINE = "Students will analyse process scheduling, memory management and file systems."
+
+
+def write_text_pdf(path, pages, lines_per_page=45):
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for number in range(pages):
+        page = PageObject.create_blank_page(width=612, height=792)
+        lines = " ".join(f"({number + 1}.{i} {LINE}) '" for i in range(lines_per_page))
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 10 Tf 12 TL 36 770 Td {lines} ET".encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        writer.add_page(page)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def legacy_read_pdf(file_path):
+    """read_pdf before: one page at a time with repeated string concatenation."""
+    reader = PdfReader(file_path)
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text()
+    return text
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, round(time.perf_counter() - start, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "objective.pdf")
+        write_text_pdf(path, args.pages)
+
+        legacy_text, legacy_seconds = timed(lambda: legacy_read_pdf(path))
+        # The first call also starts the worker processes; report it separately
+        _, cold_seconds = timed(lambda: read_pdf(path))
+        parallel_text, parallel_seconds = timed(lambda: read_pdf(path))
+        assert parallel_text == legacy_text
+
+        start = time.perf_counter()
+        pages = iter_pdf_pages(path)
+        next(pages)
+        first_page_seconds = round(time.perf_counter() - start, 3)
+
+        print(json.dumps({
+            "pages": args.pages,
+            "characters": len(legacy_text),
+            "workers": _pool_workers(),
+            "legacy_seconds": legacy_seconds,
+            "parallel_cold_seconds": cold_seconds,
+            "parallel_warm_seconds": parallel_seconds,
+            "speedup_warm": round(legacy_seconds / parallel_seconds, 2),
+            "stream_first_page_seconds": first_page_seconds,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Generate roadmaps from a fake model whose replies are sometimes malformed or cut off at
+the output limit, parsing them the old way (json.loads, regenerate from scratch on any
+error) and with roadmap_json (repair, keep complete units and continue after them).
+Reports replies per roadmap, failures and generated vs. discarded output tokens.
+
+    python benchmarks/bench_roadmap_repair.py --roadmaps 200 --units 12 --max-output-tokens 1500 --defect-rate 0.2
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_genai import FakeGeminiBackend
+from roadmap_json import RoadmapFormatError, generate_roadmap, read_stream
+
+REQUEST = "Generate a detailed roadmap in JSON format based on the uploaded document."
+
+
+def output_tokens(response):
+    return len(response.text) // 4
+
+
+def strict(model, max_attempts):
+    """The previous pipeline: one reply per attempt, parsed whole."""
+    stats = {"calls": 0, "output_tokens": 0, "discarded_tokens": 0}
+    for _ in range(max_attempts):
+        response = model.start_chat().send_message(REQUEST)
+        stats["calls"] += 1
+        stats["output_tokens"] += output_tokens(response)
+        try:
+            json.loads(response.text)["roadMap"]["roadmap"]
+            return True, stats
+        except (ValueError, KeyError, TypeError):
+            stats["discarded_tokens"] += output_tokens(response)
+    return False, stats
+
+
+def incremental(model, max_continuations):
+    chat = model.start_chat()
+    produced = []
+
+    def send_message(message):
+        response = chat.send_message(message, stream=True)
+        produced.append(output_tokens(response))
+        return read_stream(response)
+
+    try:
+        _, stats = generate_roadmap(send_message, REQUEST, max_continuations)
+        ok = True
+    except RoadmapFormatError:
+        stats = {"calls": len(produced), "discarded_tokens": sum(produced)}
+        ok = False
+    return ok, {"calls": stats["calls"], "output_tokens": sum(produced), "discarded_tokens": stats["discarded_tokens"]}
+
+
+def run(strategy, args):
+    backend = FakeGeminiBackend(requests_per_window=10 ** 9, latency=0, seed=1, roadmap_units=args.units,
+                                max_output_tokens=args.max_output_tokens, defect_rate=args.defect_rate)
+    model = backend.model()
+    totals = {"roadmaps": args.roadmaps, "failed": 0, "calls": 0, "output_tokens": 0, "discarded_tokens": 0}
+    for _ in range(args.roadmaps):
+        ok, stats = strategy(model, args.attempts) if strategy is strict else strategy(model, args.attempts - 1)
+        totals["failed"] += not ok
+        for key in ("calls", "output_tokens", "discarded_tokens"):
+            totals[key] += stats[key]
+    totals["calls_per_roadmap"] = round(totals["calls"] / args.roadmaps, 2)
+    totals["retry_rate"] = round((totals["calls"] - args.roadmaps) / args.roadmaps, 2)
+    totals["discarded_share"] = round(totals["discarded_tokens"] / max(1, totals["output_tokens"]), 3)
+    totals["server"] = dict(backend.counts)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--roadmaps", type=int, default=200)
+    parser.add_argument("--units", type=int, default=12, help="units per roadmap")
+    parser.add_argument("--max-output-tokens", type=int, default=None,
+                        help="cut replies off here; a 12-unit roadmap is about 1200 tokens")
+    parser.add_argument("--defect-rate", type=float, default=0.2)
+    parser.add_argument("--attempts", type=int, default=4, help="replies allowed per roadmap")
+    args = parser.parse_args()
+
+    results = {"strict": run(strict, args), "incremental": run(incremental, args)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Requests per second of the development server `python app.py` runs (Werkzeug, debugger
+on) against gunicorn.conf.py with gthread and gevent workers. Each mode is started with
+serve_stubbed.py; the time until it answers is reported as startup_s, then every scenario
+is driven at a fixed number of concurrent clients.
+
+    python benchmarks/bench_serving.py --requests 2000 --concurrency 64 --workers 4
+
+Scenarios: quota is a trivial JSON route (framework and server overhead only), explain_cached
+repeats a few highlights (cache hits), explain sends unique texts that each wait --latency
+seconds for the fake Gemini.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import run_load, start_server
+
+# serve_stubbed.py mode and arguments of each measured setup
+MODES = {
+    "dev": ("dev", []),
+    "gthread": ("gunicorn", ["--worker-class", "gthread"]),
+    "gevent": ("gunicorn", ["--worker-class", "gevent"]),
+}
+
+
+async def drive(base_url, args):
+    # A connection per request by default: the development server closes every connection
+    # anyway, and with many idle keep-alive connections httpx's pool rather than the server
+    # became the bottleneck in trial runs
+    keepalive = args.concurrency if args.keepalive else 0
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=keepalive)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def quota(i):
+            return (await client.get("/gemini/quota")).status_code == 200
+
+        async def explain_cached(i):
+            text = f"paging and segmentation in operating systems {i % 8}"
+            return (await client.post("/explain", json={"text": text})).status_code == 200
+
+        async def explain(i):
+            # Random text, so neither the exact nor the similarity cache can answer it
+            text = " ".join(uuid.uuid4().hex for _ in range(4))
+            return (await client.post("/explain", json={"text": text})).status_code == 200
+
+        scenarios = {"quota": quota, "explain_cached": explain_cached, "explain": explain}
+        return {name: await run_load(scenarios[name], args.requests, args.concurrency)
+                for name in args.scenarios.split(",")}
+
+
+def run_mode(mode, port, args):
+    server_mode, server_args = MODES[mode]
+    started = time.perf_counter()
+    process, base_url = start_server(server_mode, port, [
+        *server_args, "--workers", str(args.workers), "--threads", str(args.threads), "--latency", str(args.latency),
+    ])
+    startup = round(time.perf_counter() - started, 2)
+    try:
+        return {"startup_s": startup, **asyncio.run(drive(base_url, args))}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=32, help="threads per gthread worker")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake Gemini call")
+    parser.add_argument("--modes", default="dev,gthread,gevent")
+    parser.add_argument("--scenarios", default="quota,explain_cached,explain")
+    parser.add_argument("--keepalive", action="store_true", help="reuse connections between requests")
+    parser.add_argument("--port", type=int, default=5201)
+    args = parser.parse_args()
+
+    results = {
+        "cpus": os.cpu_count(),
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "gemini_latency_s": args.latency,
+        "keepalive": args.keepalive,
+    }
+    for offset, mode in enumerate(args.modes.split(",")):
+        results[mode] = run_mode(mode, args.port + offset, args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Replay highlights of a set of passages through SimilarityCache, the way students select
+slightly different spans of the same paragraph, and report per threshold the share of
+requests answered from the index, false hits (answered with another text's value) and
+lookup latency, with the span overlap check and by cosine similarity only.
+
+A share of the requests (--near-misses) are near misses of a passage: one word in its
+middle swapped for another or a "not" inserted. They need their own answer, so any hit
+on them is a false hit.
+
+    python benchmarks/bench_similarity_cache.py --passages 500 --requests 5000 --thresholds 0.8 0.85 0.9 0.95
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity_cache import HashingEmbedder, SimilarityCache
+
+WORDS = ("process thread memory page frame scheduler kernel interrupt deadlock semaphore mutex "
+         "file inode disk cache buffer queue stack heap pointer register instruction pipeline "
+         "network packet socket protocol router address table index query transaction").split()
+
+
+def make_passages(count, rng):
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 80))) for _ in range(count)]
+
+
+def highlight(passage, rng, jitter):
+    """A span covering most of the passage, its ends moved by up to jitter words."""
+    words = passage.split()
+    start = rng.randint(0, jitter)
+    stop = len(words) - rng.randint(0, jitter)
+    return " ".join(words[start:stop])
+
+
+def near_miss(passage, rng):
+    """(kind, text) of passage with one word in its middle half swapped, or a "not" inserted."""
+    words = passage.split()
+    position = rng.randrange(len(words) // 4, 3 * len(words) // 4)
+    if rng.random() < 0.5:
+        words[position] = rng.choice([word for word in WORDS if word != words[position]])
+        return f"swap{position}{words[position]}", " ".join(words)
+    return f"not{position}", " ".join(words[:position] + ["not"] + words[position:])
+
+
+def run(threshold, requests, args, min_overlap):
+    cache = SimilarityCache(HashingEmbedder(args.dim), threshold=threshold, max_entries=args.size,
+                            min_overlap=min_overlap)
+    false_hits = 0
+    latencies = []
+    for index, text in requests:
+        started = time.perf_counter()
+        found = cache.lookup(text)
+        latencies.append(time.perf_counter() - started)
+        if found is None:
+            cache.add(text, index)
+        elif found[0] != index:
+            false_hits += 1
+
+    latencies.sort()
+    stats = cache.stats()
+    return {
+        "hit_ratio": round(stats["hit_ratio"], 3),
+        # Every passage and near miss has to be explained once, so this is the best any cache can do
+        "best_hit_ratio": round(1 - len({index for index, _ in requests}) / len(requests), 3),
+        "false_hits": false_hits,
+        "lookup_p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "lookup_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        "entries": stats["local_entries"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--passages", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--jitter", type=int, default=5, help="words trimmed at most from each end")
+    parser.add_argument("--near-misses", type=float, default=0.2, help="share of requests that are near misses")
+    parser.add_argument("--min-overlap", type=float, default=0.7)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--size", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    passages = make_passages(args.passages, rng)
+    requests = []
+    for _ in range(args.requests):
+        index = rng.randrange(len(passages))
+        passage = passages[index]
+        if rng.random() < args.near_misses:
+            kind, passage = near_miss(passage, rng)
+            index = f"{index}-{kind}"
+        requests.append((index, highlight(passage, rng, args.jitter)))
+
+    results = {}
+    for threshold in args.thresholds:
+        results[str(threshold)] = {
+            "span_overlap": run(threshold, requests, args, args.min_overlap),
+            "cosine_only": run(threshold, requests, args, None),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
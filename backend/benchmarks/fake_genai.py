@@ -0,0 +1,225 @@
+"""
+Local stand-in for the parts of google.generativeai used by the backend, so the
+pipeline can be exercised and benchmarked without network access or an API key.
+"""
+
+import asyncio
+import collections
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from google.api_core import exceptions as api_exceptions
+
+
+class _State:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeFile:
+    def __init__(self, name, display_name, state):
+        self.name = name
+        self.display_name = display_name
+        self.uri = f"https://fake.genai.local/{name}"
+        self.state = _State(state)
+
+
+class FakeFileAPI:
+    """
+    Mimics genai.upload_file / genai.get_file. Every uploaded file stays PROCESSING for
+    the next value of processing_times (seconds), then turns ACTIVE.
+    """
+
+    def __init__(self, processing_times=(1.5,), get_latency: float = 0.05, upload_latency: float = 0.0,
+                 fail_names=()):
+        self._processing_times = itertools.cycle(processing_times)
+        self.get_latency = get_latency
+        self.upload_latency = upload_latency
+        self.fail_names = set(fail_names)
+        self._ready_at = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.get_calls = 0
+
+    def upload_file(self, path, mime_type=None, **kwargs):
+        time.sleep(self.upload_latency)
+        with self._lock:
+            name = f"files/fake-{next(self._counter)}"
+            self._ready_at[name] = time.monotonic() + next(self._processing_times)
+        display_name = getattr(path, "name", path)
+        return FakeFile(name, str(display_name), "PROCESSING")
+
+    def get_file(self, name):
+        time.sleep(self.get_latency)
+        with self._lock:
+            self.get_calls += 1
+            ready_at = self._ready_at[name]
+        if name in self.fail_names:
+            return FakeFile(name, name, "FAILED")
+        state = "ACTIVE" if time.monotonic() >= ready_at else "PROCESSING"
+        return FakeFile(name, name, state)
+
+
+class _Usage:
+    def __init__(self, total_token_count):
+        self.total_token_count = total_token_count
+
+
+class _Candidate:
+    def __init__(self, finish_reason):
+        self.finish_reason = _State(finish_reason)
+
+
+class FakeResponse:
+    """
+    A generate response; iterating it yields chunks of chunk_size characters, like a
+    response requested with stream=True (or the response itself when chunk_size is None).
+    """
+
+    def __init__(self, text, total_token_count, finish_reason="STOP", chunk_size=None):
+        self.text = text
+        self.usage_metadata = _Usage(total_token_count)
+        self.candidates = [_Candidate(finish_reason)]
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        if self.chunk_size is None:
+            yield self
+            return
+        for start in range(0, len(self.text), self.chunk_size):
+            yield FakeResponse(self.text[start:start + self.chunk_size], 0)
+
+
+class FakeGeminiBackend:
+    """
+    Fake generation service with a server-side quota: more than requests_per_window calls
+    within window seconds are answered with 429 ResourceExhausted, like Gemini does.
+    A fraction of calls can also fail with 503.
+    """
+
+    def __init__(self, requests_per_window: int = 10, window: float = 1.0, latency: float = 0.05,
+                 unavailable_rate: float = 0.0, seed: int = None, roadmap_units: int = 5,
+                 max_output_tokens: int = None, defect_rate: float = 0.0):
+        """
+        :param roadmap_units: Units in the roadmaps chat sessions return.
+        :param max_output_tokens: Roadmap replies longer than this (four characters per
+            token) are cut off with finish reason MAX_TOKENS.
+        :param defect_rate: Share of roadmap replies with a code fence, trailing commas or
+            a missing closing bracket.
+        """
+        self.requests_per_window = requests_per_window
+        self.window = window
+        self.latency = latency
+        self.unavailable_rate = unavailable_rate
+        self.roadmap_units = roadmap_units
+        self.max_output_tokens = max_output_tokens
+        self.defect_rate = defect_rate
+        self._random = random.Random(seed)
+        self._calls = collections.deque()
+        self._lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def model(self, model_name="fake-model", generation_config=None, system_instruction=None, **kwargs):
+        """Drop-in replacement for genai.GenerativeModel."""
+        return FakeGenerativeModel(self, model_name)
+
+    def _admit(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and self._calls[0] <= now - self.window:
+                self._calls.popleft()
+            if len(self._calls) >= self.requests_per_window:
+                self.counts["throttled"] += 1
+                raise api_exceptions.ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+            self._calls.append(now)
+            if self._random.random() < self.unavailable_rate:
+                self.counts["unavailable"] += 1
+                raise api_exceptions.ServiceUnavailable("503 The service is currently unavailable.")
+            self.counts["served"] += 1
+
+
+def fake_roadmap(course_name="Operating Systems", units=5, topics_per_unit=6) -> dict:
+    """A response in the shape the roadmap prompt asks Gemini for."""
+    return {"roadMap": {
+        "course_name": course_name,
+        "roadmap": [
+            {
+                "unit_number": str(u),
+                "unit_title": f"Unit {u} of {course_name}",
+                "topics": [f"{course_name} topic {u}.{t}" for t in range(1, topics_per_unit + 1)],
+            }
+            for u in range(1, units + 1)
+        ],
+    }}
+
+
+ROADMAP_DEFECTS = ("fence", "trailing_comma", "unclosed")
+
+
+def _with_defect(text, defect):
+    if defect == "fence":
+        return f"```json\n{text}\n```"
+    if defect == "trailing_comma":
+        return re.sub(r'"(\n\s*\])', r'",\1', text)
+    return text.rstrip()[:-1]
+
+
+class FakeChatSession:
+    """
+    Replies with the roadmap as indented JSON. A message asking to continue "after unit N"
+    gets the units after N, the way the roadmap continuation prompt asks for them.
+    """
+
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        backend = self.model.backend
+        backend._admit()
+        time.sleep(backend.latency)
+
+        roadmap = fake_roadmap(units=backend.roadmap_units)
+        after = re.search(r"after unit (\d+)", str(content))
+        if after:
+            roadmap["roadMap"]["roadmap"] = roadmap["roadMap"]["roadmap"][int(after.group(1)):]
+        text = json.dumps(roadmap, indent=2)
+
+        with backend._lock:
+            defect = backend._random.choice(ROADMAP_DEFECTS) if backend._random.random() < backend.defect_rate else None
+        if defect:
+            backend.counts[f"defect_{defect}"] += 1
+            text = _with_defect(text, defect)
+        finish_reason = "STOP"
+        if backend.max_output_tokens and len(text) > backend.max_output_tokens * 4:
+            backend.counts["truncated"] += 1
+            text = text[:backend.max_output_tokens * 4]
+            finish_reason = "MAX_TOKENS"
+
+        self.history += [content, text]
+        return FakeResponse(text, len(text) // 4 + 2000, finish_reason, chunk_size=256 if stream else None)
+
+
+class FakeGenerativeModel:
+    def __init__(self, backend, model_name):
+        self.backend = backend
+        self.model_name = model_name
+
+    def start_chat(self, history=None, **kwargs):
+        return FakeChatSession(self, history)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.backend._admit()
+        time.sleep(self.backend.latency)
+        prompt = contents if isinstance(contents, str) else str(contents)
+        return FakeResponse(f"[{self.model_name}] generated for: {prompt[:40]}", len(prompt) // 4 + 200)
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        self.backend._admit()
+        await asyncio.sleep(self.backend.latency)
+        prompt = contents if isinstance(contents, str) else str(contents)
+        return FakeResponse(f"[{self.model_name}] generated for: {prompt[:40]}", len(prompt) // 4 + 200)
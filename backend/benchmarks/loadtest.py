@@ -0,0 +1,290 @@
+"""
+Load-test the backend end to end against local stand-ins (fake Gemini, the YouTube stub
+and mongomock or a local mongod, see serve_stubbed.py). Each scenario is driven at a fixed
+number of concurrent clients; throughput and p50/p95/p99 latencies are written as JSON.
+
+    python benchmarks/loadtest.py --requests 200 --concurrency 20 --output baseline.json
+    python benchmarks/loadtest.py --requests 200 --concurrency 20 --baseline baseline.json
+
+With --baseline the run exits with status 1 when a scenario's p95 or throughput is worse
+than the baseline by more than --tolerance, or it has more errors. --url tests a server
+that is already running instead of starting one.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pdf_extraction import write_text_pdf
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve_stubbed.py")
+
+SCENARIOS = ("submit", "roadmap", "graph", "generate", "explain", "translate", "video")
+
+ESSAY = "\n\n".join(
+    f"Section {i}. Processes share the CPU through scheduling. Memory is divided into pages. "
+    f"Files are stored in directories on disk." for i in range(6)
+)
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def summarize(samples, errors, elapsed, total):
+    samples = sorted(samples)
+    summary = {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+    for name, q in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        summary[name] = round(percentile(samples, q), 1) if samples else None
+    summary["max_ms"] = round(samples[-1], 1) if samples else None
+    return summary
+
+
+async def run_load(request, total, concurrency):
+    """
+    Call `await request(i)` for i in range(total) from `concurrency` workers.
+
+    :param request: Coroutine function returning True on success.
+    """
+    samples = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await request(i)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                samples.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, errors, time.perf_counter() - start, total)
+
+
+async def wait_ready(base_url, process=None, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"server exited with {process.returncode}")
+            try:
+                await client.get(f"{base_url}/gemini/quota")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"{base_url} did not come up in {timeout} seconds")
+
+
+def start_server(mode, port, server_args=()):
+    command = [sys.executable, SERVER, "--mode", mode, "--port", str(port), *server_args]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_ready(base_url, process))
+    except Exception:
+        process.terminate()
+        raise
+    return process, base_url
+
+
+def make_pdf(pages):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.pdf")
+        write_text_pdf(path, pages)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+class Scenarios:
+    """Request builders per endpoint. Keys repeat with probability repeat_ratio (cache hits)."""
+
+    def __init__(self, client, run_id, repeat_ratio, pdf_pages, job_timeout):
+        self.client = client
+        self.run_id = run_id
+        self.repeat_ratio = repeat_ratio
+        self.job_timeout = job_timeout
+        self.random = random.Random(run_id)
+        self.pdf = make_pdf(pdf_pages)
+        self.names = []
+        self.etags = {}
+
+    def key(self, i):
+        if i and self.random.random() < self.repeat_ratio:
+            i = self.random.randrange(i)
+        return f"{self.run_id}-{i}"
+
+    async def submit(self, i):
+        name = f"bench-{self.key(i)}"
+        # A trailing comment makes each curriculum a different file for the roadmap cache
+        curriculum = self.pdf + f"\n%{name}\n".encode()
+        response = await self.client.post("/submit-form", data={
+            "name": name, "careerInterest": "Software Engineering", "expertise": "Beginner",
+        }, files={
+            "file1": ("objective.pdf", self.pdf, "application/pdf"),
+            "file2": ("curriculum.pdf", curriculum, "application/pdf"),
+        })
+        if response.status_code != 202:
+            return False
+        status_url = response.json()["status_url"]
+        deadline = time.monotonic() + self.job_timeout
+        while time.monotonic() < deadline:
+            job = (await self.client.get(status_url)).json()
+            if job.get("status") in ("succeeded", "failed"):
+                if job["status"] == "succeeded":
+                    self.names.append(name)
+                return job["status"] == "succeeded"
+            await asyncio.sleep(0.05)
+        return False
+
+    async def roadmap(self, i):
+        name = self.names[i % len(self.names)]
+        response = await self.client.get("/api/roadmap", params={"name": name})
+        return response.status_code == 200
+
+    async def graph(self, i):
+        # Revalidates like a browser: the first view of a roadmap downloads it, repeats are 304s
+        name = self.names[i % len(self.names)]
+        headers = {"Accept-Encoding": "gzip"}
+        if name in self.etags:
+            headers["If-None-Match"] = self.etags[name]
+        response = await self.client.get("/api/roadmap/graph", params={"name": name}, headers=headers)
+        if response.status_code == 200:
+            self.etags[name] = response.headers["ETag"]
+        return response.status_code in (200, 304)
+
+    async def generate(self, i):
+        response = await self.client.post("/generate-content", json={
+            "objective": "Understand operating systems", "selectedTopic": f"Topic {self.key(i)}",
+        })
+        return response.status_code == 200 and not response.json()["content"].startswith("Error")
+
+    async def explain(self, i):
+        # Texts of different keys share no words, so only repeated keys hit the /explain
+        # similarity index and misses still measure a Gemini call
+        key = self.key(i)
+        text = " ".join(hashlib.sha256(f"{key}-{n}".encode()).hexdigest()[:10] for n in range(8))
+        response = await self.client.post("/explain", json={"text": f"Explain {text}"})
+        return response.status_code == 200
+
+    async def translate(self, i):
+        response = await self.client.post("/translate", json={
+            "text": f"{ESSAY}\n\nReference {self.key(i)}.", "language": "French",
+        })
+        return response.status_code == 200
+
+    async def video(self, i):
+        response = await self.client.get("/api/video", params={"topic": f"process scheduling {self.key(i)}"})
+        return response.status_code == 200
+
+
+async def run_scenarios(base_url, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        scenarios = Scenarios(client, uuid.uuid4().hex[:8], args.repeat_ratio, args.pdf_pages, args.job_timeout)
+        for name in args.scenarios.split(","):
+            if name in ("roadmap", "graph") and not scenarios.names:
+                results[name] = {"skipped": "needs a successful submit scenario first"}
+                continue
+            results[name] = await run_load(getattr(scenarios, name), args.requests, args.concurrency)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, current in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "skipped" in current or "skipped" in before:
+            continue
+        if current["errors"] > before["errors"]:
+            found.append(f"{name}: {current['errors']} errors (baseline {before['errors']})")
+        if before["p95_ms"] and current["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {current['p95_ms']} ms (baseline {before['p95_ms']} ms)")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            found.append(f"{name}: {current['throughput_rps']} rps (baseline {before['throughput_rps']} rps)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="share of requests reusing an earlier key, i.e. expected cache hits")
+    parser.add_argument("--url", default=None, help="test this running server instead of starting one")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync")
+    parser.add_argument("--port", type=int, default=5301)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--file-processing", type=float, default=0.5)
+    parser.add_argument("--youtube-latency", type=float, default=0.1)
+    parser.add_argument("--mongo-uri", default=None, help="real MongoDB for the started server")
+    parser.add_argument("--pdf-pages", type=int, default=4)
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        server_args = ["--threads", str(args.threads), "--latency", str(args.latency),
+                       "--file-processing", str(args.file_processing),
+                       "--youtube-latency", str(args.youtube_latency)]
+        if args.mongo_uri:
+            server_args += ["--mongo-uri", args.mongo_uri]
+        process, base_url = start_server(args.mode, args.port, server_args)
+
+    try:
+        results = asyncio.run(run_scenarios(base_url, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "scenarios": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Load-test the threaded and the asyncio serving modes side by side. Each mode is started
+with serve_stubbed.py and driven with unique /explain requests (all cache misses) at a
+fixed number of concurrent clients; throughput and latency percentiles are printed as JSON.
+
+    python benchmarks/loadtest_modes.py --requests 2000 --concurrency 500 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import run_load, start_server
+
+
+async def drive(base_url, total, concurrency):
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def explain(i):
+            response = await client.post("/explain", json={"text": f"topic {run_id}-{i}"})
+            return response.status_code == 200
+
+        return await run_load(explain, total, concurrency)
+
+
+def run_mode(mode, port, args):
+    process, base_url = start_server(mode, port, ["--threads", str(args.threads), "--latency", str(args.latency)])
+    try:
+        return asyncio.run(drive(base_url, args.requests, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=32, help="request threads of the sync server")
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per fake Gemini call")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--port", type=int, default=5101)
+    args = parser.parse_args()
+
+    results = {
+        "concurrency": args.concurrency,
+        "sync_threads": args.threads,
+        "gemini_latency_s": args.latency,
+    }
+    for offset, mode in enumerate(args.modes.split(",")):
+        results[mode] = run_mode(mode, args.port + offset, args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
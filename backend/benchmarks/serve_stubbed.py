@@ -0,0 +1,177 @@
+"""
+Run the backend in any serving mode against local stand-ins: the fake Gemini backend
+and file API from fake_genai.py, the YouTube stub from youtube_stub.py and an in-memory
+MongoDB (mongomock / mongomock_motor) unless --mongo-uri points at a real mongod.
+
+    python benchmarks/serve_stubbed.py --mode sync --threads 32 --port 5001
+    python benchmarks/serve_stubbed.py --mode async --port 5002 --mongo-uri mongodb://localhost:27017/
+    python benchmarks/serve_stubbed.py --mode dev --port 5003
+    python benchmarks/serve_stubbed.py --mode gunicorn --worker-class gevent --workers 4 --port 5004
+
+Modes: sync is the threaded app on a fixed thread pool, async the Quart app on
+hypercorn, dev the Werkzeug development server as `python app.py` runs it (debugger
+on, reloader off), gunicorn the production setup from gunicorn.conf.py.
+
+The stand-ins need the packages in requirements-dev.txt.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+if "gevent" in sys.argv:
+    # As in gunicorn.conf.py: patch before anything below creates locks or sockets
+    from gevent import monkey
+    monkey.patch_all()
+
+import google.generativeai as genai
+import mongomock
+import mongomock.gridfs
+import pymongo
+from werkzeug.serving import BaseWSGIServer
+
+from fake_genai import FakeFileAPI, FakeGeminiBackend
+from youtube_stub import YouTubeStub
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    Werkzeug server handling requests on a fixed pool of threads, like a threaded WSGI
+    worker, so the sync mode has the same concurrency cap it has in production.
+    """
+
+    request_queue_size = 4096
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def install_stubs(latency, file_processing=0.0, youtube_latency=None, mongo_uri=None, async_mongo=False):
+    """
+    :param latency: Seconds per fake Gemini generation.
+    :param file_processing: Seconds an uploaded file stays PROCESSING.
+    :param youtube_latency: Start the YouTube stub with this latency (None leaves YOUTUBE_SEARCH_URL alone).
+    :param mongo_uri: Use this real MongoDB instead of the in-memory stand-in.
+    :param async_mongo: Also replace the motor client, for the async app.
+    """
+    backend = FakeGeminiBackend(requests_per_window=10 ** 9, latency=latency)
+    genai.GenerativeModel = backend.model
+
+    files = FakeFileAPI(processing_times=(file_processing,), get_latency=0.01)
+    genai.upload_file = files.upload_file
+    genai.get_file = files.get_file
+
+    if youtube_latency is not None:
+        stub = YouTubeStub(latency=youtube_latency).start()
+        os.environ["YOUTUBE_SEARCH_URL"] = stub.search_url
+        os.environ.setdefault("YOUTUBE_API_KEY", "stub")
+
+    if mongo_uri:
+        os.environ["MONGODB_URI"] = mongo_uri
+        return
+
+    # Uploads go through GridFS, which mongomock only backs once enabled
+    mongomock.gridfs.enable_gridfs_integration()
+    client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: client
+
+    import db
+    db.MongoClient = pymongo.MongoClient
+
+    if not async_mongo:
+        return
+    import mongomock_motor
+    import motor.motor_asyncio
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient()
+
+
+def serve_gunicorn(port, worker_class, workers, threads):
+    """Serve app:create_app with gunicorn.conf.py, its settings overridden through the environment."""
+    from gunicorn.app.base import Application
+
+    os.environ.update(
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKER_CLASS=worker_class,
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_THREADS=str(threads),
+    )
+
+    class StubbedApplication(Application):
+        def load_config(self):
+            self.load_config_from_file(os.path.join(BACKEND, "gunicorn.conf.py"))
+            self.cfg.set("backlog", 4096)
+
+        def load(self):
+            from app import create_app
+            return create_app(initialize=False)
+
+    print(f"gunicorn {worker_class} with {workers} workers on port {port}", flush=True)
+    StubbedApplication().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("sync", "async", "dev", "gunicorn"), required=True)
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--threads", type=int, default=32, help="request threads in sync mode and per gthread worker")
+    parser.add_argument("--worker-class", choices=("gthread", "gevent"), default="gthread", help="gunicorn mode")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per fake Gemini call")
+    parser.add_argument("--file-processing", type=float, default=0.0,
+                        help="seconds an uploaded PDF stays PROCESSING in the fake file API")
+    parser.add_argument("--youtube-latency", type=float, default=0.1, help="seconds per stubbed YouTube search")
+    parser.add_argument("--mongo-uri", default=None, help="real MongoDB to use instead of mongomock")
+    args = parser.parse_args()
+
+    # Measure the serving mode, not the client-side quota or per-model concurrency caps
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    os.environ.setdefault("GEMINI_RPM", "1000000000")
+    os.environ.setdefault("GEMINI_TPM", "1000000000000")
+    os.environ.setdefault("GEMINI_MAX_CONCURRENCY", "100000")
+    os.environ.setdefault("JOB_QUEUE_SIZE", "100000")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    install_stubs(args.latency, args.file_processing, args.youtube_latency, args.mongo_uri, async_mongo=args.mode == "async")
+
+    if args.mode == "dev":
+        from app import app, init_worker
+        init_worker()
+        print(f"development server on port {args.port}", flush=True)
+        app.run(host="127.0.0.1", port=args.port, debug=True, use_reloader=False)
+    elif args.mode == "gunicorn":
+        serve_gunicorn(args.port, args.worker_class, args.workers, args.threads)
+    elif args.mode == "sync":
+        from app import app
+        print(f"sync mode with {args.threads} threads on port {args.port}", flush=True)
+        PooledWSGIServer("127.0.0.1", args.port, app, args.threads).serve_forever()
+    else:
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+        from app_async import app
+        config = Config()
+        config.bind = [f"127.0.0.1:{args.port}"]
+        config.accesslog = None
+        config.backlog = 4096
+        config.keep_alive_timeout = 75
+        print(f"async mode on port {args.port}", flush=True)
+        asyncio.run(serve(app, config))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Local HTTP stand-in for the YouTube Data API search endpoint. Point YOUTUBE_SEARCH_URL at
+it to exercise /api/video without network access or quota:
+
+    python benchmarks/youtube_stub.py --port 8765 --latency 0.2
+    YOUTUBE_SEARCH_URL=http://127.0.0.1:8765/youtube/v3/search python app.py
+
+Every topic maps to a stable fake video ID; topics containing "novideo" have no results.
+GET /stats returns the number of searches served.
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class YouTubeStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, quota: int = None):
+        """
+        :param port: 0 picks a free port; see .search_url.
+        :param latency: Seconds each search takes.
+        :param quota: Searches served before answering 403 quotaExceeded, unlimited if None.
+        """
+        self.latency = latency
+        self.quota = quota
+        self.searches = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def search_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/youtube/v3/search"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/stats":
+                    return self._send(200, {"searches": stub.searches})
+                if url.path != "/youtube/v3/search":
+                    return self._send(404, {"error": {"code": 404, "message": "Not Found"}})
+
+                with stub._lock:
+                    if stub.quota is not None and stub.searches >= stub.quota:
+                        return self._send(403, {"error": {"code": 403, "message": "quotaExceeded"}})
+                    stub.searches += 1
+                time.sleep(stub.latency)
+
+                topic = parse_qs(url.query).get("q", [""])[0]
+                if "novideo" in topic:
+                    return self._send(200, {"items": []})
+                video_id = hashlib.sha1(topic.encode()).hexdigest()[:11]
+                return self._send(200, {"items": [{"id": {"kind": "youtube#video", "videoId": video_id}}]})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--quota", type=int, default=None)
+    args = parser.parse_args()
+
+    stub = YouTubeStub(args.host, args.port, args.latency, args.quota)
+    print(f"YouTube search stub at {stub.search_url}", flush=True)
+    stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
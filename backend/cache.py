@@ -0,0 +1,425 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import PyMongoError
+
+from metrics import record_upstream_error
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_bytes(data: bytes) -> str:
+    """Hex SHA-256 digest of an uploaded file's contents."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def prompt_fingerprint(*parts) -> str:
+    """
+    Builds a short version string from a prompt template and its settings, so any edit
+    to the prompt or generation config produces a different cache namespace.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True)
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class RoadmapCache:
+    """
+    Persistent cache of generated roadmaps keyed by the SHA-256 of the curriculum PDF,
+    the model name and the prompt version.
+    """
+
+    def __init__(self, collection, model_name: str, prompt_version: str):
+        self.collection = collection
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    def key(self, pdf_hash: str) -> str:
+        return f"{pdf_hash}:{self.model_name}:{self.prompt_version}"
+
+    def get(self, pdf_hash: str):
+        """Return the cached curriculum for a PDF hash, or None on a miss."""
+        try:
+            document = self.collection.find_one({"_id": self.key(pdf_hash)}, {"curriculum": 1})
+        except PyMongoError as e:
+            logger.warning("Roadmap cache lookup failed: %s", e)
+            record_upstream_error("mongodb", e)
+            self._count("_errors")
+            document = None
+
+        if document is None:
+            self._count("_misses")
+            return None
+
+        self._count("_hits")
+        return document["curriculum"]
+
+    def set(self, pdf_hash: str, curriculum: dict) -> None:
+        document = {
+            "pdf_sha256": pdf_hash,
+            "model": self.model_name,
+            "prompt_version": self.prompt_version,
+            "curriculum": curriculum,
+            "created_at": datetime.now(timezone.utc),
+        }
+        try:
+            self.collection.replace_one({"_id": self.key(pdf_hash)}, document, upsert=True)
+        except PyMongoError as e:
+            logger.warning("Roadmap cache store failed: %s", e)
+            record_upstream_error("mongodb", e)
+            self._count("_errors")
+
+    def invalidate(self, stale_only: bool = True) -> int:
+        """
+        Remove cached roadmaps.
+
+        :param stale_only: Only drop entries produced by another model or prompt version.
+        :return: Number of removed entries.
+        """
+        query = {}
+        if stale_only:
+            query = {"$or": [
+                {"model": {"$ne": self.model_name}},
+                {"prompt_version": {"$ne": self.prompt_version}},
+            ]}
+        return self.collection.delete_many(query).deleted_count
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "errors": self._errors,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "model": self.model_name,
+                "prompt_version": self.prompt_version,
+            }
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def normalize_prompt_input(value):
+    """Collapse whitespace differences that do not change the generated answer."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+class TTLCache:
+    """Thread-safe in-process LRU whose entries also expire after ttl_seconds."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _shared_entry(namespace: str, model_name: str, value, ttl_seconds: float = None) -> dict:
+    """Shared cache document; without ttl_seconds it never expires (the TTL index skips a null expires_at)."""
+    now = datetime.now(timezone.utc)
+    return {
+        "namespace": namespace,
+        "model": model_name,
+        "value": value,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=ttl_seconds) if ttl_seconds is not None else None,
+    }
+
+
+def _live_entry(key: str) -> dict:
+    """Query for a shared entry that has not expired, or never expires."""
+    return {"_id": key, "$or": [{"expires_at": {"$gt": datetime.now(timezone.utc)}}, {"expires_at": None}]}
+
+
+class _Flight:
+    """A single upstream call that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ContentCache:
+    """
+    Two-tier cache for generated text: an in-process LRU with TTL in front of a shared
+    Mongo collection. Concurrent misses on the same key are coalesced so only one
+    upstream call is in flight per key in this process.
+    """
+
+    def __init__(self, collection, max_entries: int = 1024, ttl_seconds: int = 7 * 24 * 3600):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._local = TTLCache(max_entries, ttl_seconds)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._index_ready = False
+        self._counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    @staticmethod
+    def key(namespace: str, model_name: str, inputs: dict) -> str:
+        payload = {
+            "namespace": namespace,
+            "model": model_name,
+            "inputs": {name: normalize_prompt_input(value) for name, value in inputs.items()},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get_or_compute(self, namespace: str, model_name: str, inputs: dict, compute):
+        """
+        Return the cached value for the inputs, calling compute() on a miss.
+
+        :param namespace: Endpoint or prompt family the value belongs to.
+        :param model_name: Gemini model that produced the value.
+        :param inputs: Prompt inputs; strings are whitespace-normalized before hashing.
+        :param compute: Zero-argument callable producing the value. Exceptions are
+                        propagated to every waiting caller and nothing is cached.
+        """
+        key = self.key(namespace, model_name, inputs)
+
+        value = self._get_local(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not leader:
+            self._count("coalesced")
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self._get_shared(key)
+            if value is not None:
+                self._count("shared_hits")
+            else:
+                self._count("misses")
+                value = compute()
+                self._set_shared(key, namespace, model_name, value)
+            self._set_local(key, value)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def get(self, namespace: str, model_name: str, inputs: dict):
+        """Look a value up in both tiers without computing it on a miss."""
+        key = self.key(namespace, model_name, inputs)
+        value = self._get_local(key)
+        if value is None:
+            value = self._get_shared(key)
+            if value is not None:
+                self._set_local(key, value)
+        return value
+
+    def set(self, namespace: str, model_name: str, inputs: dict, value) -> None:
+        key = self.key(namespace, model_name, inputs)
+        self._set_shared(key, namespace, model_name, value)
+        self._set_local(key, value)
+
+    def persist(self, namespace: str, model_name: str, inputs: dict, compute):
+        """
+        get_or_compute(), storing the value in the shared tier without an expiry date, for
+        content generated ahead of time that must not fall back to live calls later.
+        """
+        value = self.get_or_compute(namespace, model_name, inputs, compute)
+        self._set_shared(self.key(namespace, model_name, inputs), namespace, model_name, value, expires=False)
+        return value
+
+    def clear_local(self) -> None:
+        self._local.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["local_entries"] = len(self._local)
+            stats["inflight"] = len(self._inflight)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _get_local(self, key: str):
+        return self._local.get(key)
+
+    def _set_local(self, key: str, value) -> None:
+        self._local.set(key, value)
+
+    def _get_shared(self, key: str):
+        try:
+            document = self.collection.find_one(_live_entry(key), {"value": 1})
+        except PyMongoError as e:
+            logger.warning("Content cache lookup failed: %s", e)
+            record_upstream_error("mongodb", e)
+            self._count("errors")
+            return None
+        return document["value"] if document else None
+
+    def _set_shared(self, key: str, namespace: str, model_name: str, value, expires: bool = True) -> None:
+        document = _shared_entry(namespace, model_name, value, self.ttl_seconds if expires else None)
+        try:
+            if not self._index_ready:
+                # Let Mongo drop expired entries on its own
+                self.collection.create_index("expires_at", expireAfterSeconds=0)
+                self._index_ready = True
+            self.collection.replace_one({"_id": key}, document, upsert=True)
+        except PyMongoError as e:
+            logger.warning("Content cache store failed: %s", e)
+            record_upstream_error("mongodb", e)
+            self._count("errors")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+
+class AsyncContentCache:
+    """
+    asyncio counterpart of ContentCache for the async serving mode. It uses the same keys
+    and the same shared Mongo collection (through motor), so both modes share results.
+    Concurrent misses on a key await one upstream call.
+    """
+
+    def __init__(self, collection, max_entries: int = 1024, ttl_seconds: int = 7 * 24 * 3600):
+        """
+        :param collection: Zero-argument callable returning the motor collection, so the
+                           client can be bound to the running event loop.
+        """
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._local = TTLCache(max_entries, ttl_seconds)
+        self._inflight = {}
+        self._counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    async def get_or_compute(self, namespace: str, model_name: str, inputs: dict, compute):
+        """
+        :param compute: Zero-argument coroutine function producing the value.
+        """
+        key = ContentCache.key(namespace, model_name, inputs)
+
+        value = self._local.get(key)
+        if value is not None:
+            self._counters["local_hits"] += 1
+            return value
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        try:
+            value = await self._get_shared(key)
+            if value is not None:
+                self._counters["shared_hits"] += 1
+            else:
+                self._counters["misses"] += 1
+                value = await compute()
+                await self._set_shared(key, namespace, model_name, value)
+            self._local.set(key, value)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            # Retrieve it so an unawaited flight does not log "exception never retrieved"
+            flight.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get(self, namespace: str, model_name: str, inputs: dict):
+        key = ContentCache.key(namespace, model_name, inputs)
+        value = self._local.get(key)
+        if value is None:
+            value = await self._get_shared(key)
+            if value is not None:
+                self._local.set(key, value)
+        return value
+
+    async def set(self, namespace: str, model_name: str, inputs: dict, value) -> None:
+        key = ContentCache.key(namespace, model_name, inputs)
+        await self._set_shared(key, namespace, model_name, value)
+        self._local.set(key, value)
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        stats["local_entries"] = len(self._local)
+        stats["inflight"] = len(self._inflight)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    async def _get_shared(self, key: str):
+        try:
+            document = await self.collection().find_one(_live_entry(key), {"value": 1})
+        except PyMongoError as e:
+            logger.warning("Content cache lookup failed: %s", e)
+            record_upstream_error("mongodb", e)
+            self._counters["errors"] += 1
+            return None
+        return document["value"] if document else None
+
+    async def _set_shared(self, key: str, namespace: str, model_name: str, value) -> None:
+        document = _shared_entry(namespace, model_name, value, self.ttl_seconds)
+        try:
+            await self.collection().replace_one({"_id": key}, document, upsert=True)
+        except PyMongoError as e:
+            logger.warning("Content cache store failed: %s", e)
+            record_upstream_error("mongodb", e)
+            self._counters["errors"] += 1
@@ -0,0 +1,198 @@
+"""
+Splitting of large curriculum PDFs into sections that get their roadmap generated
+separately, and merging of the per-section roadmaps into one roadMap.
+"""
+
+import hashlib
+import io
+import re
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Pages per section; outline chapters are packed into sections up to this size and
+# longer chapters are split into page ranges
+SECTION_PAGES = 40
+
+
+def _open_reader(pdf) -> PdfReader:
+    return PdfReader(io.BytesIO(pdf) if isinstance(pdf, (bytes, bytearray)) else pdf)
+
+
+def page_count(pdf) -> int:
+    return len(_open_reader(pdf).pages)
+
+
+def outline_starts(reader: PdfReader) -> list:
+    """(first page, title) of each top-level outline entry, in page order; empty without an outline."""
+    try:
+        outline = reader.outline
+    except Exception:
+        # Broken outlines are common in exported handbooks; fall back to page ranges
+        return []
+
+    starts = {}
+    for item in outline:
+        # Nested lists hold the children of the preceding entry
+        if isinstance(item, list):
+            continue
+        try:
+            page = reader.get_destination_page_number(item)
+        except Exception:
+            continue
+        if page is not None and page >= 0:
+            starts.setdefault(page, str(getattr(item, "title", "") or "").strip())
+    return sorted(starts.items())
+
+
+def plan_sections(count: int, starts, max_pages: int = SECTION_PAGES) -> list:
+    """
+    Page ranges of the sections of a PDF.
+
+    :param count: Pages in the PDF.
+    :param starts: (first page, title) of its chapters, e.g. from outline_starts().
+    :return: [{"title", "start", "stop"}] covering pages [0, count) in order.
+    """
+    chapters = []
+    bounds = [page for page, _ in starts if 0 < page < count]
+    titles = dict(starts)
+    for start, stop in zip([0] + bounds, bounds + [count]):
+        chapters.append({"title": titles.get(start, ""), "start": start, "stop": stop})
+
+    sections = []
+    for chapter in chapters:
+        last = sections[-1] if sections else None
+        if last is not None and chapter["stop"] - last["start"] <= max_pages:
+            # Pack short chapters together, fewer sections means fewer calls
+            last["stop"] = chapter["stop"]
+            last["title"] = " / ".join(title for title in (last["title"], chapter["title"]) if title)
+            continue
+        for start in range(chapter["start"], chapter["stop"], max_pages):
+            sections.append({"title": chapter["title"], "start": start, "stop": min(start + max_pages, chapter["stop"])})
+    return sections
+
+
+def _stream_data(stream) -> bytes:
+    try:
+        return stream.get_data()
+    except Exception:
+        # A filter PyPDF2 cannot decode (e.g. JBIG2 scans); the encoded bytes identify it as well
+        return getattr(stream, "_data", b"") or b""
+
+
+def _object_digest(obj, memo: dict) -> bytes:
+    """
+    SHA-256 of a PDF object by value: dictionaries by sorted key, streams by their data,
+    indirect references by what they point to. Object numbers, which change when a PDF
+    is re-exported, do not enter it.
+
+    :param memo: Digests of indirect objects already visited, shared between the pages of
+        a PDF (fonts and images are usually shared) and guarding against reference cycles.
+    """
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            memo[key] = b""
+            memo[key] = _object_digest(obj.get_object(), memo)
+        return memo[key]
+
+    digest = hashlib.sha256()
+    if isinstance(obj, DictionaryObject):
+        digest.update(b"<<")
+        for name in sorted(obj):
+            # Page-tree links lead to every other page
+            if name == "/Parent":
+                continue
+            digest.update(name.encode("utf-8", "replace"))
+            digest.update(_object_digest(obj.raw_get(name), memo))
+        digest.update(b">>")
+        if isinstance(obj, StreamObject):
+            digest.update(_stream_data(obj))
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            digest.update(_object_digest(item, memo))
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode("utf-8", "replace"))
+    return digest.digest()
+
+
+def _page_fingerprint(page, memo: dict) -> bytes:
+    """Digest of what a page draws: its content streams and the images, fonts and forms they use."""
+    contents = page.get_contents()
+    digest = hashlib.sha256(_stream_data(contents) if contents is not None else b"")
+    # Every scanned page has the same content stream; the image is in the resources
+    digest.update(_object_digest(page.get("/Resources", DictionaryObject()), memo))
+    return digest.digest()
+
+
+def split_sections(pdf, max_pages: int = SECTION_PAGES) -> list:
+    """
+    Split a PDF at its top-level outline entries, or into page ranges without an outline.
+
+    :param pdf: PDF contents as bytes, or a path.
+    :return: [{"title", "start", "stop", "hash", "pdf"}] where hash is the SHA-256 of the
+        section's page content streams and the resources they draw (stable across
+        re-exports that only touch other sections) and pdf the section as a standalone PDF.
+    """
+    reader = _open_reader(pdf)
+    sections = plan_sections(len(reader.pages), outline_starts(reader), max_pages)
+    memo = {}
+    for section in sections:
+        digest = hashlib.sha256()
+        writer = PdfWriter()
+        for number in range(section["start"], section["stop"]):
+            page = reader.pages[number]
+            digest.update(_page_fingerprint(page, memo))
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        section["hash"] = digest.hexdigest()
+        section["pdf"] = buffer.getvalue()
+    return sections
+
+
+def _normalized(text: str) -> str:
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def _strip_numbering(title: str) -> str:
+    # "Unit 3: Memory" and "Memory" from two sections are the same unit
+    return re.sub(r"^(unit|chapter|module|part)\s*[\w.]*\s*[:.\-–]\s*", "", title.strip(), flags=re.IGNORECASE)
+
+
+def merge_roadmaps(fragments) -> dict:
+    """
+    Merge per-section curricula in section order into one. A section's first unit is
+    combined with the previous section's last unit when their titles match (a unit cut by
+    a section boundary); same-titled units elsewhere stay separate. Topics are deduplicated
+    within each unit and units are renumbered from 1.
+
+    :param fragments: Normalized curricula ({"roadMap": {...}}) of the sections, in order.
+    """
+    names = [fragment["roadMap"]["course_name"] for fragment in fragments
+             if fragment["roadMap"]["course_name"] not in ("", "N/A")]
+    # The name most sections agree on; the first section wins ties
+    course_name = max(names, key=names.count) if names else "N/A"
+
+    units = []
+    for fragment in fragments:
+        for index, unit in enumerate(fragment["roadMap"]["roadmap"]):
+            title = _strip_numbering(unit["unit_title"]) or unit["unit_title"]
+            key = _normalized(title)
+            if index == 0 and key and units and units[-1]["_key"] == key:
+                merged = units[-1]
+            else:
+                merged = {"topics": [], "unit_title": title, "_key": key, "_seen": set()}
+                units.append(merged)
+            for topic in unit["topics"]:
+                if _normalized(topic) not in merged["_seen"]:
+                    merged["_seen"].add(_normalized(topic))
+                    merged["topics"].append(topic)
+
+    roadmap = [
+        {"topics": unit["topics"], "unit_number": str(number), "unit_title": unit["unit_title"]}
+        for number, unit in enumerate(units, 1)
+    ]
+    return {"roadMap": {"course_name": course_name, "roadmap": roadmap}}
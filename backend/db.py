@@ -1,6 +1,15 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, WriteConcern, monitoring
 from bson.objectid import ObjectId
+import asyncio
+import logging
 import os
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MONGODB_URI = 'mongodb://mongodb:27017/'
 
 # Helper function to convert ObjectId to string
 def convert_objectid_to_str(document):
@@ -8,56 +17,279 @@ def convert_objectid_to_str(document):
         document["_id"] = str(document["_id"])
     return document
 
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters collected from pymongo's pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connections_open = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.pools_cleared = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connections_open": self.connections_open,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": 1000 * self.total_wait_seconds / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+                "pools_cleared": self.pools_cleared,
+            }
+
+    def _record_wait(self, event):
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            started = self._started.pop(threading.get_ident(), None)
+            duration = time.monotonic() - started if started is not None else 0.0
+        else:
+            self._started.pop(threading.get_ident(), None)
+        return duration
+
+    def connection_check_out_started(self, event):
+        self._started[threading.get_ident()] = time.monotonic()
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            wait = self._record_wait(event)
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._record_wait(event)
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+pool_metrics = PoolMetrics()
+
+_clients = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _int_env(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _reset_after_fork():
+    # Sockets inherited from the parent must not be shared; the child opens its own pool
+    global _clients, _clients_pid, _clients_lock
+    _clients = {}
+    _clients_pid = os.getpid()
+    _clients_lock = threading.Lock()
+    _async_clients.clear()
+    pool_metrics.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _client_options() -> dict:
+    return {
+        "maxPoolSize": _int_env('MONGODB_MAX_POOL_SIZE', 100),
+        "minPoolSize": _int_env('MONGODB_MIN_POOL_SIZE', 0),
+        "connectTimeoutMS": _int_env('MONGODB_CONNECT_TIMEOUT_MS', 5000),
+        "serverSelectionTimeoutMS": _int_env('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        "socketTimeoutMS": _int_env('MONGODB_SOCKET_TIMEOUT_MS'),
+        "waitQueueTimeoutMS": _int_env('MONGODB_WAIT_QUEUE_TIMEOUT_MS'),
+        "event_listeners": [pool_metrics],
+    }
+
+
+def get_client(connection_string: str = None) -> MongoClient:
+    """
+    Return the process-wide pooled MongoClient for a connection string, creating it on
+    first use. Pool size and timeouts come from the MONGODB_* environment variables.
+    """
+    connection_string = connection_string or os.getenv('MONGODB_URI', DEFAULT_MONGODB_URI)
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(connection_string)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(connection_string)
+        if client is None:
+            client = MongoClient(connection_string, **_client_options())
+            _clients[connection_string] = client
+    return client
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
 def get_db():
     # Use environment variable or default to mongodb container service name
-    mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://mongodb:27017/')
-    return MongoClient(mongodb_uri)['education']
+    return get_client()['education']
+
+
+def get_async_db(connection_string: str = None):
+    """
+    Motor counterpart of get_db() for the asyncio serving mode. Motor clients are bound
+    to the event loop they are first used on, so there is one pooled client per loop.
+    """
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    connection_string = connection_string or os.getenv('MONGODB_URI', DEFAULT_MONGODB_URI)
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(connection_string)
+    if client is None:
+        client = AsyncIOMotorClient(connection_string, **_client_options())
+        clients[connection_string] = client
+    return client['education']
+
+
+def close_async_clients():
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        client.close()
+
+
+def ensure_indexes(db=None):
+    """
+    Create the indexes the API lookups rely on. Safe to call on every startup; Mongo
+    ignores indexes that already exist.
+    """
+    db = db if db is not None else get_db()
+    content = db["content"]
+    content.create_index("name")
+    content.create_index("curriculum.roadMap.course_name")
+    db["jobs"].create_index([("kind", 1), ("status", 1), ("created_at", 1)])
+
+
+class SharedCollection:
+    """
+    Collection handle that resolves through the shared client on every use, so objects
+    created at import time keep working after a fork or a client reset.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
 
 class MongoDBClient:
     def __init__(self, connection_string: str, database_name: str, collection_name: str):
-        self.client = MongoClient(connection_string)
+        self.client = get_client(connection_string)
         self.database = self.client[database_name]
         self.collection = self.database[collection_name]
 
-    def create_document(self, document: dict) -> dict:
-        result = self.collection.insert_one(document)
-        new_document = self.collection.find_one({"_id": result.inserted_id})
-        return convert_objectid_to_str(new_document)
+    def _with_write_concern(self, write_concern):
+        if write_concern is None:
+            return self.collection
+        if isinstance(write_concern, dict):
+            write_concern = WriteConcern(**write_concern)
+        return self.collection.with_options(write_concern=write_concern)
 
-    def create_documents(self, documents: list) -> list:
-        # Insert multiple documents into the collection
-        result = self.collection.insert_many(documents)
-        
-        # Retrieve the newly inserted documents using their _ids
-        new_documents = []
-        for inserted_id in result.inserted_ids:
-            document = self.collection.find_one({"_id": inserted_id})
-            new_documents.append(convert_objectid_to_str(document))
-        
-        return new_documents
+    def create_document(self, document: dict, write_concern=None) -> dict:
+        # insert_one sets document["_id"] in place, so the new document is not read back
+        self._with_write_concern(write_concern).insert_one(document)
+        return convert_objectid_to_str(dict(document))
+
+    def create_documents(self, documents: list, ordered: bool = True, write_concern=None) -> list:
+        """
+        Insert multiple documents and return them with their new ids as strings.
+
+        :param ordered: Stop at the first failed insert (True) or attempt every document (False).
+        :param write_concern: Optional WriteConcern or dict such as {"w": 1, "j": False}.
+        """
+        self._with_write_concern(write_concern).insert_many(documents, ordered=ordered)
+
+        # insert_many assigns the _ids client-side, so the in-memory documents are complete
+        return [convert_objectid_to_str(dict(document)) for document in documents]
+
+    def insert_documents(self, documents: list, ordered: bool = False, write_concern=None) -> list:
+        """
+        Bulk insert for high-volume ingestion. Returns only the new ids as strings.
+        Unordered by default so one bad document does not block the rest of the batch.
+        """
+        result = self._with_write_concern(write_concern).insert_many(documents, ordered=ordered)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
 
     def read_document(self, document_id: str) -> dict:
         document = self.collection.find_one({"_id": ObjectId(document_id)})
         return convert_objectid_to_str(document)
     
 
-    def read_documents_by_course(self, name: str) -> list:
+    def read_documents_by_course(self, name: str, projection: dict = None) -> list:
         """
-        Fetch all documents and filter those where curriculum.roadMap.course_name matches the provided course_name.
+        Fetch the documents whose curriculum.roadMap.course_name matches the provided name.
+        The filter runs server-side on the curriculum.roadMap.course_name index.
         """
-        documents = self.collection.find()  # Fetch all documents
-        
-        result = []
-        for doc in documents:
-            # Check if the document contains the course_name
-            if doc.get("curriculum", {}).get("roadMap", {}).get("name") == name:
-                result.append(convert_objectid_to_str(doc))
+        documents = self.collection.find({"curriculum.roadMap.course_name": name}, projection)
+        result = [convert_objectid_to_str(doc) for doc in documents]
 
         if not result:
-            print(f"No documents found for course_name: {name}")
+            logger.debug("No documents found for course_name: %s", name)
         
         return result
 
+    def find_by_name(self, name: str, fields: list) -> dict:
+        """
+        Fetch only the requested fields of the first document submitted under a name.
+
+        :param name: Value of the document's "name" field.
+        :param fields: Dotted field paths to return, e.g. ["curriculum.roadMap"].
+        :return: The projected document without _id, or None.
+        """
+        projection = {field: 1 for field in fields}
+        projection["_id"] = 0
+        return self.collection.find_one({"name": name}, projection)
+
 
     
     def update_document(self, document_id: str, updated_data: dict) -> bool:
@@ -0,0 +1,549 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+
+from metrics import record_upstream_error, span
+
+logger = logging.getLogger(__name__)
+
+_genai = None
+_genai_pid = None
+_genai_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # The parent's gRPC channels must not be used from a forked worker
+    global _genai_pid, _genai_lock
+    _genai_pid = None
+    _genai_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_genai(configure: bool = True):
+    """
+    The google.generativeai module, imported on first use (it is most of the backend's
+    import time) and configured once per process from GEMINI_API_KEY and GEMINI_TRANSPORT.
+
+    :param configure: False only imports it, e.g. in a server's master process before
+        the workers are forked.
+    """
+    global _genai, _genai_pid
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai
+                _genai = google.generativeai
+    if configure and _genai_pid != os.getpid():
+        with _genai_lock:
+            if _genai_pid != os.getpid():
+                _genai.configure(api_key=os.environ["GEMINI_API_KEY"], transport=os.getenv("GEMINI_TRANSPORT") or None)
+                _genai_pid = os.getpid()
+    return _genai
+
+
+class RateLimiter:
+    """Token bucket allowing rate_per_minute acquisitions per minute, shared by threads."""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.interval = 60.0 / rate_per_minute
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
+
+
+# Call priorities: lower values are served first when a model's quota is short
+INTERACTIVE = 0
+BULK = 10
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# How often coroutines queued in QuotaLimiter.acquire_async re-check their budget
+ASYNC_POLL_INTERVAL = 0.05
+
+
+class QuotaExceeded(Exception):
+    """A Gemini call could not obtain quota before its deadline."""
+
+
+def is_retryable(error) -> bool:
+    """True for throttling (429) and transient server errors (5xx) from the Gemini API."""
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+
+def is_throttled(error) -> bool:
+    return isinstance(error, QuotaExceeded) or getattr(error, "code", None) == 429
+
+
+def estimate_tokens(contents) -> int:
+    """Rough prompt size (about four characters per token) for text contents."""
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(part) for part in contents)
+    return 0
+
+
+class _Budget:
+    """Requests and tokens left for one model in the current rolling period."""
+
+    def __init__(self, requests_per_period: float, tokens_per_period: float, period: float):
+        self.request_capacity = requests_per_period
+        self.token_capacity = tokens_per_period
+        self.period = period
+        self.requests = float(requests_per_period)
+        self.tokens = float(tokens_per_period)
+        self.updated = time.monotonic()
+        self.waiters = []
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_capacity / self.period)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_capacity / self.period)
+
+    def wait_time(self, tokens: float) -> float:
+        """Seconds until one request and the given tokens are available (0 if they are now)."""
+        tokens = min(tokens, self.token_capacity)
+        request_wait = max(0.0, 1 - self.requests) * self.period / self.request_capacity
+        token_wait = max(0.0, tokens - self.tokens) * self.period / self.token_capacity
+        return max(request_wait, token_wait)
+
+    def take(self, tokens: float) -> None:
+        self.requests -= 1
+        self.tokens -= min(tokens, self.token_capacity)
+
+
+class QuotaLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute budgets per model. Callers wait
+    in a priority queue, so interactive calls go ahead of bulk generation, and give up
+    with QuotaExceeded when their deadline passes.
+    """
+
+    def __init__(self, default_rpm: float = 60, default_tpm: float = 1_000_000, quotas: dict = None,
+                 period: float = 60.0, shares: int = 1):
+        """
+        :param default_rpm: Requests per period for models without an override.
+        :param default_tpm: Tokens per period for models without an override.
+        :param quotas: Overrides per model name as (rpm, tpm) tuples.
+        :param period: Length of the budget period in seconds (a minute outside of tests).
+        :param shares: Number of processes splitting the quotas; this limiter enforces one
+                       equal share of each.
+        """
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.quotas = dict(quotas or {})
+        self.period = period
+        self.shares = max(1, shares)
+        self._budgets = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {"granted": 0, "waited": 0, "expired": 0}
+
+    @staticmethod
+    def parse_quotas(value: str) -> dict:
+        """Parse "model=rpm:tpm,model=rpm:tpm" as used by GEMINI_MODEL_QUOTAS."""
+        quotas = {}
+        for item in filter(None, (part.strip() for part in (value or "").split(","))):
+            name, _, limits = item.partition("=")
+            rpm, _, tpm = limits.partition(":")
+            quotas[name.strip()] = (float(rpm), float(tpm))
+        return quotas
+
+    def _budget(self, model_name: str) -> _Budget:
+        budget = self._budgets.get(model_name)
+        if budget is None:
+            rpm, tpm = self.quotas.get(model_name, (self.default_rpm, self.default_tpm))
+            budget = _Budget(rpm / self.shares, tpm / self.shares, self.period)
+            self._budgets[model_name] = budget
+        return budget
+
+    def set_shares(self, shares: int) -> None:
+        """
+        Split the quotas between a different number of processes. Every budget restarts,
+        so this is called before serving.
+        """
+        with self._cond:
+            self.shares = max(1, shares)
+            self._budgets.clear()
+
+    def acquire(self, model_name: str, tokens: int = 0, priority: int = INTERACTIVE,
+                deadline: float = None) -> None:
+        """
+        Block until the model has budget for one request of the given size.
+
+        :param deadline: time.monotonic() value after which QuotaExceeded is raised.
+        """
+        with self._cond:
+            budget = self._budget(model_name)
+            entry = (priority, next(self._sequence))
+            heapq.heappush(budget.waiters, entry)
+            waited = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if budget.waiters[0] == entry:
+                        budget.refill(now)
+                        wait = budget.wait_time(tokens)
+                        if wait == 0:
+                            budget.take(tokens)
+                            heapq.heappop(budget.waiters)
+                            self._stats["granted"] += 1
+                            self._stats["waited"] += waited
+                            return
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self._stats["expired"] += 1
+                            raise QuotaExceeded(f"No {model_name} quota available before the deadline")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    waited = True
+                    self._cond.wait(wait)
+            finally:
+                if entry in budget.waiters:
+                    budget.waiters.remove(entry)
+                    heapq.heapify(budget.waiters)
+                self._cond.notify_all()
+
+    async def acquire_async(self, model_name: str, tokens: int = 0, priority: int = INTERACTIVE,
+                            deadline: float = None) -> None:
+        """
+        acquire() for coroutines. The lock is only held for bookkeeping and waiting happens
+        in asyncio.sleep, so the event loop keeps serving while calls queue for quota.
+        """
+        with self._cond:
+            budget = self._budget(model_name)
+            entry = (priority, next(self._sequence))
+            heapq.heappush(budget.waiters, entry)
+        waited = False
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    # Not at the head of the queue yet: check again shortly
+                    wait = ASYNC_POLL_INTERVAL
+                    if budget.waiters[0] == entry:
+                        budget.refill(now)
+                        wait = budget.wait_time(tokens)
+                        if wait == 0:
+                            budget.take(tokens)
+                            heapq.heappop(budget.waiters)
+                            self._stats["granted"] += 1
+                            self._stats["waited"] += waited
+                            self._cond.notify_all()
+                            return
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self._stats["expired"] += 1
+                            raise QuotaExceeded(f"No {model_name} quota available before the deadline")
+                        wait = min(wait, remaining)
+                waited = True
+                await asyncio.sleep(min(wait, ASYNC_POLL_INTERVAL))
+        finally:
+            with self._cond:
+                if entry in budget.waiters:
+                    budget.waiters.remove(entry)
+                    heapq.heapify(budget.waiters)
+                self._cond.notify_all()
+
+    def record_usage(self, model_name: str, estimated_tokens: int, actual_tokens: int) -> None:
+        """Charge the difference between the estimate taken at acquire() and real usage."""
+        with self._cond:
+            budget = self._budget(model_name)
+            budget.tokens -= actual_tokens - min(estimated_tokens, budget.token_capacity)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["waiting"] = {name: len(budget.waiters) for name, budget in self._budgets.items()}
+            return stats
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of configured GenerativeModel handles, keyed by model name,
+    generation config and system instruction, with a concurrency limit per model name.
+    """
+
+    def __init__(self, default_concurrency: int = 16, concurrency: dict = None, limiter: QuotaLimiter = None,
+                 max_retries: int = 4, retry_base_delay: float = 0.5, retry_max_delay: float = 20.0):
+        """
+        :param default_concurrency: Concurrent calls allowed per model name.
+        :param concurrency: Overrides per model name, e.g. {"gemini-2.0-flash": 4}.
+        :param limiter: Shared quota limiter every call goes through, if any.
+        :param max_retries: Retries after a 429/5xx answer, with jittered exponential backoff.
+        """
+        self.default_concurrency = default_concurrency
+        self.concurrency = dict(concurrency or {})
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._models = {}
+        self._semaphores = {}
+        self._async_semaphores = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_concurrency(value: str) -> dict:
+        """Parse "model=limit,model=limit" as used by GEMINI_MODEL_CONCURRENCY."""
+        limits = {}
+        for item in filter(None, (part.strip() for part in (value or "").split(","))):
+            name, _, limit = item.partition("=")
+            limits[name.strip()] = int(limit)
+        return limits
+
+    @staticmethod
+    def _config_key(generation_config):
+        if not generation_config:
+            return None
+        try:
+            return tuple(sorted(generation_config.items()))
+        except TypeError:
+            # Nested values such as a response schema are not hashable
+            return json.dumps(generation_config, sort_keys=True, default=str)
+
+    def get(self, model_name: str, generation_config: dict = None, system_instruction: str = None):
+        key = (model_name, self._config_key(generation_config), system_instruction)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = get_genai().GenerativeModel(
+                        model_name=model_name,
+                        generation_config=generation_config,
+                        system_instruction=system_instruction
+                    )
+                    self._models[key] = model
+        return model
+
+    def limit(self, model_name: str) -> threading.BoundedSemaphore:
+        """Semaphore to hold (as a context manager) while calling the model."""
+        semaphore = self._semaphores.get(model_name)
+        if semaphore is None:
+            with self._lock:
+                semaphore = self._semaphores.get(model_name)
+                if semaphore is None:
+                    limit = self.concurrency.get(model_name, self.default_concurrency)
+                    semaphore = threading.BoundedSemaphore(limit)
+                    self._semaphores[model_name] = semaphore
+        return semaphore
+
+    def call(self, model_name: str, fn, tokens: int = 0, priority: int = INTERACTIVE, timeout: float = None,
+             use_slot: bool = True):
+        """
+        Run fn() against a model: wait for quota, hold a concurrency slot and retry
+        throttling and transient server errors with jittered exponential backoff.
+
+        :param tokens: Estimated tokens the call consumes, charged to the TPM budget.
+        :param priority: INTERACTIVE or BULK.
+        :param timeout: Seconds the call may spend queueing and retrying in total.
+        :param use_slot: Take the model's concurrency slot; False when the caller holds it.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        for attempt in itertools.count():
+            if self.limiter is not None:
+                self.limiter.acquire(model_name, tokens, priority, deadline)
+            try:
+                if not use_slot:
+                    return fn()
+                with self.limit(model_name):
+                    return fn()
+            except Exception as e:
+                record_upstream_error("gemini", e)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                logger.warning("Retrying %s after error (%s) in %.2fs", model_name, e, delay)
+                time.sleep(delay)
+
+    def limit_async(self, model_name: str) -> asyncio.Semaphore:
+        """asyncio counterpart of limit(), one semaphore per model name and event loop."""
+        key = (asyncio.get_running_loop(), model_name)
+        semaphore = self._async_semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency.get(model_name, self.default_concurrency))
+            self._async_semaphores[key] = semaphore
+        return semaphore
+
+    async def call_async(self, model_name: str, fn, tokens: int = 0, priority: int = INTERACTIVE,
+                         timeout: float = None, use_slot: bool = True):
+        """
+        call() for coroutines: fn() returns an awaitable, and waiting for quota, for a
+        concurrency slot or before a retry does not block the event loop.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        for attempt in itertools.count():
+            if self.limiter is not None:
+                await self.limiter.acquire_async(model_name, tokens, priority, deadline)
+            try:
+                if not use_slot:
+                    return await fn()
+                async with self.limit_async(model_name):
+                    return await fn()
+            except Exception as e:
+                record_upstream_error("gemini", e)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                logger.warning("Retrying %s after error (%s) in %.2fs", model_name, e, delay)
+                await asyncio.sleep(delay)
+
+    async def generate_content_async(self, model_name: str, contents, generation_config: dict = None,
+                                     system_instruction: str = None, priority: int = INTERACTIVE,
+                                     timeout: float = None, **kwargs):
+        model = self.get(model_name, generation_config, system_instruction)
+        tokens = estimate_tokens(contents)
+        response = await self.call_async(model_name, lambda: model.generate_content_async(contents, **kwargs),
+                                         tokens=tokens, priority=priority, timeout=timeout)
+        self.record_usage(model_name, tokens, response)
+        return response
+
+    def generate_content(self, model_name: str, contents, generation_config: dict = None,
+                         system_instruction: str = None, priority: int = INTERACTIVE, timeout: float = None,
+                         **kwargs):
+        model = self.get(model_name, generation_config, system_instruction)
+        tokens = estimate_tokens(contents)
+        response = self.call(model_name, lambda: model.generate_content(contents, **kwargs),
+                             tokens=tokens, priority=priority, timeout=timeout)
+        self.record_usage(model_name, tokens, response)
+        return response
+
+    def record_usage(self, model_name: str, estimated_tokens: int, response) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None)
+        if self.limiter is not None and actual:
+            self.limiter.record_usage(model_name, estimated_tokens, actual)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._async_semaphores.clear()
+
+
+def upload_to_gemini(path, mime_type=None):
+    with span("gemini_upload"):
+        file = get_genai().upload_file(path, mime_type=mime_type)
+    logger.info("Uploaded file '%s' as: %s", file.display_name, file.uri)
+    return file
+
+
+def iter_active_files(files, get_file=None, initial_delay: float = 0.25, max_delay: float = 5.0,
+                      backoff: float = 1.5, timeout: float = 300.0):
+    """
+    Poll all uploaded files concurrently and yield each one as soon as it is ACTIVE.
+
+    :param files: Files returned by genai.upload_file.
+    :param get_file: Lookup used for polling, genai.get_file by default.
+    :param initial_delay: First wait in seconds between two polls of the same file.
+    :param max_delay: Upper bound for the exponentially growing wait.
+    :param backoff: Factor applied to the wait after every PROCESSING answer.
+    :param timeout: Overall deadline in seconds for all files.
+    :raises TimeoutError: If some file is still processing at the deadline.
+    """
+    get_file = get_file or get_genai().get_file
+    deadline = time.monotonic() + timeout
+    stop = threading.Event()
+
+    def poll(name):
+        delay = initial_delay
+        while True:
+            file = get_file(name)
+            if file.state.name == "ACTIVE":
+                return file
+            if file.state.name != "PROCESSING":
+                raise Exception(f"File {file.name} failed to process")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or stop.wait(min(delay * random.uniform(0.8, 1.2), remaining)):
+                raise TimeoutError(f"File {name} is still processing")
+            delay = min(delay * backoff, max_delay)
+
+    if not files:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(files), thread_name_prefix="gemini-file") as pool:
+        futures = [pool.submit(poll, file.name) for file in files]
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                yield future.result()
+        except FuturesTimeoutError:
+            raise TimeoutError(f"Files not ready after {timeout} seconds")
+        finally:
+            stop.set()
+
+
+def wait_for_files_active(files, get_file=None, timeout: float = 300.0, **backoff_options):
+    """
+    Block until every file is ACTIVE.
+
+    :return: The refreshed files in the order they were given.
+    """
+    logger.debug("Waiting for file processing...")
+    with span("gemini_file_wait"):
+        ready = {file.name: file for file in iter_active_files(files, get_file=get_file, timeout=timeout, **backoff_options)}
+    logger.debug("...all files ready")
+    return [ready[file.name] for file in files]
+
+
+def cancel_stream(response):
+    """
+    Cancel the upstream call behind a stream=True generate_content response, e.g. when the
+    client that is being relayed to has disconnected.
+    """
+    # The SDK keeps the gRPC response stream on a private attribute; it exposes cancel()
+    cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+    if cancel is None:
+        logger.debug("Cannot cancel %s stream; it ends when the response is released", type(response).__name__)
+        return
+    cancel()
+
+
+async def cancel_stream_async(response):
+    """
+    cancel_stream() for a stream=True generate_content_async response. Its stream is an
+    async generator over the gRPC call; closing it ends the stream, and gRPC cancels the
+    call once it is released.
+    """
+    iterator = getattr(response, "_iterator", None)
+    cancel = getattr(iterator, "cancel", None)
+    if cancel is not None:
+        cancel()
+        return
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is None:
+        logger.debug("Cannot cancel %s stream; it ends when the response is released", type(response).__name__)
+        return
+    try:
+        await aclose()
+    except Exception as e:
+        logger.debug("Closing the %s stream failed: %s", type(response).__name__, e)
@@ -0,0 +1,56 @@
+"""
+Production serving: gunicorn preforks WEB_CONCURRENCY workers from a master that has
+already imported the app, and every worker sets up its own Gemini and Mongo clients and
+job threads after the fork.
+
+    gunicorn --config gunicorn.conf.py
+
+GUNICORN_WORKER_CLASS=gevent serves each worker's requests on greenlets instead of a
+fixed thread pool, for many concurrent slow Gemini calls per worker.
+"""
+
+import multiprocessing
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+if worker_class == "gevent":
+    # Patch before the app (and its locks, sockets and thread pools) is imported by the master
+    from gevent import monkey
+    monkey.patch_all()
+    # gRPC does not cooperate with gevent; the REST transport goes through patched sockets
+    os.environ.setdefault("GEMINI_TRANSPORT", "rest")
+
+wsgi_app = "app:create_app(initialize=False)"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+# Request threads per gthread worker, open connections per gevent worker
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+# Streaming endpoints hold a request open for as long as Gemini generates
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Import the app once in the master; workers fork with the modules already loaded
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def when_ready(server):
+    if preload_app:
+        # Loaded lazily by the app; importing it here keeps it out of every worker's startup
+        from gemini import get_genai
+        get_genai(configure=False)
+
+
+def post_fork(server, worker):
+    from app import init_worker
+    # Every worker enforces its share of the Gemini quotas; server.cfg also reflects a
+    # --workers override on the command line
+    init_worker(workers=server.cfg.workers)
+
+
+def worker_exit(server, worker):
+    from app import shutdown_worker
+    shutdown_worker()
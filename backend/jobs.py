@@ -0,0 +1,240 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobError(Exception):
+    """A pipeline failure whose message and details are reported to the polling client."""
+
+    def __init__(self, message: str, details: str = None):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Local background job runner. Job state lives in a Mongo collection so clients can
+    poll it from any worker and unfinished jobs are picked up again after a restart.
+    """
+
+    def __init__(self, collection, handler, kind: str = "roadmap", max_workers: int = 2, max_pending: int = 32,
+                 heartbeat_seconds: int = 60, stale_after_seconds: int = 300):
+        """
+        :param collection: Mongo collection holding the job documents.
+        :param handler: Callable(payload, set_stage) returning the job result dict.
+                        set_stage(stage, progress=None) reports the current stage and an
+                        optional progress dict to polling clients.
+        :param kind: Job type handled by this queue; several queues can share a collection.
+        :param max_workers: Number of jobs executed at the same time.
+        :param max_pending: Queued plus running jobs accepted before submit() refuses more.
+        :param heartbeat_seconds: Interval at which a running job's updated_at is refreshed,
+                                  so long stages are not mistaken for abandoned ones.
+        :param stale_after_seconds: A running job without a heartbeat for this long is
+                                    considered orphaned by a dead process and re-queued.
+                                    Must be a few heartbeat intervals.
+        """
+        self.collection = collection
+        self.handler = handler
+        self.kind = kind
+        self.max_pending = max_pending
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_after = timedelta(seconds=stale_after_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._pending = 0
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def submit(self, payload: dict, job_id: str = None) -> str:
+        """Persist a new job and schedule it. Raises QueueFullError when the pool is saturated."""
+        job_id = job_id or uuid.uuid4().hex
+        self._reserve()
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.insert_one({
+                "_id": job_id,
+                "kind": self.kind,
+                "status": QUEUED,
+                "stage": None,
+                "progress": None,
+                "payload": payload,
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            })
+        except Exception:
+            self._release()
+            raise
+        self._schedule(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> dict:
+        """Return the client-visible state of a job, or None if it does not exist."""
+        job = self.collection.find_one({"_id": job_id}, {"payload": 0})
+        if job is None:
+            return None
+        return {
+            "job_id": job["_id"],
+            "kind": job.get("kind"),
+            "status": job["status"],
+            "stage": job.get("stage"),
+            "progress": job.get("progress"),
+            "result": job.get("result"),
+            "error": job.get("error"),
+            "created_at": job["created_at"].isoformat(),
+            "updated_at": job["updated_at"].isoformat(),
+        }
+
+    def resume(self) -> int:
+        """
+        Schedule jobs left unfinished by a previous process and start a reaper thread that
+        keeps doing so. Called once at startup.
+
+        A worker restarted within stale_after leaves its running jobs looking alive at
+        startup, so only the reaper can pick them up once their heartbeat has expired.
+
+        :return: Number of jobs scheduled now.
+        """
+        resumed = self._reap(queued_before=None)
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap_forever, name=f"job-reaper-{self.kind}", daemon=True)
+            self._reaper.start()
+        return resumed
+
+    def _reap_forever(self) -> None:
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            try:
+                # Queued jobs this young are still waiting in a live worker's executor
+                reaped = self._reap(queued_before=datetime.now(timezone.utc) - self.stale_after)
+                if reaped:
+                    logger.info("Rescheduled %d orphaned %s jobs", reaped, self.kind)
+            except Exception:
+                logger.warning("Reaping %s jobs failed", self.kind, exc_info=True)
+
+    def _reap(self, queued_before: datetime = None) -> int:
+        """
+        Re-queue running jobs whose heartbeat has stopped and schedule queued jobs that this
+        process is not already holding.
+
+        :param queued_before: Only schedule queued jobs last updated before this time;
+                              None schedules all of them.
+        :return: Number of jobs scheduled.
+        """
+        cutoff = datetime.now(timezone.utc) - self.stale_after
+        self.collection.update_many(
+            {"kind": self.kind, "status": RUNNING, "updated_at": {"$lt": cutoff}},
+            {"$set": {"status": QUEUED, "stage": None}},
+        )
+        query = {"kind": self.kind, "status": QUEUED}
+        if queued_before is not None:
+            # Re-queueing above keeps the dead run's updated_at, so those jobs match at once
+            query["updated_at"] = {"$lt": queued_before}
+        scheduled = 0
+        for job in self.collection.find(query, {"_id": 1}).sort("created_at", 1):
+            with self._lock:
+                if job["_id"] in self._scheduled:
+                    continue
+            try:
+                self._reserve()
+            except QueueFullError:
+                break
+            self._schedule(job["_id"])
+            scheduled += 1
+        return scheduled
+
+    def _schedule(self, job_id: str) -> None:
+        # The caller has reserved a pending slot; _run releases it
+        with self._lock:
+            self._scheduled.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str) -> None:
+        try:
+            # Claim the job atomically so two workers never run the same one
+            job = self.collection.find_one_and_update(
+                {"_id": job_id, "status": QUEUED},
+                {"$set": {"status": RUNNING, "updated_at": datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                return
+
+            def set_stage(stage: str, progress: dict = None) -> None:
+                fields = {"stage": stage}
+                if progress is not None:
+                    fields["progress"] = progress
+                self._update(job_id, fields)
+
+            stop_heartbeat = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(job_id, stop_heartbeat),
+                             name=f"job-heartbeat-{job_id}", daemon=True).start()
+            try:
+                result = self.handler(job["payload"], set_stage)
+            except JobError as e:
+                self._finish(job_id, {"status": FAILED, "error": {"error": e.message, "details": e.details}})
+            except Exception as e:
+                logger.exception("Unexpected error in job %s", job_id)
+                self._finish(job_id, {"status": FAILED, "error": {
+                    "error": "An unexpected error occurred while processing your request.",
+                    "details": str(e),
+                }})
+            else:
+                self._finish(job_id, {"status": SUCCEEDED, "stage": None, "result": result})
+            finally:
+                stop_heartbeat.set()
+        except Exception:
+            logger.exception("Job %s could not be recorded", job_id)
+        finally:
+            with self._lock:
+                self._scheduled.discard(job_id)
+            self._release()
+
+    def _heartbeat(self, job_id: str, stop: threading.Event) -> None:
+        # A single Gemini call can outlast stale_after without any set_stage in between;
+        # only a job whose process died stops being refreshed
+        while not stop.wait(self.heartbeat_seconds):
+            try:
+                self.collection.update_one(
+                    {"_id": job_id, "status": RUNNING},
+                    {"$set": {"updated_at": datetime.now(timezone.utc)}},
+                )
+            except Exception:
+                logger.warning("Heartbeat for job %s failed", job_id, exc_info=True)
+
+    def _update(self, job_id: str, fields: dict) -> None:
+        fields["updated_at"] = datetime.now(timezone.utc)
+        self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    def _finish(self, job_id: str, fields: dict) -> None:
+        # The payload (including uploaded files) is only needed until the job has run
+        fields["updated_at"] = datetime.now(timezone.utc)
+        self.collection.update_one({"_id": job_id}, {"$set": fields, "$unset": {"payload": ""}})
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"{self._pending} jobs already pending")
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
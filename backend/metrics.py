@@ -0,0 +1,232 @@
+"""
+Process-local metrics in the Prometheus text exposition format, served by /metrics.
+Counters and histograms are updated in place; callback metrics (cache hit ratios, quota
+queue lengths) are read from their owners when the endpoint is scraped.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; wide enough for a multi-minute roadmap generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted((key, dict(s, counts=list(s["counts"]))) for key, s in self._series.items())
+        lines = []
+        for key, s in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, s["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(s['sum'])}")
+            lines.append(f"{self.name}_count{labels} {s['count']}")
+        return lines
+
+
+class Callback(_Metric):
+    """Metric whose samples are produced by fn() at scrape time, as {label values tuple: value}."""
+
+    def __init__(self, name, documentation, labelnames, fn, type="gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def render(self) -> list:
+        try:
+            samples = self.fn()
+        except Exception as e:
+            logger.warning("Collecting %s failed: %s", self.name, e)
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(samples.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering returns the existing metric, so modules can be imported twice
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, fn, type="gauge") -> Callback:
+        return self._register(Callback(name, documentation, labelnames, fn, type))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+stage_seconds = REGISTRY.histogram(
+    "stage_duration_seconds",
+    "Time spent in a pipeline stage (PDF extraction, Gemini upload and generation, Mongo, YouTube).",
+    ("stage", "outcome"),
+)
+upstream_errors = REGISTRY.counter(
+    "upstream_errors_total",
+    "Failed calls to Gemini, YouTube and MongoDB by error type.",
+    ("service", "error"),
+)
+request_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route and status code.",
+    ("method", "route", "status"),
+)
+
+
+@contextmanager
+def span(stage: str, timings: dict = None):
+    """
+    Time a block as one stage: observed into stage_duration_seconds with outcome ok or
+    error, logged at DEBUG, and stored in timings[stage] when a dict is given.
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage, outcome=outcome)
+        if timings is not None:
+            timings[stage] = elapsed
+        logger.debug("stage %s %s in %.1f ms", stage, outcome, elapsed * 1000)
+
+
+def record_upstream_error(service: str, error: Exception) -> None:
+    upstream_errors.inc(service=service, error=type(error).__name__)
+
+
+_caches = {}
+
+
+def _cache_samples():
+    samples = {}
+    for name, cache in list(_caches.items()):
+        for field, value in cache.stats().items():
+            if field not in ("hit_ratio", "inflight", "local_entries") and isinstance(value, (int, float)):
+                samples[(name, field)] = value
+    return samples
+
+
+def register_cache(name: str, cache) -> None:
+    """
+    Expose a cache's stats() counters and hit ratio, e.g. a ContentCache or RoadmapCache.
+    Registering another cache under the same name replaces the first one.
+    """
+    _caches[name] = cache
+
+
+REGISTRY.callback(
+    "cache_events_total", "Cache lookup outcomes (hits, misses, coalesced waits, errors).", ("cache", "event"),
+    _cache_samples, type="counter",
+)
+REGISTRY.callback(
+    "cache_hit_ratio", "Share of lookups answered from the cache since start.", ("cache",),
+    lambda: {(name,): cache.stats().get("hit_ratio", 0.0) for name, cache in list(_caches.items())},
+)
+REGISTRY.callback(
+    "cache_entries", "Entries held in the in-process tier of each cache.", ("cache",),
+    lambda: {(name,): cache.stats()["local_entries"] for name, cache in list(_caches.items())
+             if "local_entries" in cache.stats()},
+)
@@ -1,18 +1,197 @@
+import io
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+
 from PyPDF2 import PdfReader
 
-def read_pdf(file_path: str) -> str:
+# Below this many pages the process pool costs more than it saves
+PARALLEL_MIN_PAGES = 32
+
+# Control, C1, private-use and replacement characters: what broken font encodings extract as
+_GARBAGE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\ue000-\uf8ff\ufffd]")
+_WHITESPACE = re.compile(r"\s")
+
+# How often a page range waiting for its result checks whether its pool was terminated
+_TERMINATION_POLL_SECONDS = 0.25
+
+_pool = None
+_pool_lock = threading.Lock()
+# Server processes sharing the CPUs; init_worker() sets the gunicorn worker count
+_server_workers = int(os.getenv("WEB_CONCURRENCY") or "1")
+
+
+class PoolTerminatedError(RuntimeError):
+    """The process pool a page range ran on was terminated because another range hung."""
+
+
+class _ExtractionPool:
+    def __init__(self, size: int):
+        # spawn rather than fork: the web process is multi-threaded
+        self.pool = multiprocessing.get_context("spawn").Pool(processes=size)
+        self.size = size
+        self.pid = os.getpid()
+        self.terminated = threading.Event()
+
+
+def _open_reader(source) -> PdfReader:
+    if isinstance(source, (bytes, bytearray)):
+        return PdfReader(io.BytesIO(source))
+    return PdfReader(source)
+
+
+def _page_count(reader: PdfReader, max_pages: int = None) -> int:
+    count = len(reader.pages)
+    return count if max_pages is None else min(count, max_pages)
+
+
+def _extract_range(source, start: int, stop: int) -> list:
+    """Worker task: extract the text of pages [start, stop) from a PDF path or bytes."""
+    reader = _open_reader(source)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+def set_server_workers(workers: int) -> None:
+    """
+    Tell the module how many server processes share the machine, so each one's default
+    pool only gets its share of the CPUs. Call before the first extraction.
+    """
+    global _server_workers
+    _server_workers = max(1, workers)
+
+
+def _pool_workers() -> int:
+    return int(os.getenv("PDF_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // _server_workers)
+
+
+def _get_pool() -> _ExtractionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = _ExtractionPool(_pool_workers())
+        return _pool
+
+
+def _discard_pool(pool: _ExtractionPool) -> None:
+    """Terminate pool unless it has already been replaced, and fail the ranges waiting on it."""
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    pool.terminated.set()
+    pool.pool.terminate()
+
+
+def _submit_ranges(file_path, count: int, serial: bool):
+    """
+    Split pages [0, count) into ranges and schedule them on the current pool, replacing it
+    once if another caller terminated it in between.
+
+    :return: (pool, ranges, async results)
+    """
+    for attempt in range(2):
+        pool = _get_pool()
+        chunk_size = count if serial else math.ceil(count / (pool.size * 2))
+        ranges = [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+        try:
+            return pool, ranges, [pool.pool.apply_async(_extract_range, (file_path, start, stop))
+                                  for start, stop in ranges]
+        except ValueError:
+            # "Pool not running": another caller's timeout terminated it after _get_pool()
+            if attempt or not pool.terminated.is_set():
+                raise
+
+
+def _wait(pool: _ExtractionPool, result, timeout: float = None) -> list:
+    deadline = time.monotonic() + timeout if timeout else None
+    while not result.ready():
+        if pool.terminated.is_set():
+            raise PoolTerminatedError("PDF extraction was aborted because another extraction hung")
+        wait = _TERMINATION_POLL_SECONDS
+        if deadline is not None:
+            wait = min(wait, deadline - time.monotonic())
+            if wait <= 0:
+                raise multiprocessing.TimeoutError()
+        result.wait(wait)
+    return result.get()
+
+
+def iter_pdf_pages(file_path, max_pages: int = None):
+    """
+    Yields the text of a PDF page by page, so callers can stream it.
+
+    :param file_path: Path to the PDF file, or its contents as bytes or a binary stream.
+    :param max_pages: Stop after this many pages.
+    """
+    reader = _open_reader(file_path)
+    for i in range(_page_count(reader, max_pages)):
+        yield reader.pages[i].extract_text()
+
+
+def read_pdf(file_path, max_pages: int = None, page_timeout: float = None) -> str:
     """
-    Reads and extracts text from a PDF file.
+    Reads and extracts text from a PDF file. Large documents are split into page ranges
+    that are extracted in parallel by a process pool and joined once at the end.
 
-    :param file_path: Path to the PDF file.
+    :param file_path: Path to the PDF file, or its contents as bytes or a binary stream.
+    :param max_pages: Only extract the first max_pages pages.
+    :param page_timeout: Seconds allowed per page; a range of n pages gets n times this.
+        With a timeout, small documents are extracted on the pool as well (as one range),
+        since only a worker process can be abandoned when extraction hangs.
     :return: Extracted text as a string.
+    :raises TimeoutError: If a page range takes longer than its timeout.
+    :raises PoolTerminatedError: If another call's timeout terminated the pool this one ran on.
     """
-    # Initialize a PdfReader object
-    reader = PdfReader(file_path)
-    
-    # Extract text from each page
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    
-    return text
\ No newline at end of file
+    if hasattr(file_path, "read"):
+        file_path = file_path.read()
+
+    reader = _open_reader(file_path)
+    count = _page_count(reader, max_pages)
+
+    serial = count < PARALLEL_MIN_PAGES or _pool_workers() < 2
+    if serial and not page_timeout:
+        return "".join(reader.pages[i].extract_text() for i in range(count))
+    if not count:
+        return ""
+
+    pool, ranges, results = _submit_ranges(file_path, count, serial)
+
+    texts = []
+    for (start, stop), result in zip(ranges, results):
+        timeout = page_timeout * (stop - start) if page_timeout else None
+        try:
+            texts.extend(_wait(pool, result, timeout))
+        except multiprocessing.TimeoutError:
+            # A stuck worker cannot be interrupted; replace the whole pool. Other callers'
+            # ranges on it fail with PoolTerminatedError instead of waiting out their timeouts
+            _discard_pool(pool)
+            raise TimeoutError(f"Extracting pages {start + 1}-{stop} took longer than {timeout} seconds")
+
+    return "".join(texts)
+
+
+def text_quality(text: str, pages: int) -> dict:
+    """
+    How much real text a PDF's text layer holds. Scanned pages extract as little or no
+    text, and fonts without a usable encoding extract as control or private-use characters.
+
+    :param text: Extracted text, e.g. from read_pdf().
+    :param pages: Pages the text was extracted from.
+    :return: {"pages", "chars_per_page" (non-whitespace), "garbage_ratio"}
+    """
+    visible = len(text) - len(_WHITESPACE.findall(text))
+    garbage = len(_GARBAGE.findall(text))
+    return {
+        "pages": pages,
+        "chars_per_page": round(visible / pages, 1) if pages else 0.0,
+        "garbage_ratio": round(garbage / visible, 4) if visible else 1.0,
+    }
+
+
+def is_text_usable(quality: dict, min_chars_per_page: float = 200, max_garbage_ratio: float = 0.02) -> bool:
+    """Whether a text_quality() result is good enough to stand in for the PDF itself."""
+    return quality["chars_per_page"] >= min_chars_per_page and quality["garbage_ratio"] <= max_garbage_ratio
@@ -0,0 +1,163 @@
+"""
+Precompiled graph form of a roadmap (nodes with positions, edges) for the React Flow view.
+The graph is laid out and serialized once when the roadmap is stored, together with its
+compressed encodings and an ETag, so serving it is a conditional lookup and a byte copy.
+"""
+
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:
+    # Optional; without it clients get gzip
+    brotli = None
+
+# Bump when the layout or the graph format changes; stored graphs of an older version are
+# recompiled on their next request
+GRAPH_VERSION = 1
+
+# Preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Compression levels: bodies compiled once when stored get the smallest encoding, bodies
+# compressed per response (compile_body(encodings=())) a fast one
+STORED_BROTLI_QUALITY = 11
+STORED_GZIP_LEVEL = 9
+ON_THE_FLY_BROTLI_QUALITY = 5
+ON_THE_FLY_GZIP_LEVEL = 6
+
+# Roadmaps can be regenerated under the same name, so clients revalidate every time;
+# an unchanged roadmap costs a 304 without a body
+CACHE_CONTROL = "no-cache"
+
+# Layout of the course node, units stacked below it and their topics in rows of TOPICS_PER_ROW
+BASE_X = 800
+BASE_Y = 50
+UNIT_SPACING = 100
+TOPIC_SPACING = 300
+TOPIC_VERTICAL_SPACING = 100
+TOPICS_PER_ROW = 6
+
+
+def build_graph(roadmap_data: dict) -> dict:
+    """
+    :param roadmap_data: curriculum["roadMap"] as stored in Mongo.
+    :return: {"course_name", "nodes": [{"id", "kind", "label", "x", "y"}], "edges": [{"id", "source", "target"}]}
+    """
+    units = roadmap_data.get("roadmap") or []
+    max_topics = max((len(unit.get("topics") or []) for unit in units), default=0)
+    max_rows = -(-max_topics // TOPICS_PER_ROW)
+
+    nodes = [{"id": "course", "kind": "course", "label": roadmap_data.get("course_name", "N/A"),
+              "x": BASE_X, "y": BASE_Y}]
+    edges = []
+    for unit_index, unit in enumerate(units):
+        unit_id = f"unit-{unit.get('unit_number')}"
+        unit_y = BASE_Y + (unit_index + 1) * (UNIT_SPACING + max_rows * TOPIC_VERTICAL_SPACING)
+        nodes.append({"id": unit_id, "kind": "unit", "label": f"Unit {unit.get('unit_number')}: {unit.get('unit_title')}",
+                      "x": BASE_X, "y": unit_y})
+        edges.append({"id": f"course-{unit_id}", "source": "course", "target": unit_id})
+
+        for topic_index, topic in enumerate(unit.get("topics") or []):
+            topic_id = f"{unit_id}-topic-{topic_index}"
+            column = topic_index % TOPICS_PER_ROW
+            row = topic_index // TOPICS_PER_ROW
+            nodes.append({
+                "id": topic_id,
+                "kind": "topic",
+                "label": topic,
+                "x": BASE_X - (TOPIC_SPACING * (TOPICS_PER_ROW - 1)) / 2 + column * TOPIC_SPACING,
+                "y": unit_y + 100 + row * TOPIC_VERTICAL_SPACING,
+            })
+            edges.append({"id": f"{unit_id}-{topic_id}", "source": unit_id, "target": topic_id})
+
+    return {"course_name": roadmap_data.get("course_name", "N/A"), "nodes": nodes, "edges": edges}
+
+
+def _compress(body: bytes, encoding: str, stored: bool = True) -> bytes:
+    """
+    :param stored: The result is kept and served many times; spend CPU on the ratio.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=STORED_BROTLI_QUALITY if stored else ON_THE_FLY_BROTLI_QUALITY)
+    # mtime=0 keeps the gzip bytes, and so the stored graph, deterministic
+    return gzip.compress(body, compresslevel=STORED_GZIP_LEVEL if stored else ON_THE_FLY_GZIP_LEVEL, mtime=0)
+
+
+def compile_body(body: bytes, encodings=ENCODINGS) -> dict:
+    """
+    ETag and precompressed encodings of a response body, served by conditional_response().
+    Pass encodings=() for bodies built per request; they are compressed only when sent.
+    """
+    compiled = {"etag": hashlib.sha256(body).hexdigest()[:32], "identity": body}
+    for encoding in encodings:
+        compiled[encoding] = _compress(body, encoding)
+    return compiled
+
+
+def compile_graph(roadmap_data: dict) -> dict:
+    """Graph document stored next to the curriculum as "roadmap_graph"."""
+    body = json.dumps(build_graph(roadmap_data), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return dict(compile_body(body), version=GRAPH_VERSION)
+
+
+def is_current(compiled) -> bool:
+    return isinstance(compiled, dict) and compiled.get("version") == GRAPH_VERSION
+
+
+def _accepted(accept_encoding: str) -> set:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # Any encoding of the same body counts, the client may have switched encodings
+        if candidate.strip('"').split("-")[0] == etag:
+            return True
+    return False
+
+
+def conditional_response(compiled: dict, if_none_match: str = None, accept_encoding: str = None):
+    """
+    Status, body and headers for a compiled body: 304 when If-None-Match names it,
+    otherwise 200 with the best encoding the client accepts. Each encoding has its own
+    strong ETag ("<hash>", "<hash>-br", "<hash>-gzip").
+
+    :return: (status, body, headers)
+    """
+    headers = {"Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    accepted = _accepted(accept_encoding)
+    encoding = next((coding for coding in ENCODINGS if coding in accepted or "*" in accepted), None)
+
+    etag = compiled["etag"] if encoding is None else f"{compiled['etag']}-{encoding}"
+    headers["ETag"] = f'"{etag}"'
+    if _etag_matches(if_none_match, compiled["etag"]):
+        return 304, b"", headers
+
+    headers["Content-Type"] = "application/json"
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    body = compiled.get(encoding or "identity")
+    if body is None:
+        body = _compress(bytes(compiled["identity"]), encoding, stored=False)
+    return 200, bytes(body), headers
@@ -0,0 +1,297 @@
+"""
+Incremental parser for the roadMap JSON Gemini generates. Streamed replies are scanned
+chunk by chunk; the scanner drops what json.loads rejects in practice (code fences and
+prose around the object, trailing commas, missing closing brackets) and remembers where
+the last complete unit ended, so a reply cut off at max_output_tokens keeps its complete
+units and generation continues after them instead of starting over.
+"""
+
+import json
+import logging
+import re
+
+from metrics import REGISTRY, span
+
+logger = logging.getLogger(__name__)
+
+# Extra requests for the rest of a roadmap after a truncated or unusable reply
+MAX_CONTINUATIONS = 3
+
+# Array of units, under "roadMap" (or at the top level when the model drops the wrapper)
+UNITS_KEY = "roadmap"
+
+responses_total = REGISTRY.counter(
+    "roadmap_responses_total",
+    "Roadmap replies by parse outcome: clean, repaired, truncated (complete units kept) or invalid.",
+    ("outcome",),
+)
+discarded_tokens_total = REGISTRY.counter(
+    "roadmap_discarded_tokens_total",
+    "Estimated output tokens of roadmap replies thrown away (partial units, unparseable replies).",
+)
+
+
+class RoadmapFormatError(ValueError):
+    """The model's reply does not contain a usable roadmap."""
+
+
+def _closer(opener: str) -> str:
+    return "}" if opener == "{" else "]"
+
+
+class RoadmapStream:
+    """
+    Feed the chunks of one reply to feed(), then call finish(). The scanner keeps a cleaned
+    copy of the JSON (whitespace, trailing commas and surrounding text removed) and the
+    bracket stack, so closing a prefix of the reply is a matter of appending closers.
+    """
+
+    def __init__(self):
+        self._out = []
+        self._stack = []        # (opener, key the container is the value of)
+        self._in_string = False
+        self._escape = False
+        self._string = []
+        self._last_string = None
+        self._key = None
+        self._pending_comma = False
+        self._done = False
+        self._units_end = 0     # len(_out) after the last complete unit
+        self._units_closers = ""
+        self.units = 0
+        self.repairs = 0
+        self.chars = 0
+        self.curriculum = None
+        self.complete = False
+        self.outcome = None
+        self.discarded_chars = 0
+
+    def _closers(self) -> str:
+        return "".join(_closer(opener) for opener, _ in reversed(self._stack))
+
+    def feed(self, chunk: str) -> None:
+        self.chars += len(chunk)
+        out = self._out
+        for ch in chunk:
+            if self._in_string:
+                out.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._string)
+                    continue
+                self._string.append(ch)
+                continue
+
+            if ch.isspace():
+                continue
+            if self._done or (not self._stack and ch != "{"):
+                # Code fences or prose before or after the object
+                self.repairs += 1
+                continue
+
+            if ch == ",":
+                if self._pending_comma:
+                    self.repairs += 1
+                self._pending_comma = True
+                continue
+            if ch in "}]":
+                if self._pending_comma:
+                    # Trailing comma
+                    self._pending_comma = False
+                    self.repairs += 1
+                opener, _ = self._stack.pop()
+                if ch != _closer(opener):
+                    self.repairs += 1
+                out.append(_closer(opener))
+                if opener == "{" and self._stack and self._stack[-1] == ("[", UNITS_KEY):
+                    self.units += 1
+                    self._units_end = len(out)
+                    self._units_closers = self._closers()
+                if not self._stack:
+                    self._done = True
+                continue
+
+            if self._pending_comma:
+                out.append(",")
+                self._pending_comma = False
+            if ch == ":":
+                self._key = self._last_string
+            elif ch in "{[":
+                in_object = self._stack and self._stack[-1][0] == "{"
+                self._stack.append((ch, self._key if in_object else None))
+                self._key = None
+            elif ch == '"':
+                self._in_string = True
+                self._string = []
+            out.append(ch)
+
+    def finish(self, truncated: bool = False):
+        """
+        Parse what was fed. Sets curriculum (normalized, or None), complete (False when the
+        reply was cut off or unusable and generation should continue) and outcome.
+
+        :param truncated: The model stopped at its output limit (finish reason MAX_TOKENS).
+        :return: self
+        """
+        text = "".join(self._out)
+        # A reply that hit the limit right after its last bracket is still whole
+        whole = self._done or not truncated
+        if whole and not self._in_string and self._stack:
+            # Ended without closing its brackets
+            self.repairs += 1
+        if whole and not self._in_string:
+            try:
+                self.curriculum = normalize_roadmap(json.loads(text + self._closers()))
+                self.complete = True
+                self.outcome = "repaired" if self.repairs else "clean"
+            except (ValueError, RoadmapFormatError):
+                self.curriculum = None
+
+        if self.curriculum is None and self.units:
+            # Keep the complete units; the partial one after them is generated again
+            try:
+                self.curriculum = normalize_roadmap(json.loads(text[:self._units_end] + self._units_closers))
+                self.outcome = "truncated"
+                self.discarded_chars = len(text) - self._units_end
+            except (ValueError, RoadmapFormatError):
+                self.curriculum = None
+
+        if self.curriculum is None:
+            self.outcome = "invalid"
+            self.discarded_chars = len(text)
+
+        responses_total.inc(outcome=self.outcome)
+        if self.discarded_chars:
+            discarded_tokens_total.inc(self.discarded_chars // 4)
+        return self
+
+
+def _unit_text(value) -> str:
+    return value.strip() if isinstance(value, str) else str(value)
+
+
+def normalize_roadmap(data) -> dict:
+    """
+    Check a parsed reply against the roadMap schema and coerce it into the stored shape:
+    {"roadMap": {"course_name": str, "roadmap": [{"unit_number": str, "unit_title": str,
+    "topics": [str, ...]}, ...]}}. Units without topics are dropped.
+    """
+    if not isinstance(data, dict):
+        raise RoadmapFormatError("roadmap reply is not a JSON object")
+    roadmap = data.get("roadMap", data)
+    if not isinstance(roadmap, dict) or not isinstance(roadmap.get(UNITS_KEY), list):
+        raise RoadmapFormatError("roadmap reply has no roadMap.roadmap list")
+
+    units = []
+    for unit in roadmap[UNITS_KEY]:
+        if not isinstance(unit, dict):
+            continue
+        topics = [_unit_text(topic) for topic in unit.get("topics") or [] if topic not in (None, "")]
+        topics = [topic for topic in topics if topic]
+        if not topics:
+            continue
+        units.append({
+            "topics": topics,
+            "unit_number": _unit_text(unit.get("unit_number") or len(units) + 1),
+            "unit_title": _unit_text(unit.get("unit_title", "")),
+        })
+    if not units:
+        raise RoadmapFormatError("roadmap reply has no units with topics")
+
+    return {"roadMap": {"course_name": _unit_text(roadmap.get("course_name") or "N/A"), UNITS_KEY: units}}
+
+
+def finish_reason(response):
+    """Name of the first candidate's finish reason, e.g. "STOP" or "MAX_TOKENS"."""
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return None
+    reason = getattr(candidates[0], "finish_reason", None)
+    return getattr(reason, "name", reason)
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text
+    except ValueError:
+        # A chunk without text parts, e.g. the final one carrying only the finish reason
+        return ""
+
+
+def read_stream(response) -> RoadmapStream:
+    """Scan a streamed (or complete) generate response and finish parsing it."""
+    stream = RoadmapStream()
+    for chunk in response:
+        stream.feed(_chunk_text(chunk))
+    # Only the parse; feeding is dominated by waiting for the streamed chunks
+    with span("json_parse"):
+        return stream.finish(truncated=finish_reason(response) == "MAX_TOKENS")
+
+
+def continuation_message(units) -> str:
+    if not units:
+        return ("Your previous answer was cut off or was not valid JSON. Generate the complete roadmap again, "
+                "as JSON only, in the format described above.")
+    last = units[-1]
+    return (f"Your previous answer was cut off after unit {last['unit_number']} (\"{last['unit_title']}\"). "
+            f"Continue with the units after it only, as JSON in the same format: "
+            f"{{\"roadMap\": {{\"course_name\": ..., \"roadmap\": [...]}}}}. Do not repeat earlier units.")
+
+
+def _unit_key(unit) -> str:
+    # Continuations may omit unit numbers or restart them at 1, so the title identifies a unit
+    title = " ".join(re.sub(r"\W+", " ", unit["unit_title"]).split()).lower()
+    return title or unit["unit_number"].lower()
+
+
+def generate_roadmap(send_message, request: str, max_continuations: int = MAX_CONTINUATIONS):
+    """
+    Ask for a roadmap and continue it while replies are truncated, merging the units of
+    all replies.
+
+    :param send_message: Callable (message) -> finished RoadmapStream. All messages must go
+        to the same chat session, so continuations see the earlier replies.
+    :param request: First message.
+    :return: (curriculum, stats) with stats {"calls", "continuations", "discarded_tokens", "outcomes"}.
+    """
+    course_name = None
+    units = []
+    seen = set()
+    stats = {"calls": 0, "continuations": 0, "discarded_tokens": 0, "outcomes": []}
+    message = request
+    complete = False
+
+    for attempt in range(max_continuations + 1):
+        if attempt:
+            stats["continuations"] += 1
+            message = continuation_message(units)
+        stream = send_message(message)
+        stats["calls"] += 1
+        stats["outcomes"].append(stream.outcome)
+        stats["discarded_tokens"] += stream.discarded_chars // 4
+
+        if stream.curriculum is not None:
+            roadmap = stream.curriculum["roadMap"]
+            if course_name is None and roadmap["course_name"] != "N/A":
+                course_name = roadmap["course_name"]
+            # Continuations sometimes restate the last unit they were given; units of one
+            # reply are never dropped against each other
+            units.extend(unit for unit in roadmap[UNITS_KEY] if _unit_key(unit) not in seen)
+            seen.update(_unit_key(unit) for unit in roadmap[UNITS_KEY])
+        if stream.complete:
+            complete = True
+            break
+
+    if not units:
+        raise RoadmapFormatError(f"no usable roadmap after {stats['calls']} replies")
+    if len({unit["unit_number"] for unit in units}) < len(units):
+        # A continuation numbered its units from 1 again
+        units = [dict(unit, unit_number=str(number)) for number, unit in enumerate(units, 1)]
+    if not complete:
+        logger.warning("Roadmap still incomplete after %d replies; keeping %d units", stats["calls"], len(units))
+
+    return {"roadMap": {"course_name": course_name or "N/A", UNITS_KEY: units}}, stats
@@ -0,0 +1,327 @@
+"""
+Near-duplicate cache for answers to free-text prompts such as /explain. Texts are embedded
+with a hashing vectorizer over character n-grams and compared by cosine similarity against
+an in-memory matrix of earlier texts, so a slightly different highlight of the same
+passage is answered with the stored explanation instead of a new Gemini call.
+
+Cosine similarity alone cannot tell "In TCP the connection..." from "In UDP the
+connection...", so a candidate is only reused when the two texts are overlapping spans
+of the same word sequence (see spans_overlap).
+"""
+
+import contextlib
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent saves from several processes are not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_WORDS = re.compile(r"\w+")
+
+# Most similar stored texts checked for span overlap per lookup
+CANDIDATES = 4
+
+
+def words(text: str) -> list:
+    return _WORDS.findall(text.lower())
+
+
+def _edge(a_rest: list, b_rest: list, before: bool):
+    """
+    Words outside the shared run on one side: 0 when only one text has any, 1 when the
+    other has just the remainder of a word cut by the selection ("ake" of "make"), None
+    when both texts differ there.
+    """
+    if not a_rest or not b_rest:
+        return 0
+    for outer, inner in ((a_rest, b_rest), (b_rest, a_rest)):
+        if len(inner) == 1:
+            word = outer[-1] if before else outer[0]
+            if word != inner[0] and (word.endswith(inner[0]) if before else word.startswith(inner[0])):
+                return 1
+    return None
+
+
+def spans_overlap(a: list, b: list, min_overlap: float = 0.7) -> bool:
+    """
+    True when word sequences a and b are two highlights of one passage: they share a run
+    of words covering min_overlap of the longer one, and outside that run only one of them
+    has words on each side (trimmed or extended ends, no swapped or inserted words). A
+    word cut by the selection counts as part of the run.
+    """
+    if not a or not b:
+        return False
+    match = difflib.SequenceMatcher(None, a, b, autojunk=False).find_longest_match(0, len(a), 0, len(b))
+    before = _edge(a[:match.a], b[:match.b], before=True)
+    after = _edge(a[match.a + match.size:], b[match.b + match.size:], before=False)
+    if before is None or after is None:
+        return False
+    return match.size + before + after >= min_overlap * max(len(a), len(b))
+
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """Exclusive advisory lock between the processes saving to one index path."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge(ours: tuple, theirs: tuple, max_entries: int) -> tuple:
+    """
+    Union of two (vectors, used, entries) indexes, one entry per text with the latest use,
+    keeping the max_entries most recently used.
+    """
+    vectors = np.concatenate([ours[0], theirs[0]])
+    used = np.concatenate([ours[1], theirs[1]])
+    entries = list(ours[2]) + list(theirs[2])
+    latest = {}
+    for index in np.argsort(used, kind="stable")[::-1]:
+        latest.setdefault(entries[index][0], int(index))
+        if len(latest) == max_entries:
+            break
+    keep = sorted(latest.values())
+    return vectors[keep], used[keep], [entries[index] for index in keep]
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of character n-grams. No model to load, stable across processes
+    (crc32, not hash()), and overlapping spans of one passage share most of their n-grams.
+    """
+
+    def __init__(self, dim: int = 1024, ngram_sizes=(3, 4, 5)):
+        self.dim = dim
+        self.ngram_sizes = tuple(ngram_sizes)
+
+    @property
+    def fingerprint(self) -> str:
+        return f"hashing-crc32:{self.dim}:{','.join(map(str, self.ngram_sizes))}"
+
+    def embed(self, text: str) -> np.ndarray:
+        """L2-normalized float32 vector; all zeros for text without word characters."""
+        padded = f" {' '.join(words(text))} "
+        indices = []
+        signs = []
+        for n in self.ngram_sizes:
+            for i in range(len(padded) - n + 1):
+                h = zlib.crc32(padded[i:i + n].encode("utf-8"))
+                indices.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if indices:
+            np.add.at(vector, np.asarray(indices), np.asarray(signs, dtype=np.float32))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SimilarityCache:
+    """
+    Brute-force cosine index of (text, value) pairs with least-recently-used eviction. One
+    matrix product per lookup; at the default 5000 x 1024 that is about a millisecond.
+    The index is saved to path now and then and loaded again on start. Entries are stamped
+    with their last use in wall-clock time, so processes sharing a path (server workers)
+    merge their indexes on save instead of overwriting each other's.
+    """
+
+    def __init__(self, embedder: HashingEmbedder, threshold: float = 0.9, max_entries: int = 5000,
+                 path: str = None, save_interval: float = 60.0, min_chars: int = 20, namespace: str = "",
+                 min_overlap: float = 0.7):
+        """
+        :param threshold: Cosine similarity at or above which a stored text is a candidate.
+        :param min_overlap: Share of the longer text the candidate's overlapping span must
+            cover for its value to be reused, see spans_overlap(). None compares by cosine
+            similarity only.
+        :param path: .npz file the index is persisted to; None keeps it in memory only.
+        :param save_interval: Minimum seconds between saves while entries are added.
+        :param min_chars: Shorter texts are never matched, a word or two is too ambiguous.
+        :param namespace: Recorded in the saved index, e.g. the model name; an index saved
+            under another namespace or embedder is not loaded.
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path
+        self.save_interval = save_interval
+        self.min_chars = min_chars
+        self.namespace = namespace
+        self.min_overlap = min_overlap
+        self._vectors = np.zeros((max_entries, embedder.dim), dtype=np.float32)
+        self._entries = [None] * max_entries
+        self._used = np.zeros(max_entries, dtype=np.float64)
+        self._size = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "skipped": 0, "evictions": 0, "rejected": 0}
+        if path:
+            self.load()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _meta(self) -> dict:
+        return {"namespace": self.namespace, "embedder": self.embedder.fingerprint}
+
+    def lookup(self, text: str, vector: np.ndarray = None):
+        """
+        :return: (value, similarity) of the most similar stored text within the
+            threshold that overlaps text as a span, or None.
+        """
+        if len(text.strip()) < self.min_chars:
+            self._count("skipped")
+            return None
+        if vector is None:
+            vector = self.embedder.embed(text)
+        query = words(text)
+
+        with self._lock:
+            if self._size:
+                similarities = self._vectors[:self._size] @ vector
+                count = min(CANDIDATES, self._size)
+                candidates = np.argpartition(-similarities, count - 1)[:count]
+                for index in sorted(candidates, key=lambda i: -similarities[i]):
+                    index = int(index)
+                    if similarities[index] < self.threshold:
+                        break
+                    if self.min_overlap is not None and not spans_overlap(
+                            query, words(self._entries[index][0]), self.min_overlap):
+                        # Similar wording, different content (a swapped term, a negation)
+                        self._counters["rejected"] += 1
+                        continue
+                    self._used[index] = time.time()
+                    self._counters["hits"] += 1
+                    return self._entries[index][1], float(similarities[index])
+            self._counters["misses"] += 1
+        return None
+
+    def add(self, text: str, value, vector: np.ndarray = None) -> None:
+        if len(text.strip()) < self.min_chars:
+            return
+        if vector is None:
+            vector = self.embedder.embed(text)
+
+        with self._lock:
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._used[:self._size]))
+                self._counters["evictions"] += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = (text, value)
+            self._used[slot] = time.time()
+            self._dirty = True
+        self._maybe_save()
+
+    def get_or_compute(self, text: str, compute):
+        """Return the value stored for a near-duplicate of text, or compute() and store it."""
+        vector = self.embedder.embed(text) if len(text.strip()) >= self.min_chars else None
+        found = self.lookup(text, vector)
+        if found is not None:
+            return found[0]
+        value = compute()
+        self.add(text, value, vector)
+        return value
+
+    def _maybe_save(self) -> None:
+        if not self.path or time.monotonic() - self._saved_at < self.save_interval:
+            return
+        # One saving thread is enough; the others carry on
+        if not self._save_lock.acquire(blocking=False):
+            return
+        try:
+            self.save()
+        finally:
+            self._save_lock.release()
+
+    def save(self) -> None:
+        """
+        Write the index to path (atomically, through a temporary file), merged with the
+        entries other processes have saved there since.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            size = self._size
+            index = (self._vectors[:size].copy(), self._used[:size].copy(), list(self._entries[:size]))
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with _file_lock(f"{self.path}.lock"):
+                saved = self._read()
+                if saved is not None:
+                    index = _merge(index, saved, self.max_entries)
+                vectors, used, entries = index
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as f:
+                    np.savez(f, vectors=vectors, used=used, entries=np.array(json.dumps(entries)),
+                             meta=np.array(json.dumps(self._meta())))
+                os.replace(temporary, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Saving similarity index to %s failed: %s", self.path, e)
+
+    def _read(self):
+        """(vectors, used, entries) saved at path, or None if there is no usable index."""
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta != self._meta():
+                    logger.info("Ignoring similarity index %s built for %s", self.path, meta)
+                    return None
+                return data["vectors"], data["used"].astype(np.float64), json.loads(str(data["entries"]))
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning("Loading similarity index from %s failed: %s", self.path, e)
+            return None
+
+    def load(self) -> int:
+        """Load the index saved at path, keeping the most recently used entries that fit."""
+        saved = self._read()
+        if saved is None:
+            return 0
+        vectors, used, entries = saved
+
+        keep = np.argsort(used)[::-1][:self.max_entries]
+        with self._lock:
+            for slot, index in enumerate(sorted(keep, key=lambda i: used[i])):
+                self._vectors[slot] = vectors[index]
+                self._entries[slot] = tuple(entries[index])
+                self._used[slot] = used[index]
+            self._size = len(keep)
+        logger.info("Loaded %d entries of similarity index %s", len(keep), self.path)
+        return len(keep)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["local_entries"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
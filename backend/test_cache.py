@@ -0,0 +1,53 @@
+"""Unit tests for the generated-content cache."""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cache import ContentCache
+
+INPUTS = {"objectives": "Learn operating systems", "title": "Paging"}
+
+
+class TestContentCache(unittest.TestCase):
+    """Test cases for ContentCache."""
+
+    def setUp(self):
+        self.collection = mongomock.MongoClient().db.content_cache
+        self.cache = ContentCache(self.collection, ttl_seconds=60)
+
+    def expire_all(self):
+        """Move every expiry date into the past, as if the TTL had run out."""
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        self.collection.update_many({"expires_at": {"$ne": None}}, {"$set": {"expires_at": past}})
+        self.cache.clear_local()
+
+    def test_generated_content_expires(self):
+        """Test that live generations are not served after their TTL."""
+        self.cache.get_or_compute("syllabus", "model", INPUTS, lambda: "essay")
+        self.expire_all()
+        self.assertIsNone(self.cache.get("syllabus", "model", INPUTS))
+
+    def test_persisted_content_does_not_expire(self):
+        """Test that persisted content stays without an expiry date, also when it was cached before."""
+        self.cache.get_or_compute("syllabus", "model", INPUTS, lambda: "essay")
+        value = self.cache.persist("syllabus", "model", INPUTS, lambda: self.fail("cached value regenerated"))
+        self.expire_all()
+
+        self.assertEqual(value, "essay")
+        self.assertIsNone(self.collection.find_one({})["expires_at"])
+        self.assertEqual(self.cache.get("syllabus", "model", INPUTS), "essay")
+        self.assertEqual(
+            self.cache.get_or_compute("syllabus", "model", INPUTS, lambda: self.fail("persisted value regenerated")),
+            "essay"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""Unit tests for splitting large curricula into sections and merging their roadmaps."""
+
+import io
+import os
+import sys
+import unittest
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from curriculum_sections import merge_roadmaps, plan_sections, split_sections
+
+
+def scanned_pdf(images, outline=()):
+    """A PDF whose pages only draw one image each, like a scanned handbook."""
+    writer = PdfWriter()
+    for data in images:
+        writer.add_blank_page(100, 100)
+        page = writer.pages[-1]
+        image = DecodedStreamObject()
+        image.set_data(data)
+        image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(len(data)),
+            NameObject("/Height"): NumberObject(1),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        })
+        contents = DecodedStreamObject()
+        contents.set_data(b"q 100 0 0 100 0 0 cm /Im0 Do Q")
+        page[NameObject("/Contents")] = writer._add_object(contents)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): writer._add_object(image)})
+        })
+    for title, page_number in outline:
+        writer.add_outline_item(title, page_number)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def ranges(sections):
+    return [(section["title"], section["start"], section["stop"]) for section in sections]
+
+
+def fragment(*units, course_name="Operating Systems"):
+    return {"roadMap": {"course_name": course_name, "roadmap": [
+        {"unit_number": str(number), "unit_title": title, "topics": list(topics)}
+        for number, (title, topics) in enumerate(units, 1)
+    ]}}
+
+
+class TestPlanSections(unittest.TestCase):
+    """Test cases for plan_sections."""
+
+    def test_page_ranges_without_outline(self):
+        """Test that a PDF without chapters is cut into max_pages ranges."""
+        self.assertEqual(ranges(plan_sections(100, [], 40)), [("", 0, 40), ("", 40, 80), ("", 80, 100)])
+
+    def test_short_chapters_are_packed(self):
+        """Test that consecutive chapters share a section while they fit."""
+        starts = [(0, "A"), (10, "B"), (30, "C"), (60, "D")]
+        self.assertEqual(ranges(plan_sections(70, starts, 40)), [("A / B", 0, 30), ("C / D", 30, 70)])
+
+    def test_long_chapter_is_split(self):
+        """Test that a chapter longer than max_pages is split into page ranges."""
+        starts = [(0, "A"), (5, "B")]
+        self.assertEqual(
+            ranges(plan_sections(100, starts, 40)),
+            [("A", 0, 5), ("B", 5, 45), ("B", 45, 85), ("B", 85, 100)]
+        )
+
+    def test_pages_before_first_chapter(self):
+        """Test that pages before the first outline entry are covered as well."""
+        self.assertEqual(ranges(plan_sections(10, [(3, "A")], 40)), [("A", 0, 10)])
+        self.assertEqual(ranges(plan_sections(60, [(30, "A")], 40)), [("", 0, 30), ("A", 30, 60)])
+
+
+class TestSplitSections(unittest.TestCase):
+    """Test cases for split_sections."""
+
+    def test_sections_follow_the_outline(self):
+        """Test that sections are cut at outline entries and written as standalone PDFs."""
+        pdf = scanned_pdf([bytes([page]) for page in range(6)], [("Intro", 0), ("Memory", 3)])
+        sections = split_sections(pdf, max_pages=3)
+
+        self.assertEqual(ranges(sections), [("Intro", 0, 3), ("Memory", 3, 6)])
+        self.assertEqual([len(PdfReader(io.BytesIO(section["pdf"])).pages) for section in sections], [3, 3])
+
+    def test_hash_covers_page_images(self):
+        """Test that scans with identical content streams but different images hash apart."""
+        first = split_sections(scanned_pdf([b"\x00\x10", b"\x20", b"\x30"]))
+        second = split_sections(scanned_pdf([b"\x01\x10", b"\x20", b"\x30"]))
+        again = split_sections(scanned_pdf([b"\x00\x10", b"\x20", b"\x30"]))
+
+        self.assertNotEqual(first[0]["hash"], second[0]["hash"])
+        self.assertEqual(first[0]["hash"], again[0]["hash"])
+
+    def test_hash_only_depends_on_own_pages(self):
+        """Test that changing a page in one section keeps the other sections' hashes."""
+        first = split_sections(scanned_pdf([b"\x00", b"\x01", b"\x02", b"\x03"]), max_pages=2)
+        second = split_sections(scanned_pdf([b"\x00", b"\x01", b"\x02", b"\x04"]), max_pages=2)
+
+        self.assertEqual(first[0]["hash"], second[0]["hash"])
+        self.assertNotEqual(first[1]["hash"], second[1]["hash"])
+
+
+class TestMergeRoadmaps(unittest.TestCase):
+    """Test cases for merge_roadmaps."""
+
+    def test_unit_cut_by_section_boundary_is_merged(self):
+        """Test that a unit continued in the next section becomes one unit."""
+        merged = merge_roadmaps([
+            fragment(("Unit 1: Processes", ["Threads", "Scheduling"]), ("Unit 2: Memory", ["Paging"])),
+            fragment(("Memory", ["paging", "Segmentation"]), ("Files", ["Inodes"])),
+        ])
+
+        self.assertEqual(merged["roadMap"]["roadmap"], [
+            {"topics": ["Threads", "Scheduling"], "unit_number": "1", "unit_title": "Processes"},
+            {"topics": ["Paging", "Segmentation"], "unit_number": "2", "unit_title": "Memory"},
+            {"topics": ["Inodes"], "unit_number": "3", "unit_title": "Files"},
+        ])
+
+    def test_same_title_away_from_boundary_stays_separate(self):
+        """Test that only the first unit of a section is merged into the previous one."""
+        merged = merge_roadmaps([
+            fragment(("Review", ["Quiz 1"]), ("Processes", ["Threads"])),
+            fragment(("Memory", ["Paging"]), ("Review", ["Quiz 2"])),
+        ])
+
+        self.assertEqual([unit["unit_title"] for unit in merged["roadMap"]["roadmap"]],
+                         ["Review", "Processes", "Memory", "Review"])
+
+    def test_course_name_most_sections_agree_on(self):
+        """Test that the course name is the most common one, ignoring N/A."""
+        merged = merge_roadmaps([
+            fragment(("A", ["a"]), course_name="N/A"),
+            fragment(("B", ["b"]), course_name="OS"),
+            fragment(("C", ["c"]), course_name="Operating Systems"),
+            fragment(("D", ["d"]), course_name="Operating Systems"),
+        ])
+        self.assertEqual(merged["roadMap"]["course_name"], "Operating Systems")
+
+        unnamed = merge_roadmaps([fragment(("A", ["a"]), course_name="N/A")])
+        self.assertEqual(unnamed["roadMap"]["course_name"], "N/A")
+
+
+if __name__ == '__main__':
+    unittest.main()
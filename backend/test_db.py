@@ -0,0 +1,153 @@
+"""Unit tests for the shared MongoDB client and its pool metrics."""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import mongomock
+from pymongo import monitoring
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db
+
+# Nothing listens here; MongoClient connects lazily and commands only go to mongomock
+URI = "mongodb://localhost:1/"
+ADDRESS = ("localhost", 1)
+
+
+class TestGetClient(unittest.TestCase):
+    """Test cases for the process-wide MongoClient."""
+
+    def tearDown(self):
+        db.close_clients()
+        db.pool_metrics.reset()
+
+    def test_returns_one_shared_client(self):
+        """Test that every call for a connection string gets the same client."""
+        client = db.get_client(URI)
+        self.assertIs(db.get_client(URI), client)
+        self.assertIsNot(db.get_client("mongodb://localhost:2/"), client)
+        self.assertIn(db.pool_metrics, client.options.event_listeners)
+
+    def test_rebuilt_after_pid_change(self):
+        """Test that a forked child does not reuse the parent's client."""
+        parent_client = db.get_client(URI)
+        db.pool_metrics.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+        original_pid = db._clients_pid
+        try:
+            # What the child sees when register_at_fork did not run
+            db._clients_pid = original_pid + 1
+            child_client = db.get_client(URI)
+        finally:
+            parent_client.close()
+
+        self.assertIsNot(child_client, parent_client)
+        self.assertEqual(db._clients_pid, os.getpid())
+        self.assertIs(db.get_client(URI), child_client)
+        self.assertEqual(db.pool_metrics.snapshot()["connections_open"], 0)
+
+
+class TestPoolMetrics(unittest.TestCase):
+    """Test cases for PoolMetrics."""
+
+    def setUp(self):
+        self.metrics = db.PoolMetrics()
+
+    def test_checkout_moves_counters(self):
+        """Test the counters of a connection checked out and back in."""
+        self.metrics.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+        self.metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+        self.metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1, 0.02))
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["connections_open"], 1)
+        self.assertEqual(snapshot["checked_out"], 1)
+        self.assertEqual(snapshot["checkouts"], 1)
+        self.assertAlmostEqual(snapshot["avg_wait_ms"], 20.0)
+        self.assertAlmostEqual(snapshot["max_wait_ms"], 20.0)
+
+        self.metrics.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+        self.assertEqual(self.metrics.snapshot()["checked_out"], 0)
+        self.assertEqual(self.metrics.snapshot()["checkouts"], 1)
+
+    def test_failed_checkout(self):
+        """Test that a failed checkout is counted without holding a connection."""
+        self.metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+        self.metrics.connection_check_out_failed(
+            monitoring.ConnectionCheckOutFailedEvent(ADDRESS, monitoring.ConnectionCheckOutFailedReason.TIMEOUT, 0.5)
+        )
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["checkout_failures"], 1)
+        self.assertEqual(snapshot["checked_out"], 0)
+        self.assertEqual(snapshot["checkouts"], 0)
+
+
+
+class TestMongoDBClient(unittest.TestCase):
+    """Test cases for MongoDBClient on the shared client, backed by mongomock."""
+
+    def setUp(self):
+        patcher = patch.object(db, "MongoClient", mongomock.MongoClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(db.close_clients)
+        self.store = db.MongoDBClient(URI, "education", "content")
+
+    def roadmap(self, name, course_name):
+        return {
+            "name": name,
+            "objective": f"Objectives of {name}",
+            "curriculum": {"roadMap": {"course_name": course_name, "roadmap": []}},
+        }
+
+    def test_uses_shared_client(self):
+        """Test that every MongoDBClient for a connection string shares one client."""
+        other = db.MongoDBClient(URI, "education", "jobs")
+        self.assertIs(other.client, self.store.client)
+        self.assertIs(self.store.client, db.get_client(URI))
+
+    def test_inserts_return_ids_without_reading_back(self):
+        """Test that created documents come back with string ids and are stored."""
+        created = self.store.create_document(self.roadmap("alice", "Operating Systems"))
+        batch = self.store.create_documents([self.roadmap("bob", "Networks"), self.roadmap("carol", "Networks")])
+        ids = self.store.insert_documents([self.roadmap("dave", "Compilers")], write_concern={"w": 1})
+
+        self.assertIsInstance(created["_id"], str)
+        self.assertEqual([document["name"] for document in batch], ["bob", "carol"])
+        self.assertTrue(all(isinstance(document["_id"], str) for document in batch))
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(self.store.read_document(created["_id"])["name"], "alice")
+        self.assertEqual(self.store.collection.count_documents({}), 4)
+
+    def test_find_by_name_projects_fields(self):
+        """Test that find_by_name returns only the requested fields of the named document."""
+        self.store.create_documents([self.roadmap("alice", "Operating Systems"), self.roadmap("bob", "Networks")])
+
+        document = self.store.find_by_name("bob", ["curriculum.roadMap"])
+
+        self.assertEqual(document, {"curriculum": {"roadMap": {"course_name": "Networks", "roadmap": []}}})
+        self.assertIsNone(self.store.find_by_name("nobody", ["objective"]))
+        self.assertEqual(
+            [document["name"] for document in self.store.read_documents_by_course("Networks", {"name": 1})],
+            ["bob"]
+        )
+
+    def test_ensure_indexes(self):
+        """Test that the lookup indexes are created and creating them again is harmless."""
+        database = db.get_client(URI)["education"]
+        db.ensure_indexes(database)
+        db.ensure_indexes(database)
+
+        content_keys = [index["key"] for index in database["content"].index_information().values()]
+        self.assertIn([("name", 1)], content_keys)
+        self.assertIn([("curriculum.roadMap.course_name", 1)], content_keys)
+        job_keys = [index["key"] for index in database["jobs"].index_information().values()]
+        self.assertIn([("kind", 1), ("status", 1), ("created_at", 1)], job_keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""Unit tests for the Gemini quota limiter and model registry."""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+from google.api_core import exceptions as api_exceptions
+
+# Add the backend and benchmarks directories to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from fake_genai import FakeGeminiBackend
+from gemini import BULK, INTERACTIVE, ModelRegistry, QuotaExceeded, QuotaLimiter, cancel_stream, cancel_stream_async
+
+
+class TestQuotaLimiter(unittest.TestCase):
+    """Test cases for QuotaLimiter."""
+
+    def test_interactive_goes_ahead_of_bulk(self):
+        """Test that a queued interactive call is granted before an earlier bulk call."""
+        limiter = QuotaLimiter(default_rpm=1, period=0.2)
+        limiter.acquire("model")
+        granted = []
+
+        def acquire(priority):
+            limiter.acquire("model", priority=priority)
+            granted.append(priority)
+
+        bulk = threading.Thread(target=acquire, args=(BULK,))
+        interactive = threading.Thread(target=acquire, args=(INTERACTIVE,))
+        bulk.start()
+        time.sleep(0.05)
+        interactive.start()
+        bulk.join(5)
+        interactive.join(5)
+
+        self.assertEqual(granted, [INTERACTIVE, BULK])
+
+    def test_deadline_raises_quota_exceeded(self):
+        """Test that a caller gives up when its deadline passes."""
+        limiter = QuotaLimiter(default_rpm=1, period=60)
+        limiter.acquire("model")
+
+        started = time.monotonic()
+        with self.assertRaises(QuotaExceeded):
+            limiter.acquire("model", deadline=time.monotonic() + 0.1)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(limiter.stats()["expired"], 1)
+        self.assertEqual(limiter.stats()["waiting"], {"model": 0})
+
+    def test_shares_split_the_quota(self):
+        """Test that each share enforces its part of the requests per period."""
+        limiter = QuotaLimiter(default_rpm=4, period=60, shares=2)
+        limiter.acquire("model")
+        limiter.acquire("model")
+        with self.assertRaises(QuotaExceeded):
+            limiter.acquire("model", deadline=time.monotonic() + 0.05)
+
+        limiter.set_shares(1)
+        for _ in range(4):
+            limiter.acquire("model", deadline=time.monotonic() + 0.05)
+
+    def test_token_budget_per_model(self):
+        """Test that a per-model token quota blocks a call that does not fit."""
+        limiter = QuotaLimiter(quotas={"small": (100, 1000)}, period=60)
+        limiter.acquire("small", tokens=800)
+        with self.assertRaises(QuotaExceeded):
+            limiter.acquire("small", tokens=400, deadline=time.monotonic() + 0.05)
+        # Other models keep the default budget
+        limiter.acquire("large", tokens=400, deadline=time.monotonic() + 0.05)
+
+    def test_parse_quotas(self):
+        """Test parsing of GEMINI_MODEL_QUOTAS."""
+        self.assertEqual(
+            QuotaLimiter.parse_quotas("a=10:1000, b=2.5:50"),
+            {"a": (10.0, 1000.0), "b": (2.5, 50.0)}
+        )
+
+
+class TestModelRegistryCall(unittest.TestCase):
+    """Test cases for ModelRegistry.call retries against the fake Gemini backend."""
+
+    def test_retries_throttled_call(self):
+        """Test that a 429 answer is retried until the server quota allows the call."""
+        backend = FakeGeminiBackend(requests_per_window=1, window=0.2, latency=0)
+        model = backend.model()
+        registry = ModelRegistry(retry_base_delay=0.1, retry_max_delay=0.5)
+
+        registry.call("fake-model", lambda: model.generate_content("first"))
+        response = registry.call("fake-model", lambda: model.generate_content("second"))
+
+        self.assertIn("second", response.text)
+        self.assertGreaterEqual(backend.counts["throttled"], 1)
+        self.assertEqual(backend.counts["served"], 2)
+
+    def test_retries_server_errors_up_to_max_retries(self):
+        """Test that 503 answers are retried max_retries times before giving up."""
+        backend = FakeGeminiBackend(requests_per_window=100, latency=0, unavailable_rate=1.0)
+        model = backend.model()
+        registry = ModelRegistry(max_retries=2, retry_base_delay=0.01)
+
+        with self.assertRaises(api_exceptions.ServiceUnavailable):
+            registry.call("fake-model", lambda: model.generate_content("prompt"))
+
+        self.assertEqual(backend.counts["unavailable"], 3)
+
+    def test_does_not_retry_other_errors(self):
+        """Test that client errors are raised on the first attempt."""
+        registry = ModelRegistry(retry_base_delay=0.01)
+        calls = []
+
+        def invalid():
+            calls.append(1)
+            raise api_exceptions.InvalidArgument("400 Request contains an invalid argument.")
+
+        with self.assertRaises(api_exceptions.InvalidArgument):
+            registry.call("fake-model", invalid)
+        with self.assertRaises(ValueError):
+            registry.call("fake-model", lambda: calls.append(1) or int("not a number"))
+
+        self.assertEqual(len(calls), 2)
+
+    def test_waits_for_limiter_quota(self):
+        """Test that calls go through the shared limiter and fail at its deadline."""
+        registry = ModelRegistry(limiter=QuotaLimiter(default_rpm=1, period=60))
+
+        self.assertEqual(registry.call("fake-model", lambda: "ok"), "ok")
+        with self.assertRaises(QuotaExceeded):
+            registry.call("fake-model", lambda: "ok", timeout=0.05)
+
+
+
+class _Stream:
+    """Stand-in for a stream=True response holding its upstream stream like the SDK does."""
+
+    def __init__(self, iterator):
+        self._iterator = iterator
+
+
+class TestCancelStream(unittest.TestCase):
+    """Test cases for cancelling relayed Gemini streams."""
+
+    def test_cancels_grpc_stream(self):
+        """Test that a sync stream's call is cancelled."""
+        cancelled = []
+
+        class Call:
+            def cancel(self):
+                cancelled.append(True)
+
+        cancel_stream(_Stream(Call()))
+        self.assertEqual(cancelled, [True])
+
+    def test_closes_async_stream(self):
+        """Test that an async stream's generator is closed."""
+        closed = []
+
+        async def chunks():
+            try:
+                while True:
+                    yield "chunk"
+            finally:
+                closed.append(True)
+
+        async def relay():
+            iterator = chunks()
+            await iterator.__anext__()
+            await cancel_stream_async(_Stream(iterator))
+
+        asyncio.run(relay())
+        self.assertEqual(closed, [True])
+
+    def test_logs_when_stream_cannot_be_cancelled(self):
+        """Test that a response without a known stream is left alone with a debug log."""
+        with self.assertLogs("gemini", level="DEBUG"):
+            cancel_stream(_Stream(None))
+        with self.assertLogs("gemini", level="DEBUG"):
+            asyncio.run(cancel_stream_async(_Stream(None)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""Unit tests for the incremental roadmap JSON parser."""
+
+import json
+import os
+import sys
+import unittest
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from roadmap_json import RoadmapFormatError, RoadmapStream, generate_roadmap
+
+
+def roadmap_text(units=3, first=1):
+    return json.dumps({"roadMap": {
+        "course_name": "Operating Systems",
+        "roadmap": [
+            {"unit_number": str(u), "unit_title": f"Unit {u}", "topics": [f"Topic {u}.1", f"Topic {u}.2"]}
+            for u in range(first, first + units)
+        ],
+    }}, indent=2)
+
+
+def parse(text, truncated=False, chunk_size=7):
+    """Feed text in small chunks, so tokens are split across feed() calls."""
+    stream = RoadmapStream()
+    for start in range(0, len(text), chunk_size):
+        stream.feed(text[start:start + chunk_size])
+    return stream.finish(truncated=truncated)
+
+
+def unit_numbers(stream):
+    return [unit["unit_number"] for unit in stream.curriculum["roadMap"]["roadmap"]]
+
+
+class TestRoadmapStream(unittest.TestCase):
+    """Test cases for RoadmapStream."""
+
+    def test_clean_reply(self):
+        """Test that a well-formed reply parses without repairs."""
+        stream = parse(roadmap_text())
+        self.assertEqual(stream.outcome, "clean")
+        self.assertTrue(stream.complete)
+        self.assertEqual(stream.curriculum, json.loads(roadmap_text()))
+        self.assertEqual(stream.units, 3)
+
+    def test_code_fence_and_prose(self):
+        """Test that code fences and text around the object are dropped."""
+        stream = parse("Here is the roadmap:\n```json\n" + roadmap_text() + "\n```\nGood luck!")
+        self.assertEqual(stream.outcome, "repaired")
+        self.assertTrue(stream.complete)
+        self.assertEqual(stream.curriculum, json.loads(roadmap_text()))
+
+    def test_trailing_commas(self):
+        """Test that commas before closing brackets are dropped."""
+        text = roadmap_text().replace('"\n      ]', '",\n      ]').replace("}\n    ]", "},\n    ]")
+        self.assertIn(",\n    ]", text)
+        stream = parse(text)
+        self.assertEqual(stream.outcome, "repaired")
+        self.assertEqual(stream.curriculum, json.loads(roadmap_text()))
+
+    def test_unclosed_arrays(self):
+        """Test that a finished reply missing its closing brackets is closed."""
+        text = roadmap_text().rstrip()
+        text = text[:text.rindex("]")]
+        stream = parse(text)
+        self.assertEqual(stream.outcome, "repaired")
+        self.assertTrue(stream.complete)
+        self.assertEqual(unit_numbers(stream), ["1", "2", "3"])
+
+    def test_truncated_inside_string(self):
+        """Test that a reply cut off inside a topic keeps the units before it."""
+        text = roadmap_text()
+        text = text[:text.index("Topic 3.2") + 4]
+        stream = parse(text, truncated=True)
+        self.assertEqual(stream.outcome, "truncated")
+        self.assertFalse(stream.complete)
+        self.assertEqual(unit_numbers(stream), ["1", "2"])
+        self.assertGreater(stream.discarded_chars, 0)
+
+    def test_truncated_inside_unit(self):
+        """Test that a unit cut off between tokens at MAX_TOKENS is generated again."""
+        text = roadmap_text()
+        text = text[:text.index('"Topic 3.2"')]
+        stream = parse(text, truncated=True)
+        self.assertEqual(stream.outcome, "truncated")
+        self.assertFalse(stream.complete)
+        self.assertEqual(unit_numbers(stream), ["1", "2"])
+
+    def test_stop_inside_unit_is_closed(self):
+        """Test that the same text with finish reason STOP is a whole, repaired reply."""
+        text = roadmap_text()
+        text = text[:text.index('"Topic 3.2"')]
+        stream = parse(text, truncated=False)
+        self.assertEqual(stream.outcome, "repaired")
+        self.assertTrue(stream.complete)
+        self.assertEqual(unit_numbers(stream), ["1", "2", "3"])
+        self.assertEqual(stream.curriculum["roadMap"]["roadmap"][2]["topics"], ["Topic 3.1"])
+
+    def test_max_tokens_after_last_bracket_is_whole(self):
+        """Test that a reply hitting the limit right after its last bracket is complete."""
+        stream = parse(roadmap_text(), truncated=True)
+        self.assertEqual(stream.outcome, "clean")
+        self.assertTrue(stream.complete)
+
+    def test_stop_inside_string_keeps_complete_units(self):
+        """Test that a reply ending inside a string cannot be closed and is continued."""
+        text = roadmap_text()
+        text = text[:text.index("Topic 3.2") + 4]
+        stream = parse(text, truncated=False)
+        self.assertEqual(stream.outcome, "truncated")
+        self.assertFalse(stream.complete)
+        self.assertEqual(unit_numbers(stream), ["1", "2"])
+
+    def test_invalid_reply(self):
+        """Test that a reply without a roadmap object is invalid."""
+        stream = parse("I am unable to read this curriculum.")
+        self.assertEqual(stream.outcome, "invalid")
+        self.assertIsNone(stream.curriculum)
+        self.assertFalse(stream.complete)
+
+
+class TestGenerateRoadmap(unittest.TestCase):
+    """Test cases for generate_roadmap continuations."""
+
+    def test_continuation_merges_units_without_duplicates(self):
+        """Test that a unit restated by a continuation is kept once."""
+        first = roadmap_text(units=3)
+        first = first[:first.index("Topic 3.2")]
+        replies = [parse(first, truncated=True), parse(roadmap_text(units=3, first=2))]
+        messages = []
+
+        def send_message(message):
+            messages.append(message)
+            return replies.pop(0)
+
+        curriculum, stats = generate_roadmap(send_message, "Generate the roadmap")
+
+        self.assertEqual([unit["unit_number"] for unit in curriculum["roadMap"]["roadmap"]], ["1", "2", "3", "4"])
+        self.assertEqual(curriculum["roadMap"]["course_name"], "Operating Systems")
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["continuations"], 1)
+        self.assertEqual(stats["outcomes"], ["truncated", "clean"])
+        self.assertIn("after unit 2", messages[1])
+
+    def test_continuation_without_unit_numbers(self):
+        """Test that continuation units are kept when numbers are missing or restart at 1."""
+        first = json.dumps({"roadMap": {"course_name": "Operating Systems", "roadmap": [
+            {"unit_title": "Intro", "topics": ["History"]},
+            {"unit_title": "Procs", "topics": ["Threads"]},
+            {"unit_title": "Mem", "topics": ["Pag"]},
+        ]}})
+        first = first[:first.index("Pag")]
+        second = json.dumps({"roadMap": {"course_name": "Operating Systems", "roadmap": [
+            {"unit_title": "Procs", "topics": ["Threads"]},
+            {"unit_title": "Memory", "topics": ["Paging"]},
+            {"unit_number": "1", "unit_title": "Files", "topics": ["Inodes"]},
+        ]}})
+        replies = [parse(first, truncated=True), parse(second)]
+
+        curriculum, stats = generate_roadmap(lambda message: replies.pop(0), "Generate the roadmap")
+
+        units = curriculum["roadMap"]["roadmap"]
+        self.assertEqual([unit["unit_title"] for unit in units], ["Intro", "Procs", "Memory", "Files"])
+        self.assertEqual([unit["unit_number"] for unit in units], ["1", "2", "3", "4"])
+        self.assertEqual(stats["outcomes"], ["truncated", "clean"])
+
+    def test_gives_up_after_max_continuations(self):
+        """Test that only invalid replies raise RoadmapFormatError."""
+        calls = []
+
+        def send_message(message):
+            calls.append(message)
+            return parse("Sorry, I cannot help with that.")
+
+        with self.assertRaises(RoadmapFormatError):
+            generate_roadmap(send_message, "Generate the roadmap", max_continuations=2)
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
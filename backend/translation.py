@@ -0,0 +1,124 @@
+import re
+
+# Segments are whole paragraphs up to this size; longer paragraphs are packed by sentence
+MAX_SEGMENT_CHARS = 1500
+
+_PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+_SENTENCE_END = re.compile(r"(?<=[.!?:;])(\s+)")
+_FENCE = "```"
+
+
+def translation_prompt(text: str, language: str) -> str:
+    return f"Translate the following text to {language}: {text}. Provide only the translated text without any additional explanations."
+
+
+def _pack_sentences(paragraph: str, max_chars: int) -> list:
+    """Split a long paragraph at sentence ends into (kind, text) parts of at most max_chars."""
+    pieces = _SENTENCE_END.split(paragraph)
+    parts = []
+    current = ""
+    # pieces alternates sentence, whitespace, sentence, ...
+    for i in range(0, len(pieces), 2):
+        sentence = pieces[i]
+        space = pieces[i + 1] if i + 1 < len(pieces) else ""
+        if current and len(current) + len(sentence) > max_chars:
+            stripped = current.rstrip()
+            parts.append(("text", stripped))
+            parts.append(("space", current[len(stripped):]))
+            current = ""
+        current += sentence + space
+    if current:
+        stripped = current.rstrip()
+        parts.append(("text", stripped))
+        if len(stripped) < len(current):
+            parts.append(("space", current[len(stripped):]))
+    return parts
+
+
+def split_segments(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> list:
+    """
+    Split text into ("text" | "space" | "code", string) parts whose concatenation is the
+    original text. "text" parts are translated one by one; blank-line paragraph breaks and
+    fenced code blocks are kept as they are.
+    """
+    parts = []
+    in_code = False
+    for chunk in _PARAGRAPH_BREAK.split(text):
+        if not chunk:
+            continue
+        if _PARAGRAPH_BREAK.fullmatch(chunk):
+            parts.append(("code" if in_code else "space", chunk))
+            continue
+        if in_code or chunk.lstrip().startswith(_FENCE):
+            parts.append(("code", chunk))
+            # An odd number of fences opens (or closes) a block spanning paragraphs
+            if chunk.count(_FENCE) % 2:
+                in_code = not in_code
+            continue
+
+        body = chunk.strip()
+        if not body:
+            parts.append(("space", chunk))
+            continue
+        start = chunk.index(body)
+        if start:
+            parts.append(("space", chunk[:start]))
+        if len(body) <= max_chars:
+            parts.append(("text", body))
+        else:
+            parts.extend(_pack_sentences(body, max_chars))
+        if start + len(body) < len(chunk):
+            parts.append(("space", chunk[start + len(body):]))
+    return parts
+
+
+def join_segments(parts, translations) -> str:
+    """Reassemble split_segments() output, replacing "text" parts by their translations in order."""
+    translations = iter(translations)
+    return "".join(next(translations) if kind == "text" else value for kind, value in parts)
+
+
+class SegmentTranslator:
+    """
+    Translates long documents segment by segment. Segments are translated concurrently and
+    cached per (segment, language), so a document that differs from one already translated
+    only pays for its new segments, and boilerplate shared between essays is translated once.
+    """
+
+    def __init__(self, cache, translate_segment, executor, model_name: str,
+                 max_segment_chars: int = MAX_SEGMENT_CHARS):
+        """
+        :param cache: ContentCache for the translated segments.
+        :param translate_segment: Callable (text, language) -> translated text.
+        :param executor: Executor the segments of a document are translated on.
+        :param model_name: Model recorded in the cache key.
+        """
+        self.cache = cache
+        self.translate_segment = translate_segment
+        self.executor = executor
+        self.model_name = model_name
+        self.max_segment_chars = max_segment_chars
+
+    def translate_one(self, text: str, language: str) -> str:
+        # Same namespace and inputs the whole-text translation cache used, so short texts
+        # translated before keep hitting their entries
+        return self.cache.get_or_compute(
+            "translate",
+            self.model_name,
+            {"text": text, "language": language.strip().lower()},
+            lambda: self.translate_segment(text, language),
+        )
+
+    def translate(self, text: str, language: str) -> str:
+        parts = split_segments(text, self.max_segment_chars)
+        segments = [value for kind, value in parts if kind == "text"]
+        if len(segments) == 1:
+            return join_segments(parts, [self.translate_one(segments[0], language)])
+
+        futures = [self.executor.submit(self.translate_one, segment, language) for segment in segments]
+        try:
+            return join_segments(parts, [future.result() for future in futures])
+        finally:
+            # One failed segment fails the document; do not spend quota on the rest
+            for future in futures:
+                future.cancel()
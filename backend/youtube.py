@@ -0,0 +1,170 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import record_upstream_error, span, upstream_errors
+
+# Cache namespace and the "model" slot of the cache key for search results
+CACHE_NAMESPACE = "youtube"
+CACHE_SOURCE = "search-v3"
+
+
+class VideoLookupError(Exception):
+    """YouTube Search could not be reached or rejected the request (e.g. quota exhausted)."""
+
+
+def topic_key(topic: str) -> dict:
+    """Cache inputs for a topic; case and whitespace do not change the search result."""
+    return {"topic": " ".join(topic.lower().split())}
+
+
+def search_params(topic: str, api_key: str) -> dict:
+    return {
+        'part': 'snippet',
+        'q': topic,
+        'key': api_key,
+        'maxResults': 1,
+        'type': 'video',
+        # Only the video ID is used; a partial response is smaller to send and parse
+        'fields': 'items(id/videoId)'
+    }
+
+
+def parse_search_response(data: dict) -> dict:
+    """Cacheable result of a search: the video ID, or None when nothing was found."""
+    items = data.get('items') or []
+    video_id = items[0].get('id', {}).get('videoId') if items else None
+    return {"video_id": video_id}
+
+
+def lookup_error(topic: str, error: Exception) -> VideoLookupError:
+    record_upstream_error("youtube", error)
+    # Transport errors quote the request URL, which carries the API key; keep only the type
+    return VideoLookupError(f"YouTube search failed for '{topic}': {type(error).__name__}")
+
+
+def checked_json(topic: str, status_code: int, read_json) -> dict:
+    if status_code != 200:
+        upstream_errors.inc(service="youtube", error=f"HTTP {status_code}")
+        raise VideoLookupError(f"YouTube search failed for '{topic}': HTTP {status_code}")
+    try:
+        return read_json()
+    except ValueError as e:
+        raise lookup_error(topic, e) from e
+
+
+def video_url(video_id: str) -> str:
+    return f'https://www.youtube.com/watch?v={video_id}'
+
+
+class VideoLookup:
+    """
+    Topic-to-video search backed by a ContentCache, so each topic costs one YouTube Search
+    call per cache TTL across all workers. Concurrent lookups of the same topic share one
+    request, and all requests reuse the pooled connections of one session.
+    """
+
+    def __init__(self, cache, search_url: str, api_key: str, timeout: float = 10.0, max_connections: int = 10,
+                 batch_concurrency: int = 8):
+        """
+        :param cache: ContentCache holding search results.
+        :param timeout: Seconds to wait for YouTube before failing the lookup.
+        :param max_connections: Keep-alive connections held open to the search host.
+        :param batch_concurrency: Searches run in parallel by find_many().
+        """
+        self.cache = cache
+        self.search_url = search_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.batch_concurrency = batch_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def search(self, topic: str) -> dict:
+        """Ask YouTube Search directly, bypassing the cache."""
+        try:
+            with span("youtube_lookup"):
+                response = self.session.get(self.search_url, params=search_params(topic, self.api_key),
+                                            timeout=self.timeout)
+                return parse_search_response(checked_json(topic, response.status_code, response.json))
+        except requests.RequestException as e:
+            raise lookup_error(topic, e) from e
+
+    def find(self, topic: str):
+        """
+        :return: The video ID for the topic, or None if YouTube has no video for it.
+        """
+        result = self.cache.get_or_compute(CACHE_NAMESPACE, CACHE_SOURCE, topic_key(topic),
+                                           lambda: self.search(topic))
+        return result["video_id"]
+
+    def find_many(self, topics) -> dict:
+        """
+        Look up several topics at once, e.g. every topic of a roadmap. Cached topics are
+        answered without a search; failed searches map to their VideoLookupError.
+
+        :return: Dict of topic to video ID, None or VideoLookupError.
+        """
+        topics = list(dict.fromkeys(topics))
+        if not topics:
+            return {}
+
+        def lookup(topic):
+            try:
+                return self.find(topic)
+            except VideoLookupError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.batch_concurrency, len(topics)),
+                                thread_name_prefix="video-lookup") as pool:
+            return dict(zip(topics, pool.map(lookup, topics)))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncVideoLookup:
+    """VideoLookup for the asyncio serving mode, on an httpx.AsyncClient and AsyncContentCache."""
+
+    def __init__(self, cache, client, search_url: str, api_key: str, batch_concurrency: int = 8):
+        """
+        :param cache: AsyncContentCache holding search results.
+        :param client: Zero-argument callable returning the shared httpx.AsyncClient.
+        """
+        self.cache = cache
+        self.client = client
+        self.search_url = search_url
+        self.api_key = api_key
+        self.batch_concurrency = batch_concurrency
+
+    async def search(self, topic: str) -> dict:
+        import httpx
+
+        try:
+            with span("youtube_lookup"):
+                response = await self.client().get(self.search_url, params=search_params(topic, self.api_key))
+                return parse_search_response(checked_json(topic, response.status_code, response.json))
+        except httpx.HTTPError as e:
+            raise lookup_error(topic, e) from e
+
+    async def find(self, topic: str):
+        result = await self.cache.get_or_compute(CACHE_NAMESPACE, CACHE_SOURCE, topic_key(topic),
+                                                 lambda: self.search(topic))
+        return result["video_id"]
+
+    async def find_many(self, topics) -> dict:
+        topics = list(dict.fromkeys(topics))
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def lookup(topic):
+            async with semaphore:
+                try:
+                    return await self.find(topic)
+                except VideoLookupError as e:
+                    return e
+
+        return dict(zip(topics, await asyncio.gather(*(lookup(topic) for topic in topics))))
@@ -29,6 +29,10 @@ const Content = () => {
   const apiKey = import.meta.env.VITE_YOUTUBE_API_KEY || '';
 
   useEffect(() => {
+    // Cancels the requests of a topic the user has navigated away from, including the
+    // content stream, which would otherwise keep Gemini generating for nobody
+    const controller = new AbortController();
+
     const fetchContentData = async () => {
       if (!selectedTopic || !name) {
         setError("Missing required data: title or name");
@@ -41,42 +45,86 @@ const Content = () => {
       try {
         const objResponse = await axios.get(`http://localhost:5000/getObj`, {
           params: { name },
+          signal: controller.signal,
         });
 
         const fetchedObjective = objResponse.data.objective;
         localStorage.setItem("objective", fetchedObjective);
         setObjective(fetchedObjective);
 
-        const contentResponse = await axios.post(
-          "http://localhost:5000/generate-content",
-          {
-            selectedTopic,
-            objective: fetchedObjective,
-          }
-        );
-
-        setContent(contentResponse.data.content);
+        await streamContent(selectedTopic, fetchedObjective, controller.signal);
 
         // Automatically trigger YouTube search based on the title (selectedTopic)
         setQuery(selectedTopic);
-        await fetchVideo(selectedTopic);
+        await fetchVideo(selectedTopic, controller.signal);
       } catch (error) {
+        if (controller.signal.aborted) return;
         console.error("Error fetching data:", error);
         setError(error.response?.data?.error || "Failed to fetch content");
       } finally {
-        setIsLoading(false);
+        if (!controller.signal.aborted) setIsLoading(false);
       }
     };
 
     fetchContentData();
+    return () => controller.abort();
   }, [selectedTopic, name]);
 
-  const fetchVideo = async (topic) => {
+  // Render the essay as it is generated instead of waiting for the whole response
+  const streamContent = async (topic, fetchedObjective, signal) => {
+    const response = await fetch(
+      "http://localhost:5000/generate-content/stream",
+      {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          selectedTopic: topic,
+          objective: fetchedObjective,
+        }),
+        signal,
+      }
+    );
+    if (!response.ok) {
+      throw new Error(`Content request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let text = "";
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const events = buffer.split("\n\n");
+      buffer = events.pop();
+      for (const event of events) {
+        const lines = event.split("\n");
+        const type = lines.find((line) => line.startsWith("event: "))?.slice(7);
+        const data = JSON.parse(
+          lines.find((line) => line.startsWith("data: "))?.slice(6) || "{}"
+        );
+        if (type === "error") {
+          throw new Error(data.error);
+        }
+        if (data.text) {
+          text += data.text;
+          setContent(text);
+          setIsLoading(false);
+        }
+      }
+    }
+  };
+
+  const fetchVideo = async (topic, signal) => {
     try {
       const searchResponse = await fetch(
         `https://www.googleapis.com/youtube/v3/search?part=snippet&q=${encodeURIComponent(
           topic
-        )}&type=video&maxResults=1&key=${apiKey}`
+        )}&type=video&maxResults=1&key=${apiKey}`,
+        { signal }
       );
   
       if (!searchResponse.ok) {
@@ -94,7 +142,8 @@ const Content = () => {
       const videoId = searchData.items[0].id.videoId;
   
       const videoResponse = await fetch(
-        `https://www.googleapis.com/youtube/v3/videos?part=snippet,statistics&id=${videoId}&key=${apiKey}`
+        `https://www.googleapis.com/youtube/v3/videos?part=snippet,statistics&id=${videoId}&key=${apiKey}`,
+        { signal }
       );
   
       if (!videoResponse.ok) {
@@ -107,6 +156,7 @@ const Content = () => {
         setVideo(videoData.items[0]);
       }
     } catch (error) {
+      if (signal?.aborted) return;
       console.error("Error fetching video:", error);
       setError("Failed to fetch YouTube video. Please check your API key and quota.");
     }
@@ -1,6 +1,9 @@
 import React, { useState } from "react";
 import "./Form.css";
 import { useNavigate } from "react-router-dom";
+
+const JOB_TIMEOUT_MS = 20 * 60 * 1000;
+
 function UploadForm() {
   const [name, setName] = useState("");
   const [careerInterest, setCareerInterest] = useState("");
@@ -12,6 +15,26 @@ function UploadForm() {
 
   const navigate = useNavigate();
 
+  const waitForJob = async (jobId) => {
+    // Roadmap generation runs in the background; poll until it finishes or the deadline passes
+    const deadline = Date.now() + JOB_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+      const response = await fetch(`http://localhost:5000/jobs/${jobId}`);
+      const job = await response.json();
+      if (!response.ok) {
+        return { status: "failed", error: job };
+      }
+      if (job.status === "succeeded" || job.status === "failed") {
+        return job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+    return {
+      status: "failed",
+      error: { error: "Roadmap generation is taking too long. Please try again later." },
+    };
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
 
@@ -35,11 +58,17 @@ function UploadForm() {
       });
 
       const data = await response.json();
-      if (response.ok) {
-        setMessage("Roadmap is being generated...");
+      if (!response.ok) {
+        setMessage(data.error || "Something went wrong.");
+        return;
+      }
+
+      setMessage("Roadmap is being generated...");
+      const job = await waitForJob(data.job_id);
+      if (job.status === "succeeded") {
         navigate("/road-map");
       } else {
-        setMessage(data.error || "Something went wrong.");
+        setMessage(job.error?.error || "Something went wrong.");
       }
     } catch (error) {
       setMessage("Error submitting form.");
@@ -11,6 +11,28 @@ import {
 import "@xyflow/react/dist/style.css";
 import { useNavigate } from "react-router-dom";
 
+const nodeStyles = {
+  course: {
+    background: "#6ede87",
+    padding: 10,
+    borderRadius: 5,
+    width: 200,
+  },
+  unit: {
+    background: "#ff0072",
+    padding: 10,
+    borderRadius: 5,
+    width: 250,
+  },
+  topic: {
+    background: "#4895ef",
+    padding: 8,
+    borderRadius: 4,
+    fontSize: "12px",
+    width: 180,
+  },
+};
+
 export default function Roadmap() {
   const [courseData, setCourseData] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -19,102 +41,25 @@ export default function Roadmap() {
   const [edges, setEdges, onEdgesChange] = useEdgesState([]);
   const [selectedVideo, setSelectedVideo] = useState(null);
 
-  const generateNodesAndEdges = useCallback((courseData) => {
-    if (!courseData) return { nodes: [], edges: [] };
-
-    const nodes = [];
-    const edges = [];
-
-    // Enhanced spacing configuration
-    const unitSpacing = 100;
-    const topicSpacing = 300;
-    const topicsPerRow = 6;
-    const baseX = 800;
-    const baseY = 50;
-    const topicVerticalSpacing = 100;
-
-    // Calculate the maximum number of topics in any unit
-    const maxTopics = Math.max(
-      ...courseData.roadmap.map((unit) => unit.topics.length)
+  // The backend precompiles the layout (see roadmap_graph.py); only styles are added here
+  const toFlowGraph = useCallback((graph) => {
+    const nodes = graph.nodes.map((node) => ({
+      id: node.id,
+      position: { x: node.x, y: node.y },
+      data: { label: node.label },
+      style: nodeStyles[node.kind],
+    }));
+
+    const edges = graph.edges.map((edge) =>
+      edge.source === "course"
+        ? { ...edge, type: "smoothstep" }
+        : {
+            ...edge,
+            type: "smoothstep",
+            style: { stroke: "#4895ef" },
+            animated: true,
+          }
     );
-    const maxRows = Math.ceil(maxTopics / topicsPerRow);
-
-    // Add course node
-    nodes.push({
-      id: "course",
-      position: { x: baseX, y: baseY },
-      data: { label: courseData.course_name },
-      style: {
-        background: "#6ede87",
-        padding: 10,
-        borderRadius: 5,
-        width: 200,
-      },
-    });
-
-    // Add units and topics
-    courseData.roadmap.forEach((unit, unitIndex) => {
-      const unitId = `unit-${unit.unit_number}`;
-      const unitY =
-        baseY +
-        (unitIndex + 1) * (unitSpacing + maxRows * topicVerticalSpacing);
-
-      // Add unit node
-      nodes.push({
-        id: unitId,
-        position: { x: baseX, y: unitY },
-        data: { label: `Unit ${unit.unit_number}: ${unit.unit_title}` },
-        style: {
-          background: "#ff0072",
-          padding: 10,
-          borderRadius: 5,
-          width: 250,
-        },
-      });
-
-      // Connect course to unit
-      edges.push({
-        id: `course-${unitId}`,
-        source: "course",
-        target: unitId,
-        type: "smoothstep",
-      });
-
-      // Add topics for this unit
-      unit.topics.forEach((topic, topicIndex) => {
-        const topicId = `${unitId}-topic-${topicIndex}`;
-        const column = topicIndex % topicsPerRow;
-        const row = Math.floor(topicIndex / topicsPerRow);
-
-        const topicX =
-          baseX -
-          (topicSpacing * (topicsPerRow - 1)) / 2 +
-          column * topicSpacing;
-        const topicY = unitY + 100 + row * topicVerticalSpacing;
-
-        nodes.push({
-          id: topicId,
-          position: { x: topicX, y: topicY },
-          data: { label: topic },
-          style: {
-            background: "#4895ef",
-            padding: 8,
-            borderRadius: 4,
-            fontSize: "12px",
-            width: 180,
-          },
-        });
-
-        edges.push({
-          id: `${unitId}-${topicId}`,
-          source: unitId,
-          target: topicId,
-          type: "smoothstep",
-          style: { stroke: "#4895ef" },
-          animated: true,
-        });
-      });
-    });
 
     return { nodes, edges };
   }, []);
@@ -143,16 +88,15 @@ export default function Roadmap() {
       }
 
       try {
+        // Revalidated with the ETag by the browser cache; unchanged roadmaps come back as 304
         const response = await fetch(
-          `http://localhost:5000/api/roadmap?name=${encodeURIComponent(name)}`
+          `http://localhost:5000/api/roadmap/graph?name=${encodeURIComponent(name)}`
         );
         const data = await response.json();
 
         if (response.ok) {
-          setCourseData(data.roadmap);
-          const { nodes: newNodes, edges: newEdges } = generateNodesAndEdges(
-            data.roadmap
-          );
+          setCourseData(data);
+          const { nodes: newNodes, edges: newEdges } = toFlowGraph(data);
           setNodes(newNodes);
           setEdges(newEdges);
         } else {
@@ -166,7 +110,7 @@ export default function Roadmap() {
     };
 
     fetchRoadmap();
-  }, [setNodes, setEdges, generateNodesAndEdges]);
+  }, [setNodes, setEdges, toFlowGraph]);
 
   if (loading) {
     return (